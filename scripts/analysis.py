@@ -3,19 +3,40 @@
 # =============================================
 
 import json
-import statistics
 from pathlib import Path
 import os
+import sys
+import tempfile
 from tqdm import tqdm
 from dotenv import load_dotenv
-from openai import OpenAI
 
+from kpi_store import get_store
+from build_state import BuildState, get_build_state, value_hash
+from kpi_stats import compute_kpi_stats, STATS_VERSION
+from kpi_digest import build_digests, digest_table, digest_text, estimate_tokens
+from llm_client import ResponseCache, StubClient, complete, complete_many
+from publish import write_json_if_changed
 
-def run_global_analysis():
+
+def run_global_analysis(store=None, state=None):
+    """
+    Runs the analysis and afterwards prunes LLM memo entries that were not used
+    for LLM_CACHE_DAYS (a hit refreshes an entry), so data/llm_cache stays bounded.
+    """
+    try:
+        _run_global_analysis(store, state)
+    finally:
+        removed = ResponseCache().prune()
+        if removed:
+            print(f"🧹 Removed {removed} unused LLM cache entries")
+
+
+def _run_global_analysis(store=None, state=None):
     """
-    Reads all KPI JSON files from /data, creates an AI-generated global analysis (B2-level reasoning),
+    Reads all KPI data (via the shared KpiStore), creates an AI-generated global analysis (B2-level reasoning),
     and saves the result as Markdown and JSON inside /data.
     Also extracts outlier information (min/max country & year) for data quality review.
+    Only KPIs whose data changed are recomputed; the AI is only asked again when its input changed.
     """
 
     # === 1. Load environment variables ===
@@ -25,11 +46,6 @@ def run_global_analysis():
     else:
         print("🔒 Running with environment secrets (GitHub Actions)")
 
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-    if not OPENAI_API_KEY:
-        raise ValueError("❌ OPENAI_API_KEY not found. Please define it in .env or GitHub Secrets.")
-
     # === 2. Paths ===
     data_dir = Path(__file__).resolve().parents[1] / "data"
     data_dir.mkdir(parents=True, exist_ok=True)
@@ -41,102 +57,72 @@ def run_global_analysis():
     print("➡️ Starting global AI analysis...")
     print("📁 Data folder:", data_dir.resolve())
 
-    # === 3. OpenAI client ===
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    # === 3. Build state (content hashes of the last run) ===
+    state = state or get_build_state()
+    stats_cache = state.artifact("analysis_stats").setdefault("kpis", {})
 
-    # === 4. Collect KPI data files ===
-    files = [
-        f for f in data_dir.glob("*.json")
-        if not any(x in f.name for x in ["available", "countries", "analysis"])
-    ]
-    print(f"🔍 Found {len(files)} KPI files to process")
+    # === 4. Collect KPI data files (Spaltenformat, siehe kpi_store.py) ===
+    store = store or get_store()
+    meta_path = data_dir / "meta" / "available_kpis.json"
+    with meta_path.open(encoding="utf-8") as mf:
+        kpi_meta = [k for k in json.load(mf) if isinstance(k, dict) and k.get("filename")]
+    kpi_names = [k["filename"] for k in kpi_meta]
+    print(f"🔍 Found {len(kpi_names)} KPI files to process")
 
     data_summary = {}
     outliers = {}
 
-    # === 5. Parse KPI data and compute basic stats ===
-    for f in tqdm(files, desc="📊 Processing KPI files", unit="file"):
+    # === 5. Parse KPI data and compute basic stats (only for changed KPIs) ===
+    recomputed = 0
+    for kpi_name in tqdm(kpi_names, desc="📊 Processing KPI files", unit="file"):
         try:
-            with f.open(encoding="utf-8") as infile:
-                kpi_name = f.stem
-                data = json.load(infile)
-
-                if isinstance(data, dict) and "data" in data:
-                    rows = data["data"]
-                elif isinstance(data, list):
-                    rows = data
-                else:
-                    rows = []
-
-                values = [
-                    v.get("value")
-                    for v in rows
-                    if isinstance(v.get("value"), (int, float))
-                    and v.get("country") not in ["World"]
-]
-
-
-                if not values or len(values) < 5:
+            kpi_hash = state.kpi_hash(kpi_name)
+            cached = stats_cache.get(kpi_name)
+            if (cached and cached.get("hash") == kpi_hash and cached.get("version") == STATS_VERSION
+                    and output_outliers.exists()):
+                result = cached.get("result")
+            else:
+                columns = store.get(kpi_name)
+                if columns is None:
+                    stats_cache.pop(kpi_name, None)
                     continue
+                result = compute_kpi_stats(columns)
+                stats_cache[kpi_name] = {"hash": kpi_hash, "version": STATS_VERSION, "result": result}
+                recomputed += 1
 
-                mean = sum(values) / len(values)
-                stdev = statistics.pstdev(values)
-                min_val, max_val = min(values), max(values)
-
-                min_entry = next((r for r in rows if r.get("value") == min_val), None)
-                max_entry = next((r for r in rows if r.get("value") == max_val), None)
-
-                flagged = []
-                if stdev > 0:
-                    for r in rows:
-                        val = r.get("value")
-                        if val is None:
-                            continue
-                        z = abs((val - mean) / stdev)
-                        if z > 3:
-                            flagged.append({
-                                "country": r.get("country"),
-                                "year": r.get("year"),
-                                "value": val,
-                                "z_score": round(z, 2)
-                            })
-
-                data_summary[kpi_name] = {
-                    "count": len(values),
-                    "avg": round(mean, 3),
-                    "std": round(stdev, 3),
-                    "min": min_val,
-                    "max": max_val,
-                    "outlier_count": len(flagged)
-                }
-
-                outliers[kpi_name] = {
-                    "min": {
-                        "value": min_val,
-                        "country": min_entry.get("country") if min_entry else None,
-                        "year": min_entry.get("year") if min_entry else None,
-                    },
-                    "max": {
-                        "value": max_val,
-                        "country": max_entry.get("country") if max_entry else None,
-                        "year": max_entry.get("year") if max_entry else None,
-                    },
-                    "flagged": flagged[:20]
-                }
+            if result:
+                data_summary[kpi_name], outliers[kpi_name] = result
 
         except Exception as e:
-            print(f"⚠️ Error processing {f.name}: {e}")
+            print(f"⚠️ Error processing {kpi_name}: {e}")
+
+    print(f"♻️ Statistics recomputed for {recomputed} of {len(kpi_names)} KPIs")
 
     if not data_summary:
         print("⚠️ No KPI data found – please run fetch_data.py first.")
         return
 
     # === 6. Save outlier overview ===
-    try:
-        output_outliers.write_text(json.dumps(outliers, ensure_ascii=False, indent=2), encoding="utf-8")
-        print(f"🧩 Outlier data saved to {output_outliers.name}")
-    except Exception as e:
-        print("❌ Error saving outliers:", e)
+    if recomputed or not output_outliers.exists():
+        try:
+            output_outliers.write_text(json.dumps(outliers, ensure_ascii=False, indent=2), encoding="utf-8")
+            print(f"🧩 Outlier data saved to {output_outliers.name}")
+        except Exception as e:
+            print("❌ Error saving outliers:", e)
+    state.save()
+
+    # === 6a. Prompt-Digests (Top/Bottom, Trends, Abdeckung, Gruppen) ===
+    digests = build_digests(store, kpi_meta, state)
+    table = digest_table(digests, {k["filename"]: k for k in kpi_meta})
+    print(f"🧾 KPI table for the prompt: {len(digests)} KPIs, ~{estimate_tokens(table)} tokens")
+
+    # === 6b. Nothing changed → keep the previous global analysis ===
+    global_inputs = {"summary": value_hash(data_summary), "table": value_hash(table)}
+    if state.is_current("analysis_global", global_inputs, str(output_md), str(output_json)):
+        print("⏭️ KPI summary unchanged – keeping existing global analysis (no API call)")
+        print("\n🧠 Generating individual KPI analyses…")
+        generate_kpi_analyses(None, data_dir, state, digests=digests)
+        return
 
     # === 7. Prepare AI prompt (B2 reasoning) ===
     print("\n🧠 Sending KPI summary to AI for analysis (B2 level)...")
@@ -155,19 +141,19 @@ def run_global_analysis():
         "- Interrelations & Global Dynamics\n"
         "- Forecast & Outlook\n"
         "- Short Global Conclusion\n\n"
-        "Here is the aggregated KPI data:\n"
-        f"{json.dumps(data_summary, indent=2)[:12000]}"
-    )
-
-    response = client.chat.completions.create(
-        model="gpt-5",
-        messages=[
-            {"role": "system", "content": "You are an expert global data analyst specializing in socioeconomic and environmental trends."},
-            {"role": "user", "content": prompt},
-        ],
+        "Here is the KPI data, one row per KPI (pipe-separated). "
+        "dir: h = higher is better, l = lower is better, t = closer to target, n = neutral. "
+        "n = countries with recent data / countries with data. world = world value, median = median country, "
+        "trend = median country change per year over the last decade (% when marked), "
+        "best/worst = leading and trailing countries, group columns = population-weighted group means, "
+        "or group totals when marked Σ (sum over members with data); suffixes M/B/T = million/billion/trillion:\n"
+        f"{table}"
     )
 
-    text = response.choices[0].message.content.strip()
+    text = complete([
+        {"role": "system", "content": "You are an expert global data analyst specializing in socioeconomic and environmental trends."},
+        {"role": "user", "content": prompt},
+    ], context=global_inputs)
 
     # === 8. Save results ===
     import re
@@ -185,8 +171,10 @@ def run_global_analysis():
             json.dumps({"analysis_text": text, "summary": data_summary}, ensure_ascii=False, indent=2),
             encoding="utf-8",
         )
+        state.mark("analysis_global", global_inputs)
+        state.save()
         print("\n🧠 Generating individual KPI analyses…")
-        generate_kpi_analyses(client, data_dir)
+        generate_kpi_analyses(None, data_dir, state, digests=digests)
         print("\n✅ Global B2-level analysis saved successfully!")
         print("📄 Markdown:", output_md.resolve())
         print("📊 JSON:", output_json.resolve())
@@ -198,7 +186,15 @@ def run_global_analysis():
 # ============================================================
 from datetime import date
 
-def generate_kpi_analyses(client, data_dir):
+def generate_kpi_analyses(client, data_dir, state=None, digests=None, store=None, cache=None):
+    """
+    Writes one short AI summary per KPI to kpi_analysis.json, grounded in the
+    KPI's digest (top/bottom countries, trends, coverage, group values).
+    KPIs whose data and meta entry are unchanged keep their previous summary;
+    the others are requested concurrently via llm_client (memoized on disk).
+    Failed requests keep the previous entry.
+    """
+    state = state or get_build_state()
     # Neuer Standardpfad
     meta_path = data_dir / "meta" / "available_kpis.json"
     # Fallback (alte Struktur)
@@ -220,8 +216,20 @@ def generate_kpi_analyses(client, data_dir):
     if isinstance(meta, dict):
         meta = list(meta.values())
 
+    out_path = data_dir / "kpi_analysis.json"
+    try:
+        with open(out_path, encoding="utf-8") as f:
+            previous = json.load(f)
+    except Exception:
+        previous = {}
+
+    if digests is None:
+        digests = build_digests(store or get_store(), meta, state)
+
+    kpi_inputs = state.artifact("kpi_analysis").setdefault("kpis", {})
     result = {}
-    for entry in tqdm(meta, desc="🧩 Generating KPI summaries"):
+    jobs, input_hashes = {}, {}
+    for entry in meta:
         fname   = entry.get("filename")
         title   = entry.get("title", "")
         desc    = entry.get("description", "")
@@ -231,34 +239,121 @@ def generate_kpi_analyses(client, data_dir):
         if not fname:
             continue
 
+        # Unverändert (Daten + Meta-Eintrag) → bisherige Analyse behalten
+        data_hash = state.kpi_hash(fname)
+        digest = digests.get(fname)
+        input_hash = value_hash({"data": data_hash, "meta": entry, "digest": digest})
+        if kpi_inputs.get(fname) == input_hash and fname in previous:
+            result[fname] = previous[fname]
+            continue
+
+        facts = digest_text(digest, entry) if digest else "No country data available."
         prompt = f"""Write a concise (max 1000 characters) analysis for the KPI '{title}'.
 Describe what it measures, highlight top and low performing countries,
 mention noticeable trends or regional differences, possible correlations
 with other indicators in the same cluster ({cluster}), and end with a short outlook.
+Use only the figures below; do not invent numbers.
 Unit: {unit}. Description: {desc}.
+
+Data:
+{facts}
 """
+        messages = [
+            {"role": "system", "content": "You are a global data analyst writing compact KPI summaries."},
+            {"role": "user", "content": prompt},
+        ]
+        jobs[fname] = (messages, data_hash)
+        input_hashes[fname] = input_hash
+
+    # Parallel, rate-limitiert, memoisiert (llm_client.py)
+    with tqdm(total=len(jobs), desc="🧩 Generating KPI summaries") as bar:
+        answers, stats = complete_many(jobs, client=client, cache=cache, progress=bar)
+
+    today = str(date.today())
+    for fname in jobs:
+        if fname in answers:
+            old = previous.get(fname) or {}
+            # Memo-Treffer mit identischem Text → Datum nicht anfassen
+            last_update = old.get("last_update") if old.get("summary") == answers[fname] else None
+            result[fname] = {"summary": answers[fname], "last_update": last_update or today}
+            kpi_inputs[fname] = input_hashes[fname]
+        else:
+            print(f"⚠️ Error analyzing {fname}: {stats['errors'].get(fname)}")
+            if fname in previous:
+                result[fname] = previous[fname]
+    asked = stats["requested"]
 
-        try:
-            rsp = client.chat.completions.create(
-                model="gpt-5",
-                messages=[
-                    {"role": "system", "content": "You are a global data analyst writing compact KPI summaries."},
-                    {"role": "user", "content": prompt}
-                ],
-            )
-            summary = (rsp.choices[0].message.content or "").strip()
-            result[fname] = {"summary": summary, "last_update": str(date.today())}
-        except Exception as e:
-            print(f"⚠️ Error analyzing {fname}: {e}")
+    # Reihenfolge wie in available_kpis.json
+    order = {e.get("filename"): i for i, e in enumerate(meta)}
+    result = dict(sorted(result.items(), key=lambda kv: order.get(kv[0], len(order))))
 
-    out_path = data_dir / "kpi_analysis.json"
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    if jobs or result != previous:
+        write_json_if_changed(str(out_path), result, indent=2)
+        state.save()
 
-    print(f"✅ KPI analyses saved to {out_path} ({len(result)} entries)")
+    print(f"✅ KPI analyses saved to {out_path} ({len(result)} entries, {asked} regenerated, "
+          f"{stats['cached']} from cache, {len(stats['errors'])} failed)")
     return result
 
 
+def self_check():
+    """
+    Offline check of the LLM request layer with StubClient and a temporary
+    ResponseCache: memo hits, failed requests and last_update handling.
+    Raises RuntimeError on failure (explicit checks, so it also runs under -O).
+    """
+    def expect(ok, what, detail=None):
+        if not ok:
+            raise RuntimeError(f"❌ LLM self-check failed: {what}" + (f" ({detail})" if detail is not None else ""))
+
+    class FailingClient(StubClient):
+        def create(self, model, messages, **_):
+            with self._lock:
+                self.calls += 1
+            raise ValueError("stub failure")
+
+    reply = "Stub summary."
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        (data_dir / "meta").mkdir()
+        meta = [{"filename": "kpi_a", "title": "KPI A"}, {"filename": "kpi_b", "title": "KPI B"}]
+        (data_dir / "meta" / "available_kpis.json").write_text(json.dumps(meta), encoding="utf-8")
+        out_path = data_dir / "kpi_analysis.json"
+        # kpi_a hat schon denselben Text mit altem Datum
+        out_path.write_text(json.dumps({"kpi_a": {"summary": reply, "last_update": "2000-01-01"}}),
+                            encoding="utf-8")
+        cache = ResponseCache(str(data_dir / "llm_cache"))
+
+        # 1. Memo: zweiter Aufruf ohne Request
+        client = StubClient(reply)
+        jobs = {"x": ([{"role": "user", "content": "hello"}], "ctx")}
+        complete_many(jobs, client=client, cache=cache)
+        answers, stats = complete_many(jobs, client=client, cache=cache)
+        expect(answers == {"x": reply} and stats["cached"] == 1 and client.calls == 1,
+               "second call should be served from the memo", stats)
+
+        # 2. Gleicher Text → last_update bleibt, neuer Eintrag → heute
+        result = generate_kpi_analyses(client, data_dir, BuildState(tmp), digests={}, cache=cache)
+        expect(result["kpi_a"] == {"summary": reply, "last_update": "2000-01-01"},
+               "unchanged summary should keep its last_update", result["kpi_a"])
+        expect(result["kpi_b"] == {"summary": reply, "last_update": str(date.today())},
+               "new summary should be dated today", result["kpi_b"])
+        expect(client.calls == 3, "expected 3 requests", client.calls)
+
+        # 3. Fehlschlag → bisherige Einträge bleiben (frischer Zustand + leerer Memo)
+        before = json.loads(out_path.read_text(encoding="utf-8"))
+        failing = FailingClient()
+        result = generate_kpi_analyses(failing, data_dir, BuildState(tmp, path=str(data_dir / "fresh.json")),
+                                       digests={}, cache=ResponseCache(str(data_dir / "empty_cache")))
+        expect(failing.calls == 2 and result == before, "failed requests should keep old entries", result)
+        expect(json.loads(out_path.read_text(encoding="utf-8")) == before,
+               "kpi_analysis.json should be unchanged after failed requests")
+
+    print("✅ LLM self-check passed")
+
 
 if __name__ == "__main__":
-    run_global_analysis()
\ No newline at end of file
+    if "--check" in sys.argv:
+        self_check()
+    else:
+        run_global_analysis()
\ No newline at end of file
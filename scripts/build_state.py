@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – Incremental Build State
+--------------------------------------
+Merkt sich Content-Hashes aller Eingaben der Post-Fetch-Pipeline in
+data/build_state.json, damit nur neu berechnet wird, was sich geändert hat:
+ • Hash pro KPI-Datei (data/<filename>.json) und für available_kpis.json
+ • Eingangs-Fingerprint pro abgeleitetem Artefakt (Ranking, Parts, Analyse …)
+ • frei nutzbarer Cache pro Artefakt (z. B. Statistiken je KPI)
+"""
+
+import os
+import json
+import hashlib
+from typing import Any, Dict, Iterable, Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR   = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+DATA_DIR   = os.path.join(ROOT_DIR, "data")
+
+# Auf True setzen (oder FORCE_REBUILD=1), um alle Artefakte neu zu bauen
+FORCE_REBUILD = os.getenv("FORCE_REBUILD", "") not in ("", "0", "false")
+
+
+# ======================================================================
+# 🧮 Hashes
+# ======================================================================
+def file_hash(path: str) -> Optional[str]:
+    """SHA-256 einer Datei (gestreamt); None, wenn sie fehlt."""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def value_hash(obj: Any) -> str:
+    """Stabiler Hash für JSON-serialisierbare Werte (Meta-Einträge, Prompts …)."""
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def fingerprint(hashes: Dict[str, Optional[str]]) -> str:
+    """Ein Hash über eine benannte Menge von Eingangs-Hashes."""
+    return value_hash(sorted(hashes.items()))
+
+
+# ======================================================================
+# 🗂️ BuildState
+# ======================================================================
+class BuildState:
+    """
+    Zustand des letzten Builds. Hashes der aktuellen Eingaben werden lazy
+    berechnet und einmal pro Lauf gecacht.
+    """
+    def __init__(self, data_dir: str = DATA_DIR, path: Optional[str] = None):
+        self.data_dir = data_dir
+        self.path = path or os.path.join(data_dir, "build_state.json")
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._state = json.load(f)
+        except Exception:
+            self._state = {}
+        self._state.setdefault("artifacts", {})
+        self._current: Dict[str, Optional[str]] = {}
+
+    # --- aktuelle Eingaben ---------------------------------------------
+    def kpi_hash(self, filename: str) -> Optional[str]:
+        key = f"kpi:{filename}"
+        if key not in self._current:
+            self._current[key] = file_hash(os.path.join(self.data_dir, f"{filename}.json"))
+        return self._current[key]
+
+    def meta_hash(self) -> Optional[str]:
+        if "meta" not in self._current:
+            self._current["meta"] = file_hash(os.path.join(self.data_dir, "meta", "available_kpis.json"))
+        return self._current["meta"]
+
+    def kpi_inputs(self, filenames: Iterable[str], with_meta: bool = True) -> Dict[str, Optional[str]]:
+        inputs = {f: self.kpi_hash(f) for f in filenames}
+        if with_meta:
+            inputs["__available_kpis__"] = self.meta_hash()
+        return inputs
+
+    # --- Artefakte -------------------------------------------------------
+    def artifact(self, name: str) -> Dict[str, Any]:
+        return self._state["artifacts"].setdefault(name, {})
+
+    def is_current(self, name: str, inputs: Dict[str, Optional[str]], *outputs: str) -> bool:
+        """True, wenn sich die Eingaben seit dem letzten Build nicht geändert haben
+        und alle genannten Ausgabedateien noch existieren."""
+        if FORCE_REBUILD:
+            return False
+        if any(not os.path.exists(p) for p in outputs):
+            return False
+        return self.artifact(name).get("inputs") == fingerprint(inputs)
+
+    def mark(self, name: str, inputs: Dict[str, Optional[str]], **extra):
+        entry = self.artifact(name)
+        entry["inputs"] = fingerprint(inputs)
+        entry.update(extra)
+
+    def changed_keys(self, name: str, hashes: Dict[str, Optional[str]]) -> set:
+        """Schlüssel, deren Hash sich seit dem letzten mark_keys() geändert hat."""
+        if FORCE_REBUILD:
+            return set(hashes)
+        old = self.artifact(name).get("keys") or {}
+        return {k for k, h in hashes.items() if old.get(k) != h}
+
+    def mark_keys(self, name: str, hashes: Dict[str, Optional[str]]):
+        self.artifact(name)["keys"] = dict(hashes)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+_default_state: Optional[BuildState] = None
+
+def get_build_state() -> BuildState:
+    """Der prozessweite BuildState (teilen sich alle Pipeline-Schritte)."""
+    global _default_state
+    if _default_state is None:
+        _default_state = BuildState()
+    return _default_state
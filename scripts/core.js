@@ -110,6 +110,60 @@ async function loadAllKPIData() {
   }
 }
 
+/* ============================================================
+   🎯 Single KPI Loader (Byte-Range aus dem Index, sonst ganzer Part)
+   ============================================================ */
+async function loadKPIData(filename) {
+  try {
+    const index = await loadJSON("data/all_kpis_index.json");
+    const loc = index && index.kpis && index.kpis[filename];
+    if (!loc) return null;
+
+    const url = "data/" + loc.part + "?t=" + Date.now();
+    const range = `bytes=${loc.offset}-${loc.offset + loc.length - 1}`;
+    const response = await fetch(url, { headers: { Range: range } });
+    if (!response.ok) throw new Error(`HTTP ${response.status} on ${url}`);
+
+    const bytes = new Uint8Array(await response.arrayBuffer());
+    const text = pako.ungzip(bytes, { to: "string" });
+
+    // 206 → nur das Member dieses KPIs ("filename":[...]); 200 → kompletter Part
+    const json = response.status === 206 ? JSON.parse("{" + text + "}") : JSON.parse(text);
+    return json[filename] || null;
+
+  } catch (e) {
+    console.error(`❌ Failed to load KPI ${filename}:`, e);
+    return null;
+  }
+}
+
+/* ============================================================
+   🧭 Shard Loader (ein Cluster, aus data/shards/)
+   ============================================================ */
+async function loadShard(kind, name) {
+  try {
+    const manifest = await loadJSON("data/shards/manifest.json");
+    const entry = manifest && manifest[kind] && manifest[kind][name];
+    if (!entry) return null;
+
+    // Content-Hash als Version → Browser darf die Datei dauerhaft cachen
+    const url = "data/shards/" + entry.file + "?v=" + entry.sha256.slice(0, 16);
+    const response = await fetch(url);
+    if (!response.ok) throw new Error(`HTTP ${response.status} on ${url}`);
+    const bytes = new Uint8Array(await response.arrayBuffer());
+    return JSON.parse(pako.ungzip(bytes, { to: "string" }));
+
+  } catch (e) {
+    console.error(`❌ Failed to load shard ${kind}/${name}:`, e);
+    return null;
+  }
+}
+
+// Alle KPIs eines Clusters ({filename: rows}, wie ein Part); null = kein Shard
+async function loadClusterData(cluster) {
+  return await loadShard("clusters", cluster);
+}
+
 // ============================================================
 // 🧠 KPI Smart Analysis Loader (shared for all pages)
 // ============================================================
@@ -201,5 +255,7 @@ window.resolveCountryName = resolveCountryName;
 window.calculateGroupValues = calculateGroupValues;
 window.rcLog = rcLog;
 window.loadAllKPIData = loadAllKPIData;
+window.loadKPIData = loadKPIData;
+window.loadClusterData = loadClusterData;
 window.loadKpiAnalysis = loadKpiAnalysis;
 window.renderKpiAnalysis = renderKpiAnalysis;
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – Manifest-based FTP Deploy
+----------------------------------------
+Überträgt data/ anhand von data/manifest.json (publish.write_manifest):
+ • verglichen wird mit dem Manifest, das zuletzt auf dem Server angekommen ist
+   → nur Dateien mit anderem SHA-256 werden hochgeladen, entfernte gelöscht
+ • manifest.json wird zuletzt übertragen; bricht ein Deploy ab, holt der
+   nächste Lauf die fehlenden Dateien nach
+ • kein Server-Manifest (erster Lauf) → alle Dateien
+
+Umgebung: FTP_SERVER, FTP_USERNAME, FTP_PASSWORD, FTP_DIR (wie im Workflow).
+Aufruf: python deploy_ftp.py [--dry-run]
+"""
+
+import io
+import os
+import sys
+import json
+import posixpath
+from ftplib import FTP_TLS, error_perm
+from typing import Any, Dict, List, Tuple
+
+from publish import DATA_DIR, MANIFEST_FILE, write_manifest
+
+# Wie die Excludes der FTP-Workflows (zusätzlich zu MANIFEST_EXCLUDE_* in publish.py)
+DEPLOY_EXCLUDE_SUFFIXES = (".py", ".md", ".yml")
+FTP_TIMEOUT = int(os.getenv("FTP_TIMEOUT", "60"))
+
+
+# ======================================================================
+# 📋 Plan
+# ======================================================================
+def deploy_plan(local: Dict[str, Any], remote: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """(hochzuladen, zu löschen) aus lokalem und Server-Manifest."""
+    files = {f: info for f, info in (local.get("files") or {}).items()
+             if not f.endswith(DEPLOY_EXCLUDE_SUFFIXES)}
+    old = remote.get("files") or {}
+    upload = sorted(f for f, info in files.items() if (old.get(f) or {}).get("sha256") != info["sha256"])
+    delete = sorted(f for f in old if f not in files)
+    return upload, delete
+
+
+# ======================================================================
+# 🌐 FTP
+# ======================================================================
+def connect() -> FTP_TLS:
+    ftp = FTP_TLS(os.environ["FTP_SERVER"], timeout=FTP_TIMEOUT)
+    ftp.login(os.environ["FTP_USERNAME"], os.environ["FTP_PASSWORD"])
+    ftp.prot_p()
+    return ftp
+
+def remote_manifest(ftp: FTP_TLS, base: str) -> Dict[str, Any]:
+    buf = io.BytesIO()
+    try:
+        ftp.retrbinary(f"RETR {posixpath.join(base, 'manifest.json')}", buf.write)
+        return json.loads(buf.getvalue().decode("utf-8"))
+    except (error_perm, ValueError):
+        return {}
+
+def ensure_remote_dir(ftp: FTP_TLS, path: str, known: set):
+    parts = [p for p in path.split("/") if p]
+    current = "/" if path.startswith("/") else ""
+    for part in parts:
+        current = posixpath.join(current, part)
+        if current in known:
+            continue
+        try:
+            ftp.mkd(current)
+        except error_perm:
+            pass   # existiert bereits
+        known.add(current)
+
+def upload_file(ftp: FTP_TLS, base: str, rel: str, known: set):
+    remote = posixpath.join(base, rel)
+    ensure_remote_dir(ftp, posixpath.dirname(remote), known)
+    with open(os.path.join(DATA_DIR, *rel.split("/")), "rb") as f:
+        ftp.storbinary(f"STOR {remote}", f)
+
+
+# ======================================================================
+# 🚀 Hauptfunktion
+# ======================================================================
+def main(dry_run: bool = False):
+    manifest = write_manifest(DATA_DIR)   # aktueller Stand inkl. Dateien nach dem letzten Pipeline-Schritt
+    base = posixpath.join(os.environ.get("FTP_DIR", ""), "data")
+
+    ftp = connect()
+    try:
+        remote = remote_manifest(ftp, base)
+        upload, delete = deploy_plan(manifest, remote)
+        print(f"🚀 Deploy plan: {len(upload)} upload, {len(delete)} delete "
+              f"({'server manifest found' if remote else 'no server manifest – full upload'})")
+        if dry_run:
+            for rel in upload:
+                print(f"  ⬆️ {rel}")
+            for rel in delete:
+                print(f"  🗑️ {rel}")
+            return upload, delete
+
+        known = set()
+        for rel in upload:
+            upload_file(ftp, base, rel, known)
+            print(f"  ⬆️ {rel}")
+        for rel in delete:
+            try:
+                ftp.delete(posixpath.join(base, rel))
+                print(f"  🗑️ {rel}")
+            except error_perm as e:
+                print(f"  ⚠️ Could not delete {rel}: {e}")
+        upload_file(ftp, base, os.path.relpath(MANIFEST_FILE, DATA_DIR).replace(os.sep, "/"), known)
+        print("✅ Deploy finished (manifest.json uploaded last)")
+        return upload, delete
+    finally:
+        try:
+            ftp.quit()
+        except Exception:
+            ftp.close()
+
+
+if __name__ == "__main__":
+    main(dry_run="--dry-run" in sys.argv)
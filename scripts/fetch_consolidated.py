@@ -1,16 +1,55 @@
 # ============================================================
 # 🌍 RealityCheck – Consolidated KPI Split + Gzip Writer
 # ============================================================
+#
+# Jeder KPI wird genau einmal serialisiert und als eigenes gzip-Member
+# (Level 9, mtime=0 → deterministisch) komprimiert. Die Parts sind
+# Verkettungen dieser Member:
+#
+#   gz("{") gz("\"kpi_a\":[...]") gz(",") gz("\"kpi_b\":[...]") ... gz("}")
+#
+# Entpackt ergibt ein Part weiterhin ein JSON-Objekt (core.js unverändert),
+# gleichzeitig ist jedes KPI-Member einzeln per Byte-Range ladbar:
+#   JSON.parse("{" + ungzip(bytes[offset : offset + length]) + "}")
+#
+# Die Parts werden nach gemessener komprimierter Größe befüllt (First Fit
+# Decreasing). Unveränderte KPIs werden nicht neu serialisiert, sondern als
+# fertige Member aus den bisherigen Parts übernommen.
+#
+# Zusätzlich entstehen im selben Lauf Shards pro Cluster (data/shards/…)
+# samt Manifest mit Content-Hashes; countries.html lädt nur den Cluster
+# des gewählten KPIs.
+# ============================================================
 
-import os, json, gzip
+import os, re, json, gzip, hashlib, unicodedata
 from datetime import datetime, timezone
 
+from kpi_store import get_store
+from build_state import get_build_state
+from publish import write_bytes_if_changed, write_json_if_changed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "..", "data")
 META_PATH = os.path.join(DATA_DIR, "meta", "available_kpis.json")
 OUT_PREFIX = os.path.join(DATA_DIR, "all_kpis_part")
+INDEX_PATH = os.path.join(DATA_DIR, "all_kpis_index.json")
+SHARD_DIR = os.path.join(DATA_DIR, "shards")
+SHARD_MANIFEST = os.path.join(SHARD_DIR, "manifest.json")
 
-MAX_SIZE_MB = 8.0  # Zielgröße pro Teil (InfinityFree Limit ~5 MB)
+INDEX_FORMAT = "rc-parts-2"
+SHARD_FORMAT = "rc-shards-2"   # nur Cluster-Shards
+MAX_PART_MB = float(os.getenv("CONSOLIDATED_PART_MB", "1.0"))  # komprimierte Zielgröße pro Part
+GZIP_LEVEL = 9
 
 def load_json(path):
     try:
@@ -23,69 +62,246 @@ def load_json(path):
 def get_file_size_mb(path):
     return os.path.getsize(path) / (1024 * 1024)
 
-def gzip_json(data, path):
-    """Write compressed JSON with UTF-8"""
-    with gzip.open(path, "wt", encoding="utf-8") as f:
-        json.dump(data, f, separators=(",", ":"))
+def gzip_bytes(raw: bytes) -> bytes:
+    """Deterministisches gzip-Member (kein Zeitstempel im Header)."""
+    return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
 
-def main():
-    print("🌍 Building consolidated KPI dataset (split + gzip)...")
+OPEN, SEP, CLOSE = gzip_bytes(b"{"), gzip_bytes(b","), gzip_bytes(b"}")
 
-    meta = load_json(META_PATH)
-    if not meta:
-        print("❌ No meta loaded – aborting.")
-        return
+def load_kpi_rows(store, fname):
+    try:
+        columns = store.get(fname)
+        if columns is None:
+            return None
+        return list(columns.iter_rows())
+    except Exception as e:
+        print(f"⚠️ Failed to read {fname}.json: {e}")
+        return None
+
+def kpi_member(fname, rows):
+    """Serialisiert einen KPI genau einmal → komprimiertes Member ("fname":[...])."""
+    raw = json.dumps(fname) + ":" + json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+    return gzip_bytes(raw.encode("utf-8"))
 
-    consolidated = {}
-    for entry in meta:
-        fname = entry.get("filename")
-        if not fname:
+def read_old_members(index):
+    """Fertige Member aller KPIs aus den bisherigen Parts (per Byte-Range aus dem Index)."""
+    if index.get("format") != INDEX_FORMAT:
+        return {}
+    members, blobs = {}, {}
+    for fname, loc in (index.get("kpis") or {}).items():
+        part = loc.get("part")
+        if part not in blobs:
+            try:
+                with open(os.path.join(DATA_DIR, part), "rb") as f:
+                    blobs[part] = f.read()
+            except OSError:
+                blobs[part] = None
+        blob = blobs[part]
+        if blob is not None and loc["offset"] + loc["length"] <= len(blob):
+            members[fname] = blob[loc["offset"]:loc["offset"] + loc["length"]]
+    return members
+
+def pack_parts(sizes, limit):
+    """First Fit Decreasing nach komprimierter Größe (deterministisch)."""
+    bins = []   # [belegt, [filenames]]
+    for fname in sorted(sizes, key=lambda f: (-sizes[f], f)):
+        for b in bins:
+            if b[0] + sizes[fname] <= limit:
+                b[0] += sizes[fname]
+                b[1].append(fname)
+                break
+        else:
+            bins.append([sizes[fname], [fname]])
+    return [b[1] for b in bins]
+
+def assemble_part(names, members):
+    """Verkettet die Member eines Parts; liefert (Bytes, {filename: (offset, length)})."""
+    chunks, ranges, pos = [OPEN], {}, len(OPEN)
+    for i, fname in enumerate(names):
+        if i:
+            chunks.append(SEP)
+            pos += len(SEP)
+        ranges[fname] = (pos, len(members[fname]))
+        chunks.append(members[fname])
+        pos += len(members[fname])
+    chunks.append(CLOSE)
+    return b"".join(chunks), ranges
+
+def write_variants(path, part_bytes):
+    """Zusätzliche Kodierungen (.br / .zst), falls die Module installiert sind."""
+    written = {}
+    if not (brotli or zstandard):
+        return written
+    raw = gzip.decompress(part_bytes)
+    base = path[:-len(".gz")]
+    if brotli:
+        write_bytes_if_changed(base + ".br", brotli.compress(raw, quality=11))
+        written["br"] = os.path.basename(base + ".br")
+    if zstandard:
+        write_bytes_if_changed(base + ".zst", zstandard.ZstdCompressor(level=19).compress(raw))
+        written["zst"] = os.path.basename(base + ".zst")
+    return written
+
+def write_parts(store, fnames, changed):
+    """all_kpis_part*.json.gz + all_kpis_index.json (nur geänderte KPIs neu serialisieren)."""
+    old_index = load_json(INDEX_PATH) if os.path.exists(INDEX_PATH) else {}
+    old_members = read_old_members(old_index)
+    old_kpis = old_index.get("kpis") or {}
+    # Unverändert nur, wenn dieselben KPIs drin sind (entfernte KPIs → neu packen)
+    if not changed and old_members and set(old_kpis) == set(fnames) \
+            and all(f in old_members for f in old_kpis):
+        print("⏭️ No KPI changed – consolidated parts are up to date")
+        return False
+
+    # 🧩 Member sammeln: unveränderte übernehmen, geänderte einmal serialisieren
+    members, rows = {}, {}
+    serialised = 0
+    for fname in fnames:
+        if fname not in changed and fname in old_members:
+            members[fname] = old_members[fname]
+            rows[fname] = old_kpis[fname].get("rows")
             continue
-        path = os.path.join(DATA_DIR, f"{fname}.json")
-        if not os.path.exists(path):
+        data = load_kpi_rows(store, fname)
+        if data is None:
             continue
+        members[fname] = kpi_member(fname, data)
+        rows[fname] = len(data)
+        serialised += 1
+    print(f"♻️ {len(members) - serialised} KPIs reused, {serialised} serialised")
+
+    # 🧩 Split nach komprimierter Größe
+    limit = int(MAX_PART_MB * 1024 * 1024)
+    bins = pack_parts({f: len(m) for f, m in members.items()}, limit)
+
+    parts, kpis, encodings = [], {}, {}
+    for counter, names in enumerate(bins, start=1):
+        out_path = f"{OUT_PREFIX}{counter}.json.gz"
+        part_bytes, ranges = assemble_part(names, members)
+        part = os.path.basename(out_path)
+        if write_bytes_if_changed(out_path, part_bytes):
+            print(f"✅ Wrote {out_path} ({get_file_size_mb(out_path):.2f} MB, {len(names)} KPIs)")
+        for enc, name in write_variants(out_path, part_bytes).items():
+            encodings.setdefault(enc, []).append(name)
+        parts.append(part)
+        for fname, (offset, length) in ranges.items():
+            kpis[fname] = {"part": part, "offset": offset, "length": length, "rows": rows[fname]}
+
+    # Überzählige alte Parts entfernen
+    for stale in set(old_index.get("parts") or []) - set(parts):
+        base = os.path.join(DATA_DIR, stale[:-len(".gz")])
+        for path in (base + ".gz", base + ".br", base + ".zst"):
+            if os.path.exists(path):
+                os.remove(path)
+                print(f"🗑️ Removed stale part {os.path.basename(path)}")
+
+    # Index-Datei schreiben (parts bleibt die Liste für core.js)
+    index = {
+        "parts": parts,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "count": len(parts),
+        "format": INDEX_FORMAT,
+        "kpis": {f: kpis[f] for f in fnames if f in kpis},
+    }
+    if encodings:
+        index["encodings"] = encodings
+    if {k: v for k, v in index.items() if k != "created"} == \
+            {k: v for k, v in old_index.items() if k != "created"}:
+        print("📄 Index unchanged")
+    else:
+        write_json_if_changed(INDEX_PATH, index, indent=2)
+        print(f"📄 Index written → {INDEX_PATH}")
+    print(f"✅ Done ({len(parts)} parts total).")
+    return True
+
+
+# ============================================================
+# 🧭 Shards pro Cluster (für seitenweises Laden)
+# ============================================================
+def shard_slug(name):
+    """Dateiname für einen Cluster ("Health & Well-being" → "health_well_being")."""
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "_", ascii_name.lower()).strip("_") or "unknown"
+
+def shard_bytes(data):
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return gzip_bytes(raw)
+
+def write_shards(store, meta, fnames):
+    """
+    Ein Durchlauf über alle KPIs → shards/cluster/<cluster>.json.gz {filename: [rows]}
+    (Format wie die Parts). Dazu shards/manifest.json mit Pfad, Größe und SHA-256
+    je Datei (Cache-Busting ?v=<hash>).
+    """
+    cluster_of = {e.get("filename"): e.get("cluster") or "Other" for e in meta if e.get("filename")}
+    clusters = {}
+
+    for fname in fnames:
         try:
-            with open(path, encoding="utf-8") as f:
-                data = json.load(f)
-            consolidated[fname] = data
+            columns = store.get(fname)
         except Exception as e:
             print(f"⚠️ Failed to read {fname}.json: {e}")
+            continue
+        if columns is None:
+            continue
+        clusters.setdefault(cluster_of[fname], {})[fname] = list(columns.iter_rows())
 
-    # 🧩 Split nach Größe
-    parts = []
-    current = {}
-    counter = 1
-    size_estimate = 0
-
-    for k, v in consolidated.items():
-        current[k] = v
-        size_estimate = len(json.dumps(current)) / (1024 * 1024)
-        if size_estimate >= MAX_SIZE_MB:
-            out_path = f"{OUT_PREFIX}{counter}.json.gz"
-            gzip_json(current, out_path)
-            parts.append(os.path.basename(out_path))
-            print(f"✅ Wrote {out_path} ({get_file_size_mb(out_path):.2f} MB)")
-            counter += 1
-            current = {}
-            size_estimate = 0
-
-    # letzter Teil
-    if current:
-        out_path = f"{OUT_PREFIX}{counter}.json.gz"
-        gzip_json(current, out_path)
-        parts.append(os.path.basename(out_path))
-        print(f"✅ Wrote {out_path} ({get_file_size_mb(out_path):.2f} MB)")
-
-    # Index-Datei schreiben
-    index_path = os.path.join(DATA_DIR, "all_kpis_index.json")
-    with open(index_path, "w", encoding="utf-8") as f:
-        json.dump({
-            "parts": parts,
-            "created": datetime.now(timezone.utc).isoformat(),
-            "count": len(parts)
-        }, f, indent=2)
-    print(f"📄 Index written → {index_path}")
-    print(f"✅ Done ({len(parts)} parts total).")
+    manifest = {"generated": datetime.now(timezone.utc).isoformat(), "clusters": {}}
+    written, keep, used = 0, set(), {}
+    os.makedirs(os.path.join(SHARD_DIR, "cluster"), exist_ok=True)
+    for name in sorted(clusters):
+        slug = shard_slug(name)
+        used[slug] = used.get(slug, 0) + 1
+        if used[slug] > 1:
+            slug = f"{slug}_{used[slug]}"
+        rel = f"cluster/{slug}.json.gz"
+        data = shard_bytes(clusters[name])
+        written += write_bytes_if_changed(os.path.join(SHARD_DIR, rel), data)
+        keep.add(rel)
+        manifest["clusters"][name] = {
+            "file": rel,
+            "bytes": len(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+
+    # Shards von Clustern, die es nicht mehr gibt (und frühere Länder-Shards), entfernen
+    for kind in ("country", "cluster"):
+        folder = os.path.join(SHARD_DIR, kind)
+        for fn in (os.listdir(folder) if os.path.isdir(folder) else []):
+            if f"{kind}/{fn}" not in keep:
+                os.remove(os.path.join(folder, fn))
+
+    old_manifest = load_json(SHARD_MANIFEST) if os.path.exists(SHARD_MANIFEST) else {}
+    if written or {k: v for k, v in manifest.items() if k != "generated"} != \
+            {k: v for k, v in old_manifest.items() if k != "generated"}:
+        write_json_if_changed(SHARD_MANIFEST, manifest, indent=1)
+    print(f"🧭 Shards: {len(clusters)} clusters ({written} files written)")
+
+
+def main(store=None, state=None):
+    print("🌍 Building consolidated KPI dataset (split + gzip)...")
+    store = store or get_store()
+    state = state or get_build_state()
+
+    meta = load_json(META_PATH)
+    if not meta:
+        print("❌ No meta loaded – aborting.")
+        return
+
+    fnames = list(dict.fromkeys(e.get("filename") for e in meta if e.get("filename")))
+    hashes = state.kpi_inputs(fnames, with_meta=False)
+
+    write_parts(store, fnames, state.changed_keys("consolidated", hashes))
+    state.mark_keys("consolidated", hashes)
+    state.save()
+
+    # Shards hängen zusätzlich an der Cluster-Zuordnung in available_kpis.json
+    shard_inputs = {**state.kpi_inputs(fnames), "__format__": SHARD_FORMAT}
+    if state.is_current("shards", shard_inputs, SHARD_MANIFEST):
+        print("⏭️ No KPI changed – shards are up to date")
+    else:
+        write_shards(store, meta, fnames)
+        state.mark("shards", shard_inputs)
+        state.save()
 
 
 if __name__ == "__main__":
@@ -10,11 +10,21 @@ Produktive Version mit:
  • vollständigem Mapping-, Dummy-, und Analyse-Handling
 """
 
-import os, csv, json, re, requests, unicodedata, traceback, io, zipfile
+import os, csv, json, re, requests, unicodedata, traceback, io, zipfile, copy, threading, time, tempfile, shutil
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, ExitStack
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import hashlib
+import pandas as pd
+from kpi_store import write_columns, get_store
+from build_state import value_hash
+from source_adapters import AdapterError, compile_adapter
+from publish import write_json_if_changed, write_csv_if_changed
 
 # === Load .env (API-Keys, Settings etc.) ===
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
@@ -33,9 +43,35 @@ PENDING_DIR    = os.path.join(DATA_DIR, "pending")
 COUNTRIES_FILE       = os.path.join(META_DIR, "countries.json")
 COUNTRY_MAP_FILE     = os.path.join(META_DIR, "country_mappings.json")
 COUNTRY_PENDING_FILE = os.path.join(META_DIR, "country_mappings_pending.json")
+COUNTRY_RESOLVED_FILE = os.path.join(META_DIR, "country_resolution.json")
 AVAILABLE_FILE       = os.path.join(META_DIR, "available_kpis.json")
 LOG_FILE             = os.path.join(DATA_DIR, "fetch_log.txt")
 STATUS_FILE          = os.path.join(DATA_DIR, "fetch_status.json")
+HTTP_CACHE_DIR       = os.path.join(DATA_DIR, "http_cache")
+
+# Quellen ab dieser Dateigröße werden pro KPI stückweise gelesen statt einmal
+# ganz geparst und geteilt (Speicher ~ TABLE_CHUNK_ROWS Zeilen statt ganze Tabelle)
+STREAM_PARSE_BYTES = int(os.getenv("STREAM_PARSE_BYTES", str(16 * 1024 * 1024)))
+TABLE_CHUNK_ROWS   = int(os.getenv("TABLE_CHUNK_ROWS", "100000"))
+
+# ======================================================================
+# ⚡ Parallelität & Verbindungs-Pools
+# ======================================================================
+# Anzahl paralleler KPI-Worker (FETCH_WORKERS=1 → alter, serieller Ablauf)
+FETCH_WORKERS = max(1, int(os.getenv("FETCH_WORKERS", "8")))
+
+# Maximal gleichzeitige Requests pro Host (schont die Upstream-APIs)
+HOST_LIMITS = {
+    "api.worldbank.org":  6,
+    "ourworldindata.org": 4,
+    "api.unhcr.org":      2,
+}
+DEFAULT_HOST_LIMIT = 2
+
+_thread_state    = threading.local()   # Session + Log-Puffer pro Worker
+_log_lock        = threading.Lock()
+_host_lock       = threading.Lock()
+_host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
 
 # ======================================================================
 # 🧰 Hilfsfunktionen
@@ -48,11 +84,24 @@ def ensure_dirs():
     os.makedirs(PENDING_DIR, exist_ok=True)
 
 def log(msg: str):
-    ensure_dirs()
+    """Loggt sofort – oder in den KPI-Puffer, wenn ein Worker-Thread aktiv ist."""
     line = f"[{now_utc()}] {msg}"
-    print(line)
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(line + "\n")
+    buffer = getattr(_thread_state, "log_buffer", None)
+    if buffer is not None:
+        buffer.append(line)
+        return
+    emit_log_lines([line])
+
+def emit_log_lines(lines: List[str]):
+    """Schreibt einen Block Logzeilen zusammenhängend in Konsole & Logdatei."""
+    if not lines:
+        return
+    ensure_dirs()
+    with _log_lock:
+        for line in lines:
+            print(line)
+        with open(LOG_FILE, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
 
 def read_json(path: str, default):
     try:
@@ -62,9 +111,8 @@ def read_json(path: str, default):
         return default
 
 def write_json(path: str, obj):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+    """Atomar; unveränderte Inhalte werden gar nicht erst geschrieben."""
+    return write_json_if_changed(path, obj, indent=2)
 
 def safe_float(x) -> Optional[float]:
     try:
@@ -97,6 +145,222 @@ def safe_pending_filename(text: str) -> str:
         clean = clean[:90] + "_" + digest
     return clean
 
+# ======================================================================
+# 🌐 HTTP (Keep-Alive-Sessions + Host-Limits)
+# ======================================================================
+def _host_semaphore(host: str) -> threading.BoundedSemaphore:
+    with _host_lock:
+        sem = _host_semaphores.get(host)
+        if sem is None:
+            sem = threading.BoundedSemaphore(HOST_LIMITS.get(host, DEFAULT_HOST_LIMIT))
+            _host_semaphores[host] = sem
+        return sem
+
+def get_session() -> requests.Session:
+    """Eine gepoolte Keep-Alive-Session pro Thread (requests.Session ist nicht thread-safe)."""
+    session = getattr(_thread_state, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(HOST_LIMITS) + 1,
+                              pool_maxsize=max(HOST_LIMITS.values()))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _thread_state.session = session
+    return session
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """GET über die Thread-Session, begrenzt durch das Limit des Ziel-Hosts."""
+    host = (urlparse(url).hostname or "").lower()
+    with _host_semaphore(host):
+        return get_session().get(url, **kwargs)
+
+# ======================================================================
+# 🗄️ HTTP-Cache (ETag / Last-Modified Revalidierung)
+# ======================================================================
+def _cache_paths(url: str) -> Tuple[str, str]:
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return (os.path.join(HTTP_CACHE_DIR, f"{key}.json"),
+            os.path.join(HTTP_CACHE_DIR, f"{key}.body"))
+
+def _replace_file(path: str, data: bytes):
+    """Atomar schreiben – parallele Worker dürfen dieselbe URL cachen."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _conditional_headers(url: str, headers=None):
+    """Liefert (Request-Header inkl. Validatoren, gecachte Metadaten oder None)."""
+    meta_path, body_path = _cache_paths(url)
+    cached = read_json(meta_path, None) if os.path.exists(body_path) else None
+    headers = dict(headers or {})
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    return headers, cached
+
+def _store_cache_meta(url: str, resp: requests.Response) -> bool:
+    """Schreibt die Validatoren; False, wenn der Server keine liefert."""
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if not (etag or last_modified):
+        return False
+    meta_path, _ = _cache_paths(url)
+    _replace_file(meta_path, json.dumps({
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "headers": {"Content-Type": resp.headers.get("Content-Type", "")},
+        "stored": now_utc(),
+    }, ensure_ascii=False, indent=2).encode("utf-8"))
+    return True
+
+def _count_cache(stats, hit: bool):
+    if stats is not None:
+        key = "http_cache_hits" if hit else "http_cache_misses"
+        stats[key] = stats.get(key, 0) + 1
+
+def cached_get(url: str, stats: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+    """
+    GET mit On-Disk-Cache unter data/http_cache/ (für kleine JSON-Antworten).
+    Sendet If-None-Match / If-Modified-Since; bei 304 wird eine Response mit
+    status_code 304 und dem gecachten Body zurückgegeben.
+    """
+    headers, cached = _conditional_headers(url, kwargs.pop("headers", None))
+    resp = http_get(url, headers=headers, **kwargs)
+
+    if resp.status_code == 304 and cached:
+        with open(_cache_paths(url)[1], "rb") as f:
+            resp._content = f.read()
+        resp.headers.update(cached.get("headers") or {})
+        _count_cache(stats, True)
+        return resp
+
+    _count_cache(stats, False)
+    if resp.status_code == 200:
+        try:
+            os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+            _replace_file(_cache_paths(url)[1], resp.content)
+            _store_cache_meta(url, resp)
+        except Exception as e:
+            log(f"[WARN] Could not write HTTP cache for {url}: {e}")
+    return resp
+
+class Download:
+    """
+    Ein auf Platte gestreamter Download (Body liegt unter `path`).
+    Mit Validatoren bleibt der Body als Cache-Eintrag erhalten, sonst ist
+    `path` eine temporäre Spill-Datei, die close() wieder entfernt.
+    """
+    def __init__(self, resp: requests.Response, path: Optional[str], temporary: bool):
+        self.resp = resp
+        self.status_code = resp.status_code
+        self.headers = resp.headers
+        self.path = path
+        self.temporary = temporary
+
+    def head(self, n: int = 4096) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read(n)
+
+    def is_zip(self) -> bool:
+        content_type = (self.headers.get("Content-Type") or "").lower()
+        return "zip" in content_type or self.head(4) == b"PK\x03\x04"
+
+    def copy_to(self, dest: str):
+        shutil.copyfile(self.path, dest)
+
+    def close(self):
+        if self.temporary and self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def download(url: str, stats: Optional[Dict[str, Any]] = None, timeout: int = 60) -> Download:
+    """
+    Streamt einen (großen) Download chunkweise auf die Platte – mit
+    ETag/Last-Modified-Revalidierung. Das Host-Limit gilt bis der Body fertig ist.
+    """
+    headers, cached = _conditional_headers(url)
+    meta_path, body_path = _cache_paths(url)
+    host = (urlparse(url).hostname or "").lower()
+    with _host_semaphore(host):
+        resp = get_session().get(url, headers=headers, timeout=timeout, stream=True)
+        try:
+            if resp.status_code == 304 and cached:
+                _count_cache(stats, True)
+                resp.headers.update(cached.get("headers") or {})
+                return Download(resp, body_path, temporary=False)
+            _count_cache(stats, False)
+            if resp.status_code != 200:
+                return Download(resp, None, temporary=False)
+
+            os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+            tmp = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    for chunk in resp.iter_content(chunk_size=1 << 16):
+                        f.write(chunk)
+            except BaseException:
+                # abgebrochener Download → keine halbe Spill-Datei im Cache liegen lassen
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        finally:
+            resp.close()
+
+    try:
+        if _store_cache_meta(url, resp):
+            os.replace(tmp, body_path)
+            return Download(resp, body_path, temporary=False)
+    except Exception as e:
+        log(f"[WARN] Could not write HTTP cache for {url}: {e}")
+    return Download(resp, tmp, temporary=True)
+
+@contextmanager
+def open_csv_text(path: str, member: Optional[str] = None):
+    """
+    Öffnet eine CSV-Datei bzw. ein ZIP-Mitglied als Text-Stream
+    (inkrementell dekodiert, UTF-8 mit BOM oder UTF-16).
+    """
+    with ExitStack() as stack:
+        if member:
+            zf = stack.enter_context(zipfile.ZipFile(path))
+            with zf.open(member) as probe:
+                head = probe.read(4)
+            raw = stack.enter_context(zf.open(member))
+        else:
+            raw = stack.enter_context(open(path, "rb"))
+            head = raw.peek(4)[:4]
+        encoding = "utf-16" if head[:2] in (b"\xff\xfe", b"\xfe\xff") else "utf-8-sig"
+        yield io.TextIOWrapper(raw, encoding=encoding, newline="")
+
+def has_local_data(kpi_id: str) -> bool:
+    return (os.path.exists(os.path.join(DATA_DIR, f"{kpi_id}.json"))
+            and os.path.exists(os.path.join(DATA_DIR, f"{kpi_id}.csv")))
+
+def kpi_config_hash(meta: Dict[str, Any], resolver=None) -> str:
+    """Fingerprint der KPI-Konfiguration (Eintrag in available_kpis.json + Länder-Mapping)."""
+    return value_hash({"meta": meta, "countries": getattr(resolver, "inputs", None)})
+
+def not_modified(kpi_id: str, resp: requests.Response, stats=None, config_changed: bool = False) -> bool:
+    """
+    True, wenn der Upstream 304 meldet, die lokalen Dateien noch existieren und
+    die KPI-Konfiguration (Adapter, merge_policy, Mapping …) seit dem Abruf gleich ist.
+    """
+    if resp.status_code == 304 and not config_changed and has_local_data(kpi_id):
+        log(f"[CACHE] {kpi_id} – upstream not modified (304), keeping local data")
+        if stats is not None:
+            stats["not_modified"] = stats.get("not_modified", 0) + 1
+        return True
+    return False
+
 # ======================================================================
 # 🌍 Country Mapping
 # ======================================================================
@@ -115,36 +379,146 @@ def build_country_indices(countries: Dict[str, Any], mapping: Dict[str, str]):
             a_index[_norm(alias)] = c_index.get(t_norm)
     return c_index, a_index
 
-def canonicalize_country(name: str, c_index, a_index, countries, pending, stats):
-    if not name:
-        return None
-    if name in countries:
-        stats["mapped_ok"] += 1
-        return name
-    n = _norm(name)
-    if n in a_index:
-        target = a_index[n]
-        if target == "":
-            stats["mapped_drop"] += 1
+class CountryResolver:
+    """
+    Löst Rohnamen (Aliase, ISO3, Schreibvarianten) auf kanonische Ländernamen auf.
+    Die Indizes werden einmal pro Lauf gebaut, jedes Ergebnis (ok / drop /
+    pending) wird gemerkt. Die Stats werden trotzdem bei jedem Aufruf gezählt.
+    Die gespeicherte Tabelle trägt den Hash von countries.json + country_mappings.json
+    und wird nur übernommen, solange beide unverändert sind.
+    """
+    def __init__(self, countries: Dict[str, Any], mapping: Dict[str, str]):
+        self.countries = countries
+        self.inputs = value_hash({"countries": countries, "mappings": mapping})
+        self.c_index, self.a_index = build_country_indices(countries, mapping)
+        self._memo: Dict[str, Tuple[str, Optional[str], str]] = {}
+
+    @classmethod
+    def from_meta(cls, use_saved: bool = True) -> "CountryResolver":
+        """Baut den Resolver aus /data/meta – optional vorbefüllt aus country_resolution.json."""
+        resolver = cls(read_json(COUNTRIES_FILE, {}), read_json(COUNTRY_MAP_FILE, {}))
+        if use_saved:
+            resolver.preload(read_json(COUNTRY_RESOLVED_FILE, {}))
+        return resolver
+
+    def _lookup(self, name: str) -> Tuple[str, Optional[str], str]:
+        """(Ergebnis, Kanonischer Name, Pending-Grund) – ohne Seiteneffekte."""
+        if name in self.countries:
+            return "ok", name, ""
+        n = _norm(name)
+        if n in self.a_index:
+            target = self.a_index[n]
+            if target == "":
+                return "drop", None, ""
+            if not target:
+                return "pending", None, "Mapping target missing or invalid"
+            return "ok", target, ""
+        return "unknown", None, "Unknown alias; please map in country_mappings.json"
+
+    def lookup(self, name: str) -> Tuple[str, Optional[str], str]:
+        hit = self._memo.get(name)
+        if hit is None:
+            hit = self._lookup(name)
+            self._memo[name] = hit
+        return hit
+
+    def resolve(self, name: str, pending, stats, count: int = 1) -> Optional[str]:
+        """count: für wie viele Zeilen dieser Name steht (gebündelte Auflösung)."""
+        if not name:
             return None
-        if not target:
-            pending[name] = "Mapping target missing or invalid"
-            stats["mapped_pending"] += 1
+        outcome, canon, reason = self.lookup(name)
+        if outcome == "ok":
+            stats["mapped_ok"] += count
+            return canon
+        if outcome == "drop":
+            stats["mapped_drop"] += count
             return None
-        stats["mapped_ok"] += 1
-        return target
-    pending[name] = "Unknown alias; please map in country_mappings.json"
-    stats["mapped_pending"] += 1
-    stats["new_pending"].add(name)
-    return None
+        pending[name] = reason
+        stats["mapped_pending"] += count
+        if outcome == "unknown":
+            stats["new_pending"].add(name)
+        return None
+
+    def preload(self, saved: Dict[str, Any]):
+        """Übernimmt eine gespeicherte Auflösungstabelle – nur bei gleichem Mapping-Stand."""
+        if saved.get("inputs") != self.inputs:
+            return
+        for name, canon in (saved.get("ok") or {}).items():
+            if canon in self.countries:
+                self._memo.setdefault(name, ("ok", canon, ""))
+        for name in saved.get("drop") or []:
+            self._memo.setdefault(name, ("drop", None, ""))
+
+    def table(self) -> Dict[str, Any]:
+        ok, drop, unresolved = {}, [], []
+        for name, (outcome, canon, _) in sorted(self._memo.items()):
+            if outcome == "ok":
+                ok[name] = canon
+            elif outcome == "drop":
+                drop.append(name)
+            else:
+                unresolved.append(name)
+        # kein Zeitstempel: die Datei ändert sich nur, wenn sich die Auflösung ändert
+        return {"inputs": self.inputs, "ok": ok, "drop": drop, "pending": unresolved}
+
+    def save(self, path: str = COUNTRY_RESOLVED_FILE):
+        write_json(path, self.table())
+
+def canonicalize_country(name: str, resolver: CountryResolver, pending, stats):
+    return resolver.resolve(name, pending, stats)
+
+def canonicalize_column(names, resolver: CountryResolver, pending, stats):
+    """
+    canonicalize_country für eine ganze pandas-Spalte: jeder Name wird einmal
+    aufgelöst (in Reihenfolge des ersten Auftretens), die Stats zählen wie
+    bisher pro Zeile. Nicht auflösbare Namen → NaN.
+    """
+    counts = names.value_counts(sort=False, dropna=False)
+    mapping = {name: resolver.resolve(name, pending, stats, count=int(counts[name]))
+               for name in names.unique()}
+    return names.map(mapping)
 
 # ======================================================================
 # 💾 Speicherung / Dummy
 # ======================================================================
-def save_records(kpi_id: str, records: List[Dict[str, Any]], stats=None):
+MERGE_POLICIES       = ("first", "last", "mean", "sum")
+DEFAULT_MERGE_POLICY = "first"
+
+def merge_records(records: List[Dict[str, Any]], policy: str = DEFAULT_MERGE_POLICY):
+    """
+    Fasst Records mit gleichem (country, year) zusammen.
+    policy: first = erster Wert gewinnt, last = letzter Wert, mean = Mittelwert,
+            sum = Summe (z. B. mehrere Teams eines Landes).
+    Pro KPI über "merge_policy" in available_kpis.json einstellbar.
+    Liefert (Records, Anzahl entfernter Duplikate).
     """
-    Speichert Daten im Standardformat, entfernt automatisch alle Jahre < 1900
-    und protokolliert die Kürzungen im Fetch-Report.
+    if policy not in MERGE_POLICIES:
+        policy = DEFAULT_MERGE_POLICY
+    merged: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+    counts: Dict[Tuple[Any, Any], int] = {}
+    for r in records:
+        key = (r.get("country"), r.get("year"))
+        if key not in merged:
+            merged[key] = r
+            counts[key] = 1
+        elif policy == "last":
+            merged[key] = r
+        elif policy in ("mean", "sum"):
+            if counts[key] == 1:
+                merged[key] = dict(merged[key])   # Original nicht verändern
+            merged[key]["value"] += r["value"]
+            counts[key] += 1
+    if policy == "mean":
+        for key, n in counts.items():
+            if n > 1:
+                merged[key]["value"] /= n
+    return list(merged.values()), len(records) - len(merged)
+
+def save_records(kpi_id: str, records: List[Dict[str, Any]], stats=None, merge_policy: Optional[str] = None):
+    """
+    Speichert Daten im Standardformat, entfernt automatisch alle Jahre < 1900,
+    fasst doppelte (country, year)-Paare zusammen und protokolliert beides
+    im Fetch-Report.
     """
     ensure_dirs()
     before = len(records)
@@ -167,12 +541,21 @@ def save_records(kpi_id: str, records: List[Dict[str, Any]], stats=None):
             stats.setdefault("trimmed_kpis", set())
             stats["trimmed_kpis"].add(kpi_id)
 
-    # --- Normal speichern ---
+    # 🧬 Dedup / Merge je (country, year)
+    policy = merge_policy or DEFAULT_MERGE_POLICY
+    trimmed, collapsed = merge_records(trimmed, policy)
+    if collapsed:
+        log(f"[MERGE] {kpi_id}: collapsed {collapsed} duplicate (country, year) rows ({policy})")
+        if stats is not None:
+            stats["merged_duplicates"] = stats.get("merged_duplicates", 0) + collapsed
+
+    # --- Normal speichern (nur bei geändertem Inhalt) ---
     write_json(os.path.join(DATA_DIR, f"{kpi_id}.json"), trimmed)
-    with open(os.path.join(DATA_DIR, f"{kpi_id}.csv"), "w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=["country", "iso2", "year", "value"])
-        w.writeheader()
-        w.writerows(trimmed)
+    write_csv_if_changed(os.path.join(DATA_DIR, f"{kpi_id}.csv"), trimmed,
+                         ["country", "iso2", "year", "value"])
+    # --- Kompaktes Spaltenformat (data/columnar/) + In-Process-Store ---
+    get_store().put(kpi_id, write_columns(kpi_id, trimmed, DATA_DIR))
+    return len(trimmed)
 
 
 def keep_or_dummy(kpi_id: str, reason: str, stats):
@@ -182,8 +565,8 @@ def keep_or_dummy(kpi_id: str, reason: str, stats):
         log(f"[WARN] Keeping old data for {kpi_id} ({reason})")
         return
     write_json(json_path, [])
-    with open(csv_path, "w", encoding="utf-8", newline="") as f:
-        csv.DictWriter(f, fieldnames=["country", "iso2", "year", "value"]).writeheader()
+    write_csv_if_changed(csv_path, [], ["country", "iso2", "year", "value"])
+    get_store().put(kpi_id, write_columns(kpi_id, [], DATA_DIR))
     stats["dummies"] += 1
     log(f"[WARN] Dummy created for {kpi_id} ({reason})")
 
@@ -191,37 +574,149 @@ def keep_or_dummy(kpi_id: str, reason: str, stats):
 # ======================================================================
 # 🔍 Update-Check & Source-Date Extraction
 # ======================================================================
+WB_API_BASE       = "https://api.worldbank.org/v2"
+WB_META_BATCH     = 40     # Indikatoren pro Batch-Request (URL-Länge)
+OWID_GRAPHER_BASE = "https://ourworldindata.org/grapher"
+
+# Lauf-Cache für Quell-Daten: "wb:<code>" / "owid:<slug>" → ISO-Datum oder None
+_source_date_cache: Dict[str, Optional[str]] = {}
+
+def _iso_date(d) -> Optional[str]:
+    """Normalisiert '2025-07-01' → '2025-07-01T00:00:00Z', damit should_fetch vergleichen kann."""
+    if not d:
+        return None
+    d = str(d).strip()
+    if re.match(r"^\d{4}-\d{2}-\d{2}$", d):
+        return d + "T00:00:00Z"
+    return d
+
 def get_source_date_from_worldbank(code: str) -> Optional[str]:
-    meta_url = f"https://api.worldbank.org/v2/indicator/{code}?format=json"
+    cache_key = f"wb:{code}"
+    if cache_key in _source_date_cache:
+        return _source_date_cache[cache_key]
+    meta_url = f"{WB_API_BASE}/indicator/{code}?format=json"
     try:
-        r = requests.get(meta_url, timeout=20)
+        r = http_get(meta_url, timeout=20)
         if r.status_code == 200:
             data = r.json()
             if isinstance(data, list) and len(data) > 0 and isinstance(data[0], dict):
                 meta = data[0]
                 for key in ["lastupdated","LastUpdated","lastUpdated","lastupdate"]:
                     if key in meta and meta[key]:
-                        d = meta[key]
-                        if re.match(r"^\d{4}-\d{2}-\d{2}$", d):
-                            return d + "T00:00:00Z"
-                        return str(d)
+                        return _iso_date(meta[key])
     except Exception as e:
         log(f"[WARN] Could not get WorldBank source_date for {code}: {e}")
     return None
 
+def owid_slug(source_code: str) -> str:
+    """'life-expectancy.csv?csvType=full' → 'life-expectancy'"""
+    slug = source_code.split("?", 1)[0].strip("/")
+    return slug[:-4] if slug.endswith(".csv") else slug
+
 def get_source_date_from_owid(url: str) -> Optional[str]:
+    slug = owid_slug(url.rsplit("/grapher/", 1)[-1])
+    cache_key = f"owid:{slug}"
+    if cache_key in _source_date_cache:
+        return _source_date_cache[cache_key]
     try:
-        meta_url = url.replace("/grapher/", "/grapher/data/metadata/")
-        r = requests.get(meta_url, timeout=20)
+        meta_url = f"{OWID_GRAPHER_BASE}/{slug}.metadata.json"
+        r = http_get(meta_url, timeout=20)
         if r.status_code == 200:
             data = r.json()
             for key in ["last_updated","updatedAt","lastUpdatedAtSource","dataEditedAt","publishedAt"]:
                 if key in data and data[key]:
-                    return data[key]
+                    return _iso_date(data[key])
+            # Grapher-Metadaten: Datum je Spalte → jüngstes verwenden
+            dates = [c.get("lastUpdated") for c in (data.get("columns") or {}).values()
+                     if isinstance(c, dict) and c.get("lastUpdated")]
+            if dates:
+                return _iso_date(max(dates))
     except Exception as e:
         log(f"[WARN] Could not get OWID source_date: {e}")
     return None
 
+# ======================================================================
+# 📦 Batch-Auflösung der Quell-Daten (einmal pro Lauf, vor der KPI-Schleife)
+# ======================================================================
+def resolve_worldbank_source_dates(codes: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Ermittelt 'lastupdated' für alle WB-Indikatoren mit wenigen Requests:
+      1× /v2/sources                   → lastupdated je Quelle (WDI, WGI, …)
+      n/40× /v2/indicator/A;B;C        → Quelle je Indikator
+    Nicht auflösbare Codes fallen auf den Einzel-Lookup zurück (parallel).
+    """
+    codes = sorted({c for c in codes if c})
+    result: Dict[str, Optional[str]] = {}
+    if not codes:
+        return result
+
+    source_dates: Dict[str, Optional[str]] = {}
+    try:
+        r = http_get(f"{WB_API_BASE}/sources?format=json&per_page=1000", timeout=20)
+        data = r.json() if r.status_code == 200 else None
+        if isinstance(data, list) and len(data) > 1 and isinstance(data[1], list):
+            for src in data[1]:
+                source_dates[str(src.get("id"))] = _iso_date(src.get("lastupdated"))
+    except Exception as e:
+        log(f"[WARN] WorldBank source list unavailable: {e}")
+
+    if source_dates:
+        for i in range(0, len(codes), WB_META_BATCH):
+            batch = codes[i:i + WB_META_BATCH]
+            url = f"{WB_API_BASE}/indicator/{';'.join(batch)}?format=json&per_page={len(batch)}"
+            try:
+                r = http_get(url, timeout=30)
+                data = r.json() if r.status_code == 200 else None
+                if isinstance(data, list) and len(data) > 1 and isinstance(data[1], list):
+                    for ind in data[1]:
+                        src_id = str((ind.get("source") or {}).get("id") or "")
+                        if ind.get("id") in batch and source_dates.get(src_id):
+                            result[ind["id"]] = source_dates[src_id]
+            except Exception as e:
+                log(f"[WARN] WorldBank indicator batch failed ({len(batch)} codes): {e}")
+
+    missing = [c for c in codes if c not in result]
+    if missing:
+        with ThreadPoolExecutor(max_workers=HOST_LIMITS["api.worldbank.org"]) as pool:
+            for code, date in zip(missing, pool.map(get_source_date_from_worldbank, missing)):
+                result[code] = date
+    return result
+
+def resolve_owid_source_dates(slugs: List[str]) -> Dict[str, Optional[str]]:
+    """Lädt alle Grapher-Metadaten parallel (Host-Limit greift über http_get)."""
+    slugs = sorted({s for s in slugs if s})
+    if not slugs:
+        return {}
+    urls = [f"{OWID_GRAPHER_BASE}/{s}" for s in slugs]
+    with ThreadPoolExecutor(max_workers=HOST_LIMITS["ourworldindata.org"]) as pool:
+        return dict(zip(slugs, pool.map(get_source_date_from_owid, urls)))
+
+def prefetch_source_dates(kpi_list: List[Dict[str, Any]]):
+    """Füllt den Lauf-Cache, sodass fetch_kpi keine Einzel-Requests mehr braucht."""
+    wb_codes, owid_slugs = [], []
+    for meta in kpi_list:
+        source_type = source_type_of(meta)
+        source_code = meta.get("source_code") or meta.get("code") or ""
+        if not source_code:
+            continue
+        if source_type == "worldbank":
+            wb_codes.append(source_code)
+        elif source_type == "owid":
+            owid_slugs.append(owid_slug(source_code))
+
+    wb_dates = resolve_worldbank_source_dates(wb_codes)
+    owid_dates = resolve_owid_source_dates(owid_slugs)
+    _source_date_cache.update({f"wb:{k}": v for k, v in wb_dates.items()})
+    _source_date_cache.update({f"owid:{k}": v for k, v in owid_dates.items()})
+
+    known = sum(1 for v in list(wb_dates.values()) + list(owid_dates.values()) if v)
+    log(f"[INFO] Source dates resolved: {known}/{len(wb_dates) + len(owid_dates)} "
+        f"(WorldBank {len(wb_dates)}, OWID {len(owid_dates)})")
+
+def config_changed(kpi_id: str, config: str, fetch_status: dict) -> bool:
+    """Konfiguration anders als beim letzten Abruf (oder noch nie gespeichert)?"""
+    return (fetch_status.get("kpis", {}).get(kpi_id) or {}).get("config") != config
+
 def should_fetch(kpi_id: str, source_date: Optional[str], fetch_status: dict) -> bool:
     local_info = fetch_status.get("kpis", {}).get(kpi_id)
     if not local_info:
@@ -239,469 +734,726 @@ def should_fetch(kpi_id: str, source_date: Optional[str], fetch_status: dict) ->
 # ======================================================================
 # 🌐 Datenquellen – World Bank & CSV
 # ======================================================================
-def fetch_worldbank_series(code: str) -> Optional[List[Dict[str, Any]]]:
-    url = f"https://api.worldbank.org/v2/country/all/indicator/{code}?format=json&per_page=20000"
+WB_PAGE_SIZE      = 10000     # Zeilen pro API-Seite
+WB_BULK_THRESHOLD = 200000    # ab so vielen Zeilen → Bulk-CSV/ZIP statt Paging
+
+def _worldbank_page(code: str, page: int, stats=None, cached: bool = False):
+    """Lädt eine API-Seite und liefert (Header, Zeilen, Response)."""
+    url = (f"{WB_API_BASE}/country/all/indicator/{code}"
+           f"?format=json&per_page={WB_PAGE_SIZE}&page={page}")
+    r = cached_get(url, stats, timeout=40) if cached else http_get(url, timeout=40)
+    if r.status_code not in (200, 304):
+        raise Exception(f"HTTP {r.status_code} (page {page})")
+    data = r.json()
+    if not isinstance(data, list) or len(data) < 2 or not isinstance(data[0], dict):
+        raise ValueError(f"Unexpected World Bank format (page {page})")
+    return data[0], data[1] or [], r
+
+def _iter_worldbank_pages(code: str, first_rows: List[Dict[str, Any]], pages: int, total: int):
+    """Liefert Seite 1 und lädt die restlichen Seiten parallel (gleitendes Fenster)."""
+    yielded = 0
+    for row in first_rows:
+        yielded += 1
+        yield row
+    if pages > 1:
+        window = HOST_LIMITS["api.worldbank.org"]
+        with ThreadPoolExecutor(max_workers=window) as pool:
+            queued = {}
+            next_page = 2
+            for page in range(2, pages + 1):
+                # Nur `window` Seiten gleichzeitig im Speicher halten
+                while next_page <= pages and len(queued) < window:
+                    queued[next_page] = pool.submit(_worldbank_page, code, next_page)
+                    next_page += 1
+                _, rows, _ = queued.pop(page).result()
+                for row in rows:
+                    yielded += 1
+                    yield row
+    if total and yielded < total:
+        log(f"[WARN] WorldBank {code}: received {yielded} of {total} rows")
+
+def iter_worldbank_bulk(code: str):
+    """
+    Streamt den Bulk-Download (ZIP mit breitem CSV: ein Jahr pro Spalte)
+    über eine temporäre Datei und liefert Zeilen im Format der JSON-API.
+    """
+    url = f"{WB_API_BASE}/en/indicator/{code}?downloadformat=csv"
+    with tempfile.TemporaryFile() as tmp:
+        # Host-Limit bis der Body da ist (wie download()); Verbindung danach bzw.
+        # bei Fehlern sofort an den Pool zurückgeben
+        host = (urlparse(url).hostname or "").lower()
+        with _host_semaphore(host), get_session().get(url, timeout=120, stream=True) as resp:
+            if resp.status_code != 200:
+                raise Exception(f"HTTP {resp.status_code} (bulk)")
+            for chunk in resp.iter_content(chunk_size=1 << 16):
+                tmp.write(chunk)
+        tmp.seek(0)
+        with zipfile.ZipFile(tmp) as zf:
+            name = next((n for n in zf.namelist()
+                         if n.startswith("API_") and n.lower().endswith(".csv")), None)
+            if not name:
+                raise Exception("No API_*.csv inside World Bank ZIP")
+            with zf.open(name) as raw:
+                header = None
+                for row in csv.reader(io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")):
+                    if header is None:
+                        # Vor dem Header stehen einige Zeilen mit Quelle & Datum
+                        if row and row[0].strip() == "Country Name":
+                            header = row
+                        continue
+                    for col, val in zip(header[4:], row[4:]):
+                        col = col.strip()
+                        if col.isdigit() and val.strip():
+                            yield {"country": {"value": row[0]}, "countryiso3code": row[1],
+                                   "date": col, "value": val}
+
+def fetch_worldbank_series(code: str, stats=None, kpi_id: str = "", bulk: bool = False,
+                           config_changed: bool = False):
+    """
+    Lädt eine WB-Zeitreihe als Zeilen-Generator (Paging bzw. Bulk-ZIP).
+    Liefert [] wenn der Upstream 304 (unverändert) meldet, None bei Fehlern.
+    """
     try:
-        r = requests.get(url, timeout=40)
-        if r.status_code != 200:
-            raise Exception(f"HTTP {r.status_code}")
-        data = r.json()
-        if not isinstance(data, list) or len(data) < 2 or not isinstance(data[1], list):
-            raise ValueError("Unexpected World Bank format")
-        return data[1]
+        if bulk:
+            return iter_worldbank_bulk(code)
+        header, rows, r = _worldbank_page(code, 1, stats, cached=True)
+        if kpi_id and not_modified(kpi_id, r, stats, config_changed):
+            return []
+        pages = int(header.get("pages") or 1)
+        total = int(header.get("total") or 0)
+        if not rows:
+            return None
+        if total > WB_BULK_THRESHOLD:
+            log(f"[INFO] WorldBank {code}: {total} rows → using bulk download")
+            return iter_worldbank_bulk(code)
+        return _iter_worldbank_pages(code, rows, pages, total)
     except Exception as e:
         log(f"[ERR] WorldBank fetch failed for {code}: {e}")
         return None
 
-def process_worldbank(kpi_id, meta, countries, c_index, a_index, pending, stats):
+def process_worldbank(kpi_id, meta, resolver, pending, stats, config_changed: bool = False):
     code = meta.get("source_code") or meta.get("code")
     if not code:
         keep_or_dummy(kpi_id, "missing source_code", stats)
         return
-    rows = fetch_worldbank_series(code)
-    if not rows:
+    rows = fetch_worldbank_series(code, stats, kpi_id, bulk=bool(meta.get("wb_bulk")),
+                                  config_changed=config_changed)
+    if rows == []:
+        return   # 304 – lokale Daten bleiben unverändert
+    if rows is None:
         keep_or_dummy(kpi_id, f"WorldBank fetch failed ({code})", stats)
         return
     out = []
-    for row in rows:
-        val = row.get("value")
-        if val is None:
-            continue
-        cname = (row.get("country") or {}).get("value") or row.get("countryiso3code") or ""
-        canon = canonicalize_country(cname, c_index, a_index, countries, pending, stats)
-        if not canon:
-            continue
-        try:
-            year = int(row.get("date"))
-            out.append({"country": canon,"iso2":"","year":year,"value":float(val)})
-        except:
-            continue
+    try:
+        for row in rows:
+            val = row.get("value")
+            if val is None:
+                continue
+            cname = (row.get("country") or {}).get("value") or row.get("countryiso3code") or ""
+            canon = canonicalize_country(cname, resolver, pending, stats)
+            if not canon:
+                continue
+            try:
+                year = int(row.get("date"))
+                out.append({"country": canon,"iso2":"","year":year,"value":float(val)})
+            except:
+                continue
+    except Exception as e:
+        log(f"[ERR] WorldBank download aborted for {code}: {e}")
+        keep_or_dummy(kpi_id, f"WorldBank fetch failed ({code})", stats)
+        return
     if out:
-        save_records(kpi_id, out)
+        saved = save_records(kpi_id, out, stats, meta.get("merge_policy"))
         stats["wb_success"] += 1
-        stats["saved_records"] += len(out)
-        log(f"[OK] WorldBank KPI saved: {kpi_id} ({len(out)} rows)")
+        stats["saved_records"] += saved
+        log(f"[OK] WorldBank KPI saved: {kpi_id} ({saved} rows)")
     else:
         keep_or_dummy(kpi_id, f"WorldBank empty {code}", stats)
 
-def process_csv(kpi_id, meta, countries, c_index, a_index, pending, stats):
-    csv_name = meta.get("source_code") or meta.get("code") or f"{kpi_id}.csv"
-    path = os.path.join(SOURCE_CSV_DIR, csv_name)
+# ======================================================================
+# 📦 Quell-Tabellen (ein Download / ein Parse pro Quelle, Fan-out auf KPIs)
+# ======================================================================
+def iter_table(path: str, member: Optional[str] = None, lower: bool = False,
+               sep: str = ",", skipinitialspace: bool = False,
+               chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    CSV (Datei oder ZIP-Mitglied) als Text-Spalten, in Stücken zu chunksize
+    Zeilen (None = am Stück). Wie csv.DictReader: doppelte Header → letzte
+    Spalte gewinnt, überzählige Felder werden ignoriert. lower=True → Header
+    getrimmt + klein. Leere Datei → keine Tabelle.
+    """
+    header: Optional[List[str]] = None
+    done = 0   # bereits gelieferte Datenzeilen (für den Fallback mitten in der Datei)
 
-    if not os.path.exists(path):
-        keep_or_dummy(kpi_id, f"CSV missing {csv_name}", stats)
+    def named(df: pd.DataFrame) -> pd.DataFrame:
+        cols = pd.Index([str(h).strip().lower() if lower else str(h) for h in header])
+        df.columns = cols
+        return df.loc[:, ~cols.duplicated(keep="last")]
+
+    try:
+        with open_csv_text(path, member) as text:
+            reader = pd.read_csv(text, header=None, dtype=str, keep_default_na=False, index_col=False,
+                                 sep=sep, skipinitialspace=skipinitialspace, chunksize=chunksize)
+            for raw in ([reader] if chunksize is None else reader):
+                if header is None:
+                    if not len(raw):
+                        return
+                    header = raw.iloc[0].tolist()
+                    raw = raw.iloc[1:]
+                done += len(raw)
+                yield named(raw.reset_index(drop=True))
+        return
+    except pd.errors.EmptyDataError:
         return
+    except pd.errors.ParserError:
+        pass
+
+    # uneinheitliche Feldanzahl → Zeilen über csv.reader auf Header-Länge bringen
+    with open_csv_text(path, member) as text:
+        rows = (r for r in csv.reader(text, delimiter=sep, skipinitialspace=skipinitialspace) if r)
+        first = next(rows, None)
+        if first is None:
+            return
+        header, width = header or first, len(first)
+        rows = itertools.islice(rows, done, None)
+        emitted = done > 0
+        while True:
+            block = list(itertools.islice(rows, chunksize))
+            if not block and emitted:
+                return
+            emitted = True
+            yield named(pd.DataFrame([(r + [None] * width)[:width] for r in block], columns=range(width)))
+            if chunksize is None:
+                return
+
+def read_table(path: str, member: Optional[str] = None, **kwargs) -> Optional[pd.DataFrame]:
+    """iter_table am Stück → eine Tabelle (leere Datei → None)."""
+    return next(iter_table(path, member, **kwargs), None)
+
+class SourcePayload:
+    """
+    Eine Quelle (Download oder lokale Datei) für alle KPIs, die darauf zeigen.
+    Download und Parsen passieren höchstens einmal; jeder KPI wendet danach nur
+    seinen Adapter auf dieselbe Tabelle an. Fehler werden ebenfalls gemerkt.
+    Ausnahme frames(): Dateien ab STREAM_PARSE_BYTES liest jeder KPI selbst in
+    Stücken, statt die ganze Tabelle als Text-Spalten im Speicher zu halten.
+    Thread-safe: wer während eines laufenden Downloads kommt, wartet auf ihn.
+    Wiederverwendungen zählen in stats["downloads_saved"] / ["parses_saved"].
+    """
+    def __init__(self, url: Optional[str] = None, path: Optional[str] = None, timeout: int = 60,
+                 reader=None, **read_kwargs):
+        self.url = url
+        self.path = path
+        self.timeout = timeout
+        # reader(payload, chunksize) → iter_table(...)
+        self.reader = reader or (lambda payload, chunksize: iter_table(payload.path, chunksize=chunksize,
+                                                                       **read_kwargs))
+        self.member: Optional[str] = None
+        self.dl: Optional[Download] = None
+        self._fetch_error: Optional[Exception] = None
+        self._frame = None
+        self._frame_error: Optional[Exception] = None
+        self._parsed = False
+        self._lock = threading.Lock()
+
+    def fetch(self, stats=None) -> Download:
+        """Lädt beim ersten Aufruf herunter (nur 200/304), danach dasselbe Ergebnis."""
+        with self._lock:
+            if self.dl is None and self._fetch_error is None:
+                try:
+                    dl = download(self.url, stats, timeout=self.timeout)
+                    if dl.status_code not in (200, 304):
+                        dl.close()
+                        raise Exception(f"HTTP {dl.status_code}")
+                    self.dl, self.path = dl, dl.path
+                except Exception as e:
+                    self._fetch_error = e
+            elif stats is not None:
+                stats["downloads_saved"] = stats.get("downloads_saved", 0) + 1
+        if self._fetch_error is not None:
+            raise self._fetch_error
+        return self.dl
+
+    def frame(self, stats=None) -> Optional[pd.DataFrame]:
+        with self._lock:
+            if not self._parsed:
+                try:
+                    self._frame = next(iter(self.reader(self, None)), None)
+                except Exception as e:
+                    self._frame_error = e
+                self._parsed = True
+            elif stats is not None:
+                stats["parses_saved"] = stats.get("parses_saved", 0) + 1
+        if self._frame_error is not None:
+            raise self._frame_error
+        return self._frame
+
+    def frames(self, stats=None, whole: bool = False) -> Iterator[pd.DataFrame]:
+        """
+        Tabelle(n) für einen KPI: kleine Dateien (oder whole=True) als die eine
+        geteilte Tabelle aus frame(), große stückweise zu TABLE_CHUNK_ROWS Zeilen.
+        """
+        if whole or self._parsed or os.path.getsize(self.path) < STREAM_PARSE_BYTES:
+            frame = self.frame(stats)
+            if frame is not None:
+                yield frame
+            return
+        yield from self.reader(self, TABLE_CHUNK_ROWS)
+
+    def close(self):
+        """Gibt Tabelle und (temporären) Download frei."""
+        with self._lock:
+            if self.dl is not None:
+                self.dl.close()
+            self._frame = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def owid_url(source_code: str) -> str:
+    return f"{OWID_GRAPHER_BASE}/{source_code}"
+
+def unhcr_source_code(meta) -> str:
+    source_code = meta.get("source_code") or "population?download=true"
+    return source_code if source_code.startswith("population") else "population?download=true"
 
-    # 🔧 BOM-kompatibel öffnen & Header normalisieren
-    with open(path, "r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        if reader.fieldnames:
-            reader.fieldnames = [h.strip().lower() for h in reader.fieldnames]
+def csv_source_path(kpi_id: str, meta) -> str:
+    csv_name = meta.get("source_code") or meta.get("code") or f"{kpi_id}.csv"
+    return os.path.join(SOURCE_CSV_DIR, csv_name)
+
+def source_type_of(meta) -> str:
+    return (meta.get("source_type") or meta.get("type") or "").lower().strip()
+
+# Query-Parameter ohne Einfluss auf die gelieferten Daten (OWID: Cache-Version, UI-Overlay)
+IGNORED_QUERY_PARAMS = {"v", "overlay"}
+
+def normalize_url(url: str) -> str:
+    """Schema/Host klein, Fragment weg, Query sortiert und ohne IGNORED_QUERY_PARAMS."""
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k.lower() not in IGNORED_QUERY_PARAMS)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+def source_url(meta) -> Optional[str]:
+    source_type = source_type_of(meta)
+    if source_type == "owid" and meta.get("source_code"):
+        return owid_url(meta["source_code"])
+    if source_type == "unhcr":
+        return f"{UNHCR_BASE_URL}{unhcr_source_code(meta)}"
+    return None
 
-        out = []
-        for r in reader:
-            cname = (r.get("country") or "").strip()
-            if not cname:
-                continue
+def source_key(meta) -> Optional[str]:
+    """Gemeinsame Quelle mehrerer KPIs (normalisierte URL bzw. CSV-Pfad); None = eigener Abruf."""
+    url = source_url(meta)
+    if url:
+        return normalize_url(url)
+    if source_type_of(meta) == "csv":
+        kpi_id = meta.get("filename") or meta.get("id") or ""
+        return os.path.normpath(csv_source_path(kpi_id, meta))
+    return None
 
-            canon = canonicalize_country(cname, c_index, a_index, countries, pending, stats)
-            if not canon:
-                continue
+def new_payload(meta) -> Optional[SourcePayload]:
+    source_type = source_type_of(meta)
+    if source_type == "owid" and meta.get("source_code"):
+        return SourcePayload(url=source_url(meta), timeout=30)
+    if source_type == "unhcr":
+        return SourcePayload(url=source_url(meta), timeout=60, reader=read_unhcr_table)
+    if source_type == "csv":
+        return SourcePayload(path=source_key(meta), lower=True)
+    return None
 
-            year = r.get("year")
-            val = safe_float(r.get("value"))
-            if not year or val is None:
-                continue
+class DownloadRegistry:
+    """
+    Geteilte Quellen eines Laufs, Schlüssel = source_key (normalisierte URL).
+    KPIs derselben Quelle teilen sich Download und geparste Tabelle – auch wenn
+    sie gleichzeitig in verschiedenen Workern laufen. expect() meldet die KPIs
+    an; gibt der letzte seine Quelle frei (release), wird sie verworfen.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._payloads: Dict[str, SourcePayload] = {}
+        self._users: Dict[str, int] = {}
+
+    def expect(self, kpi_list: List[Dict[str, Any]]):
+        for meta in kpi_list:
+            key = source_key(meta)
+            if key is not None:
+                self._users[key] = self._users.get(key, 0) + 1
+
+    def shared_sources(self) -> int:
+        return sum(1 for n in self._users.values() if n > 1)
+
+    def acquire(self, meta) -> Optional[SourcePayload]:
+        key = source_key(meta)
+        if key is None:
+            return None
+        with self._lock:
+            payload = self._payloads.get(key)
+            if payload is None:
+                payload = self._payloads[key] = new_payload(meta)
+            return payload
+
+    def release(self, meta):
+        """Ein KPI ist fertig (auch wenn er übersprungen wurde) → ggf. Quelle verwerfen."""
+        key = source_key(meta)
+        if key is None:
+            return
+        with self._lock:
+            self._users[key] = self._users.get(key, 1) - 1
+            payload = self._payloads.pop(key, None) if self._users[key] <= 0 else None
+        if payload is not None:
+            payload.close()
+
+    def close(self):
+        with self._lock:
+            payloads, self._payloads = list(self._payloads.values()), {}
+        for payload in payloads:
+            payload.close()
+
+def apply_adapter(source_type, meta, frame, resolver, pending, stats):
+    """Kompilierter Adapter des KPIs auf die (geteilte) Tabelle → (Problem, Records)."""
+    adapter = compile_adapter(meta, source_type)
+    return adapter.apply(frame, lambda names: canonicalize_column(names, resolver, pending, stats))
+
+def apply_adapter_frames(source_type, meta, payload: SourcePayload, resolver, pending, stats):
+    """
+    Wie apply_adapter, aber über payload.frames() (ggf. stückweise).
+    → (Problem, Records, Spalten; None = keine Tabelle/kein Header)
+    """
+    adapter = compile_adapter(meta, source_type)
+    canonicalize = lambda names: canonicalize_column(names, resolver, pending, stats)
+    records, columns = [], None
+    for frame in payload.frames(stats, whole=adapter.needs_whole_table):
+        columns = list(frame.columns)
+        problem, out = adapter.apply(frame, canonicalize)
+        if problem:
+            return problem, [], columns
+        records.extend(out)
+    if columns is None:
+        return adapter.apply(None, canonicalize)[0], [], None
+    return None, records, columns
 
-            try:
-                y = int(float(year))
-            except Exception:
-                continue
+# ======================================================================
+# 📄 CSV-Quellen (lokal, source_csv/)
+# ======================================================================
+def process_csv(kpi_id, meta, resolver, pending, stats, payload: Optional[SourcePayload] = None):
+    csv_name = meta.get("source_code") or meta.get("code") or f"{kpi_id}.csv"
+    path = csv_source_path(kpi_id, meta)
 
-            out.append({
-                "country": canon,
-                "iso2": r.get("iso2", ""),
-                "year": y,
-                "value": val
-            })
+    if not os.path.exists(path):
+        keep_or_dummy(kpi_id, f"CSV missing {csv_name}", stats)
+        return
 
-    # 🧩 Sonderbehandlung: Natural Disaster-CSV automatisch normalisieren
-    if kpi_id == "number_of_recorded_natural_disasters" and not out:
-        try:
-            import pandas as pd
-            df = pd.read_csv(path)
-            df.columns = [c.strip() for c in df.columns]
-            if "Total disasters" in df.columns:
-                df["value"] = df["Total disasters"]
-            else:
-                numeric_cols = [
-                    c for c in df.columns
-                    if c not in ("Entity", "Code", "Year")
-                    and df[c].dtype != "object"
-                ]
-                df["value"] = df[numeric_cols].sum(axis=1)
-            df = df.rename(columns={"Entity": "country", "Year": "year"})
-            df = df[["country", "year", "value"]]
-
-            out = []
-            for _, r in df.iterrows():
-                cname = str(r["country"]).strip()
-                canon = canonicalize_country(cname, c_index, a_index, countries, pending, stats)
-                if not canon:
-                    continue
-                try:
-                    y = int(float(r["year"]))
-                    val = safe_float(r["value"])
-                    if val is None:
-                        continue
-                    out.append({"country": canon, "iso2": "", "year": y, "value": val})
-                except Exception:
-                    continue
-            if out:
-                log(f"🔄 Auto-normalized Natural Disasters CSV ({len(out)} rows)")
-        except Exception as e:
-            log(f"[WARN] Natural Disasters CSV normalization failed: {e}")
+    payload = payload or SourcePayload(path=path, lower=True)
+    _, out = apply_adapter("csv", meta, payload.frame(stats), resolver, pending, stats)
 
     if out:
-        save_records(kpi_id, out)
+        saved = save_records(kpi_id, out, stats, meta.get("merge_policy"))
         stats["csv_success"] += 1
-        stats["saved_records"] += len(out)
-        log(f"[OK] CSV KPI saved: {kpi_id} ({len(out)} rows)")
+        stats["saved_records"] += saved
+        log(f"[OK] CSV KPI saved: {kpi_id} ({saved} rows)")
     else:
         keep_or_dummy(kpi_id, f"CSV empty {csv_name}", stats)
 
-        
 # ======================================================================
 # 🧭 OWID Fetch
 # ======================================================================
-def process_owid(kpi_id, meta, countries, c_index, a_index, pending, stats):
+def process_owid(kpi_id, meta, resolver, pending, stats, payload: Optional[SourcePayload] = None,
+                 config_changed: bool = False):
     source_code = meta.get("source_code")
     if not source_code:
         keep_or_dummy(kpi_id, "missing source_code", stats)
         return
 
-    url = f"https://ourworldindata.org/grapher/{source_code}"
-
-    # --- Versuch, Daten abzurufen ---
-    try:
-        resp = requests.get(url, timeout=30)
-        if resp.status_code != 200:
-            raise Exception(f"HTTP {resp.status_code}")
-        text = resp.text
-    except Exception as e:
-        log(f"[ERR] OWID fetch failed for {source_code}: {e}")
-        keep_or_dummy(kpi_id, f"OWID fetch failed {source_code}", stats)
-        # 🔧 Pending-Datei bei Netzwerkfehlern mit Endung .txt
-        safe_name = safe_pending_filename(f"{kpi_id}_{source_code}_error") + ".txt"
-        ensure_dirs()
-        with open(os.path.join(PENDING_DIR, safe_name), "w", encoding="utf-8") as f:
-            f.write(str(e))
-        return
-
-    reader = csv.DictReader(io.StringIO(text))
-    cols = reader.fieldnames or []
-
-    # --- Formatprüfung ---
-    if not {"Entity", "Code", "Year"}.issubset(set(cols)):
-        # 🔧 Pending-Datei bei unbekanntem Format mit Endung .csv
-        safe_name = safe_pending_filename(f"{kpi_id}_{source_code}_format_unknown") + ".csv"
-        ensure_dirs()
-        with open(os.path.join(PENDING_DIR, safe_name), "w", encoding="utf-8") as f:
-            f.write(text)
-        log(f"[WARN] OWID format unknown → pending saved: {safe_name}")
-        keep_or_dummy(kpi_id, f"OWID format unknown {source_code}", stats)
-        return
-
-    var_cols = [c for c in cols if c not in ("Entity", "Code", "Year")]
-    if not var_cols:
-        keep_or_dummy(kpi_id, f"OWID no data column {source_code}", stats)
-        return
-
-    var = var_cols[0]
-    out = []
-
-    for row in reader:
-        cname = row.get("Entity", "").strip()
-
-        # --- 🔧 Spezialfall: globale Natural Disasters (All disasters) ---
-        if cname.lower() in ["all disasters", "all disasters (total)"]:
-            cname = "World"
-
-        canon = canonicalize_country(cname, c_index, a_index, countries, pending, stats)
-
-        # 🔧 World-Fallback, falls Mapping leer
-        if not canon and cname.lower() == "world":
-            canon = "World"
-
-        if not canon:
-            continue
-
-        year = row.get("Year")
-        val = safe_float(row.get(var))
-        if val is None or not year:
-            continue
+    with ExitStack() as stack:
+        if payload is None:
+            payload = stack.enter_context(SourcePayload(url=owid_url(source_code), timeout=30))
 
+        # --- Versuch, Daten abzurufen (Body wird auf Platte gestreamt) ---
         try:
-            y = int(float(year))
-        except Exception:
-            continue
+            dl = payload.fetch(stats)
+        except Exception as e:
+            log(f"[ERR] OWID fetch failed for {source_code}: {e}")
+            keep_or_dummy(kpi_id, f"OWID fetch failed {source_code}", stats)
+            # 🔧 Pending-Datei bei Netzwerkfehlern mit Endung .txt
+            safe_name = safe_pending_filename(f"{kpi_id}_{source_code}_error") + ".txt"
+            ensure_dirs()
+            with open(os.path.join(PENDING_DIR, safe_name), "w", encoding="utf-8") as f:
+                f.write(str(e))
+            return
+
+        if not_modified(kpi_id, dl.resp, stats, config_changed):
+            return
+        problem, out, _ = apply_adapter_frames("owid", meta, payload, resolver, pending, stats)
+        if problem == "format":
+            # 🔧 Pending-Datei bei unbekanntem Format mit Endung .csv
+            safe_name = safe_pending_filename(f"{kpi_id}_{source_code}_format_unknown") + ".csv"
+            ensure_dirs()
+            dl.copy_to(os.path.join(PENDING_DIR, safe_name))
+            log(f"[WARN] OWID format unknown → pending saved: {safe_name}")
+            keep_or_dummy(kpi_id, f"OWID format unknown {source_code}", stats)
+            return
+        if problem == "no_column":
+            keep_or_dummy(kpi_id, f"OWID no data column {source_code}", stats)
+            return
+
+        # --- Ergebnisbehandlung ---
+        if out:
+            saved = save_records(kpi_id, out, stats, meta.get("merge_policy"))
+            stats["owid_success"] += 1
+            stats["saved_records"] += saved
+            log(f"[OK] OWID KPI saved: {kpi_id} ({saved} rows)")
+        else:
+            # 🔧 Fix: sichere Pending-Datei bei leeren Daten + .csv-Endung
+            safe_name = safe_pending_filename(f"{kpi_id}_{source_code}_nodata") + ".csv"
+            ensure_dirs()
+            dl.copy_to(os.path.join(PENDING_DIR, safe_name))
+            log(f"[WARN] OWID no data → pending saved: {safe_name}")
+            keep_or_dummy(kpi_id, f"OWID empty {source_code}", stats)
 
-        out.append({
-            "country": canon,
-            "iso2": "OWID_WRL" if canon == "World" else row.get("Code", ""),
-            "year": y,
-            "value": val
-        })
+# ======================================================================
+# 🕊️ UNHCR Fetch (ZIP/CSV, Encoding & Header-robust)
+# ======================================================================
+UNHCR_BASE_URL = "https://api.unhcr.org/population/v1/"
+
+def read_unhcr_table(payload: SourcePayload, chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """CSV direkt oder aus dem ZIP; Trennzeichen anhand einer Stichprobe erkannt."""
+    member = None
+    if payload.dl.is_zip():
+        with zipfile.ZipFile(payload.path) as zf:
+            info = next((i for i in zf.infolist() if i.filename.lower().endswith(".csv")), None)
+        if not info:
+            raise Exception("No CSV file inside ZIP")
+        member = info.filename
+        log(f"[INFO] Reading CSV '{member}' from UNHCR ZIP ({info.file_size} bytes)")
+    payload.member = member
+    with open_csv_text(payload.path, member) as text:
+        sample = text.read(4096)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=[",", ";", "\t"])
+    except Exception:
+        dialect = csv.excel
+    return iter_table(payload.path, member, sep=dialect.delimiter, skipinitialspace=True, chunksize=chunksize)
 
+def process_unhcr(kpi_id, meta, resolver, pending, stats, payload: Optional[SourcePayload] = None,
+                  config_changed: bool = False):
+    source_code = unhcr_source_code(meta)
+    safe_code = re.sub(r'[^a-zA-Z0-9._-]', '_', source_code)
 
-        year = row.get("Year")
-        val = safe_float(row.get(var))
-        if val is None or not year:
-            continue
+    with ExitStack() as stack:
+        if payload is None:
+            payload = stack.enter_context(SourcePayload(url=f"{UNHCR_BASE_URL}{source_code}", timeout=60,
+                                                        reader=read_unhcr_table))
 
+        # --- Download (gestreamt auf Platte) ---
         try:
-            y = int(float(year))
-        except Exception:
-            continue
-
-        out.append({
-            "country": canon,
-            "iso2": row.get("Code", ""),
-            "year": y,
-            "value": val
-        })
+            dl = payload.fetch(stats)
+        except Exception as e:
+            log(f"[ERR] UNHCR fetch failed for {source_code}: {e}")
+            keep_or_dummy(kpi_id, f"UNHCR fetch failed {source_code}", stats)
+            ensure_dirs()
+            with open(os.path.join(PENDING_DIR, f"{kpi_id}_{safe_code}_error.txt"), "w", encoding="utf-8") as f:
+                f.write(str(e))
+            return
+
+        if not_modified(kpi_id, dl.resp, stats, config_changed):
+            return
+
+        def dump_pending(suffix: str):
+            """Kopiert das (entpackte) CSV nur im Fehlerfall nach /pending."""
+            ensure_dirs()
+            with open_csv_text(dl.path, payload.member) as src, \
+                 open(os.path.join(PENDING_DIR, f"{kpi_id}_{safe_code}_{suffix}.csv"), "w", encoding="utf-8") as dst:
+                shutil.copyfileobj(src, dst)
 
-    # --- Ergebnisbehandlung ---
-    if out:
-        save_records(kpi_id, out)
-        stats["owid_success"] += 1
-        stats["saved_records"] += len(out)
-        log(f"[OK] OWID KPI saved: {kpi_id} ({len(out)} rows)")
-    else:
-        # 🔧 Fix: sichere Pending-Datei bei leeren Daten + .csv-Endung
-        safe_name = safe_pending_filename(f"{kpi_id}_{source_code}_nodata") + ".csv"
-        ensure_dirs()
-        with open(os.path.join(PENDING_DIR, safe_name), "w", encoding="utf-8") as f:
-            f.write(text)
-        log(f"[WARN] OWID no data → pending saved: {safe_name}")
-        keep_or_dummy(kpi_id, f"OWID empty {source_code}", stats)
+        try:
+            problem, out, columns = apply_adapter_frames("unhcr", meta, payload, resolver, pending, stats)
+        except AdapterError:
+            raise
+        except Exception as e:
+            log(f"[ERR] Failed to decode UNHCR response for {source_code}: {e}")
+            keep_or_dummy(kpi_id, f"UNHCR decode error {source_code}", stats)
+            return
+
+        if not columns:
+            dump_pending("empty")
+            log(f"[WARN] UNHCR CSV has no header → pending: {safe_code}")
+            keep_or_dummy(kpi_id, f"UNHCR no header {safe_code}", stats)
+            return
+
+        if problem:
+            ensure_dirs()
+            with open(os.path.join(PENDING_DIR, f"{kpi_id}_{safe_code}_cols.txt"), "w", encoding="utf-8") as f:
+                f.write("\n".join(columns))
+            log(f"[WARN] UNHCR column mapping failed → pending: {safe_code}")
+            keep_or_dummy(kpi_id, f"UNHCR unknown format {safe_code}", stats)
+            return
+
+        if out:
+            log(f"[INFO] Parsed {len(out)} UNHCR records")
+            saved = save_records(kpi_id, out, stats, meta.get("merge_policy"))
+            stats["unhcr_success"] = stats.get("unhcr_success",0)+1
+            stats["saved_records"] += saved
+            log(f"[OK] UNHCR KPI saved: {kpi_id} ({saved} rows)")
+        else:
+            dump_pending("nodata")
+            keep_or_dummy(kpi_id, f"UNHCR empty {safe_code}", stats)
 
 # ======================================================================
-# 🕊️ UNHCR Fetch (ZIP/CSV, Encoding & Header-robust)
+# 🧵 KPI-Worker (läuft parallel, arbeitet nur auf eigenen Stats/Pending)
 # ======================================================================
-def process_unhcr(kpi_id, meta, countries, c_index, a_index, pending, stats):
-    def _norm_local(s: str) -> str:
-        s = "".join(c for c in unicodedata.normalize("NFKD", str(s).lower()) if not unicodedata.combining(c))
-        return re.sub(r"[^a-z0-9]+", " ", s).strip()
-
-    def _find_col(cols_list, *patterns):
-        norms = {c: _norm_local(c) for c in cols_list}
-        pats  = [(_norm_local(p) if isinstance(p, str) else "") for p in patterns if p]
-        for c, cn in norms.items():
-            for p in pats:
-                if p and p in cn:
-                    return c
-        return None
-
-    source_code = meta.get("source_code") or "population?download=true"
-    base_url = "https://api.unhcr.org/population/v1/"
-    if not source_code.startswith("population"):
-        source_code = "population?download=true"
-    url = f"{base_url}{source_code}"
-    safe_code = re.sub(r'[^a-zA-Z0-9._-]', '_', source_code)
+def new_stats() -> Dict[str, Any]:
+    return {
+        "countries_loaded": 0, "kpis_loaded": 0, "saved_records": 0, "dummies": 0,
+        "mapped_ok": 0, "mapped_drop": 0, "mapped_pending": 0, "new_pending": set(),
+        "wb_success": 0, "csv_success": 0, "owid_success": 0, "unhcr_success": 0,
+        "errors": 0, "skipped": 0,
+        "http_cache_hits": 0, "http_cache_misses": 0, "not_modified": 0,
+        "downloads_saved": 0, "parses_saved": 0,
+        "merged_duplicates": 0
+    }
 
-    # --- Download ---
-    try:
-        resp = requests.get(url, timeout=60)
-        if resp.status_code != 200:
-            raise Exception(f"HTTP {resp.status_code}")
-    except Exception as e:
-        log(f"[ERR] UNHCR fetch failed for {source_code}: {e}")
-        keep_or_dummy(kpi_id, f"UNHCR fetch failed {source_code}", stats)
-        open(os.path.join(PENDING_DIR, f"{kpi_id}_{safe_code}_error.txt"), "w", encoding="utf-8").write(str(e))
-        return
+def merge_stats(total: Dict[str, Any], part: Dict[str, Any]):
+    """Addiert Zähler und vereinigt Sets eines KPI-Laufs in die Gesamtstatistik."""
+    for key, val in part.items():
+        if isinstance(val, set):
+            total.setdefault(key, set()).update(val)
+        elif isinstance(val, (int, float)):
+            total[key] = total.get(key, 0) + val
 
-    # --- Extract text from ZIP or response ---
-    content_type = (resp.headers.get("Content-Type") or "").lower()
-    text = None
+def fetch_kpi(meta, resolver, known_status, registry: Optional[DownloadRegistry] = None) -> Dict[str, Any]:
+    """
+    Verarbeitet genau einen KPI. Stats, Pending und Logzeilen werden lokal
+    gesammelt und erst im Haupt-Thread zusammengeführt.
+    registry: lauf-weit geteilte Downloads (siehe DownloadRegistry).
+    """
+    stats = new_stats()
+    pending: Dict[str, str] = {}
+    status_entry = None
+    kpi_id = meta.get("filename") or meta.get("id") or meta.get("title") or "kpi"
+    _thread_state.log_buffer = []
     try:
-        if "zip" in content_type or resp.content[:2] == b"PK":
-            with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
-                name = next((n for n in zf.namelist() if n.lower().endswith(".csv")), None)
-                if not name:
-                    raise Exception("No CSV file inside ZIP")
-                raw = zf.read(name)
-                try:
-                    text = raw.decode("utf-8-sig")
-                except UnicodeDecodeError:
-                    text = raw.decode("utf-16")
-                log(f"[INFO] Extracted CSV '{name}' from UNHCR ZIP ({len(text)} bytes)")
+        source_type = source_type_of(meta)
+        source_code = meta.get("source_code") or meta.get("code") or ""
+        source_date = None
+
+        # Quelle-spezifisches Datum
+        if source_type == "worldbank" and source_code:
+            source_date = get_source_date_from_worldbank(source_code)
+        elif source_type == "owid" and source_code:
+            source_date = get_source_date_from_owid(owid_url(source_code))
         else:
-            try:
-                resp.encoding = "utf-8-sig"
-                text = resp.text
-                if len(text) < 10 or "PK\x03\x04" in text:
-                    text = resp.content.decode("utf-16")
-            except UnicodeDecodeError:
-                text = resp.content.decode("utf-16")
-    except Exception as e:
-        log(f"[ERR] Failed to decode UNHCR response for {source_code}: {e}")
-        keep_or_dummy(kpi_id, f"UNHCR decode error {source_code}", stats)
-        return
-
-    # --- Normalize newlines & detect dialect ---
-    text = text.replace("\r\n","\n").replace("\r","\n")
-    try:
-        sample = text[:4096]
-        dialect = csv.Sniffer().sniff(sample, delimiters=[",",";","\t"])
-    except Exception:
-        dialect = csv.excel
-
-    try:
-        reader = csv.DictReader(io.StringIO(text), dialect=dialect, skipinitialspace=True)
-    except csv.Error as e:
-        open(os.path.join(PENDING_DIR, f"{kpi_id}_{safe_code}_raw.csv"), "w", encoding="utf-8").write(text)
-        log(f"[ERR] CSV parse error for UNHCR ({safe_code}): {e}")
-        keep_or_dummy(kpi_id, f"CSV parse error {safe_code}", stats)
-        return
+            source_date = "Unknown"
+
+        # Prüfen, ob Fetch nötig (neue Quelle oder geänderte Konfiguration)
+        config = kpi_config_hash(meta, resolver)
+        changed = config_changed(kpi_id, config, known_status)
+        if not changed and not should_fetch(kpi_id, source_date, known_status):
+            stats["skipped"] += 1
+            log(f"[SKIP] {kpi_id} – local data up to date ({source_date})")
+        else:
+            # Quelle verarbeiten (geteilte Quelle aus dem Register, falls vorhanden)
+            payload = registry.acquire(meta) if registry is not None else None
+            if source_type == "worldbank":
+                process_worldbank(kpi_id, meta, resolver, pending, stats, changed)
+            elif source_type == "csv":
+                process_csv(kpi_id, meta, resolver, pending, stats, payload)
+            elif source_type == "owid":
+                process_owid(kpi_id, meta, resolver, pending, stats, payload, changed)
+            elif source_type == "unhcr":
+                process_unhcr(kpi_id, meta, resolver, pending, stats, payload, changed)
+            else:
+                keep_or_dummy(kpi_id, f"unknown source_type {source_type}", stats)
 
-    cols = reader.fieldnames or []
-    if not cols:
-        open(os.path.join(PENDING_DIR, f"{kpi_id}_{safe_code}_empty.csv"), "w", encoding="utf-8").write(text)
-        log(f"[WARN] UNHCR CSV has no header → pending: {safe_code}")
-        keep_or_dummy(kpi_id, f"UNHCR no header {safe_code}", stats)
-        return
+            status_entry = {
+                "source": meta.get("source") or meta.get("source_type") or "unknown",
+                "url": meta.get("source_url") or meta.get("url") or "",
+                "source_date": source_date or "Unknown",
+                "last_fetch": now_utc(),
+                "config": config,
+            }
 
-    # --- Column mapping ---
-    country_key = (_find_col(cols, "country of asylum","territory of asylum","country / territory of asylum")
-                   or _find_col(cols, "country of asylum/residence")
-                   or _find_col(cols, "asylum"))
-    year_key = _find_col(cols, "year")
-    explicit_field = meta.get("unhcr_field")
-    if explicit_field:
-        value_key = _find_col(cols, explicit_field)
-    else:
-        value_key = (_find_col(cols, "refugees under unhcr's mandate")
-                     or _find_col(cols, "refugees (incl. refugee-like situations)")
-                     or _find_col(cols, "refugees"))
-
-    if not all([country_key, year_key, value_key]):
-        open(os.path.join(PENDING_DIR, f"{kpi_id}_{safe_code}_cols.txt"), "w", encoding="utf-8").write("\n".join(cols))
-        log(f"[WARN] UNHCR column mapping failed → pending: {safe_code}")
-        keep_or_dummy(kpi_id, f"UNHCR unknown format {safe_code}", stats)
-        return
+    except AdapterError as e:
+        stats["errors"] += 1
+        log(f"[ERR] Invalid adapter in available_kpis.json – {e}")
+    except Exception as e:
+        stats["errors"] += 1
+        log(f"[ERR] {meta.get('title','unknown')} failed: {e}\n{traceback.format_exc()}")
+    finally:
+        if registry is not None:
+            registry.release(meta)
+        lines = _thread_state.log_buffer
+        _thread_state.log_buffer = None
 
-    # --- Records ---
-    out = []
-    for row in reader:
-        cname = (row.get(country_key) or "").strip()
-        if not cname:
-            continue
-        canon = canonicalize_country(cname, c_index, a_index, countries, pending, stats)
-        if not canon:
-            continue
-        y_raw = row.get(year_key)
-        v_raw = row.get(value_key)
-        if y_raw in (None,"") or v_raw in (None,""):
-            continue
-        val = safe_float(v_raw)
-        if val is None:
-            continue
-        try:
-            year = int(float(y_raw))
-        except Exception:
-            continue
-        out.append({"country":canon,"iso2":"","year":year,"value":val})
+    return {"kpi_id": kpi_id, "status": status_entry, "stats": stats,
+            "pending": pending, "log": lines}
 
-    if out:
-        log(f"[INFO] Parsed {len(out)} UNHCR records ({value_key})")
-        save_records(kpi_id, out)
-        stats["unhcr_success"] = stats.get("unhcr_success",0)+1
-        stats["saved_records"] += len(out)
-        log(f"[OK] UNHCR KPI saved: {kpi_id} ({len(out)} rows)")
-    else:
-        open(os.path.join(PENDING_DIR, f"{kpi_id}_{safe_code}_nodata.csv"), "w", encoding="utf-8").write(text)
-        keep_or_dummy(kpi_id, f"UNHCR empty {safe_code}", stats)
-        
 # ======================================================================
 # 🚀 Main
 # ======================================================================
 def main():
     ensure_dirs()
+    started = time.monotonic()
     log(f"🔐 Using OPENAI_API_KEY: {'found' if os.getenv('OPENAI_API_KEY') else 'missing'}")
     log("=== Fetch started ===")
 
     # --- Bestehenden Status laden ---
     fetch_status = read_json(STATUS_FILE, {"kpis": {}})
+    known_status = copy.deepcopy(fetch_status)   # read-only Snapshot für die Worker
 
-    stats = {
-        "countries_loaded": 0, "kpis_loaded": 0, "saved_records": 0, "dummies": 0,
-        "mapped_ok": 0, "mapped_drop": 0, "mapped_pending": 0, "new_pending": set(),
-        "wb_success": 0, "csv_success": 0, "owid_success": 0, "unhcr_success": 0,
-        "errors": 0, "skipped": 0
-    }
+    stats = new_stats()
 
     # --- Metadaten & Mapping laden ---
     countries = read_json(COUNTRIES_FILE, {})
     mapping   = read_json(COUNTRY_MAP_FILE, {})
     pending   = read_json(COUNTRY_PENDING_FILE, {})
-    c_index, a_index = build_country_indices(countries, mapping)
+    resolver  = CountryResolver(countries, mapping)   # einmal pro Lauf, memoisiert
     stats["countries_loaded"] = len(countries)
 
     raw_kpis = read_json(AVAILABLE_FILE, [])
     kpi_list = [v for v in raw_kpis if isinstance(v, dict)]
     stats["kpis_loaded"] = len(kpi_list)
 
-    # --- KPI-Schleife ---
-    for meta in kpi_list:
-        try:
-            kpi_id = meta.get("filename") or meta.get("id") or meta.get("title") or "kpi"
-            source_type = (meta.get("source_type") or meta.get("type") or "").lower().strip()
-            source_code = meta.get("source_code") or meta.get("code") or ""
-            source_date = None
-
-            # Quelle-spezifisches Datum
-            if source_type == "worldbank" and source_code:
-                source_date = get_source_date_from_worldbank(source_code)
-            elif source_type == "owid" and source_code:
-                source_date = get_source_date_from_owid(f"https://ourworldindata.org/grapher/{source_code}")
-            else:
-                source_date = "Unknown"
-
-            # Prüfen, ob Fetch nötig
-            if not should_fetch(kpi_id, source_date, fetch_status):
-                stats["skipped"] += 1
-                log(f"[SKIP] {kpi_id} – local data up to date ({source_date})")
-                continue
-
-            # Quelle verarbeiten
-            if source_type == "worldbank":
-                process_worldbank(kpi_id, meta, countries, c_index, a_index, pending, stats)
-            elif source_type == "csv":
-                process_csv(kpi_id, meta, countries, c_index, a_index, pending, stats)
-            elif source_type == "owid":
-                process_owid(kpi_id, meta, countries, c_index, a_index, pending, stats)
-            elif source_type == "unhcr":
-                process_unhcr(kpi_id, meta, countries, c_index, a_index, pending, stats)
-            else:
-                keep_or_dummy(kpi_id, f"unknown source_type {source_type}", stats)
+    # --- Lokale Rohdaten (source_raw/) → source_csv/, nur geänderte Konverter ---
+    try:
+        from normalize_runner import run_normalizers
+        run_normalizers()
+    except Exception as e:
+        log(f"[WARN] Normalizers skipped: {e}")
 
-            # Status aktualisieren
-            fetch_status.setdefault("kpis", {})[kpi_id] = {
-                "source": meta.get("source") or meta.get("source_type") or "unknown",
-                "url": meta.get("source_url") or meta.get("url") or "",
-                "source_date": source_date or "Unknown",
-                "last_fetch": now_utc()
-            }
+    # --- Quell-Daten gebündelt vorab auflösen ---
+    prefetch_source_dates(kpi_list)
 
-        except Exception as e:
-            stats["errors"] += 1
-            log(f"[ERR] {meta.get('title','unknown')} failed: {e}\n{traceback.format_exc()}")
+    # --- KPI-Schleife (parallel; Merge ausschließlich im Haupt-Thread) ---
+    # KPIs mit gleicher Quelle teilen sich Download + Parse über das Register (Fan-out per Adapter)
+    registry = DownloadRegistry()
+    registry.expect(kpi_list)
+    log(f"[INFO] Fetching {len(kpi_list)} KPIs with {FETCH_WORKERS} workers "
+        f"({registry.shared_sources()} shared sources)")
+    try:
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            futures = [
+                pool.submit(fetch_kpi, meta, resolver, known_status, registry)
+                for meta in kpi_list
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                emit_log_lines(result["log"])
+                merge_stats(stats, result["stats"])
+                pending.update(result["pending"])
+                if result["status"]:
+                    fetch_status.setdefault("kpis", {})[result["kpi_id"]] = result["status"]
+    finally:
+        registry.close()
 
     # --- Abschluss ---
     fetch_status["lastRun"] = now_utc()
     write_json(STATUS_FILE, fetch_status)
     write_json(COUNTRY_PENDING_FILE, pending)
+    resolver.save()
 
     log(f"[INFO] fetch_status.json updated with {len(fetch_status.get('kpis',{}))} KPIs")
 
@@ -722,7 +1474,11 @@ def main():
         "",
         f"Dummies created:   {stats['dummies']}",
         f"Skipped (up-to-date): {stats['skipped']}",
+        f"Not modified (304): {stats['not_modified']}",
+        f"HTTP cache:        {stats['http_cache_hits']} hits / {stats['http_cache_misses']} misses",
+        f"Shared downloads:  {stats['downloads_saved']} downloads / {stats['parses_saved']} parses saved",
         f"Errors:            {stats['errors']}",
+        f"Workers:           {FETCH_WORKERS} (duration {time.monotonic() - started:.1f}s)",
     ]
 
     # ✂️ Neue Auswertung der Pre-1900-Kürzungen
@@ -732,6 +1488,9 @@ def main():
             f"Pre-1900 cuts:    {stats['trimmed_records']} rows in {len(stats.get('trimmed_kpis', []))} KPIs"
         )
 
+    if stats.get("merged_duplicates", 0) > 0:
+        summary.append(f"Merged duplicates: {stats['merged_duplicates']} (country, year) rows")
+
     summary.extend([
         "=================================",
         "✅ Fetch completed successfully\n"
@@ -749,26 +1508,49 @@ def main():
 if __name__ == "__main__":
     main()
 
+    # Post-Fetch-Pipeline im selben Prozess: alle Schritte teilen den KpiStore,
+    # jeder KPI wird höchstens einmal geparst. Der BuildState sorgt dafür, dass
+    # nur neu berechnet wird, dessen Eingaben sich geändert haben.
+    from build_state import get_build_state
+    store = get_store()
+    state = get_build_state()
+
     try:
-        import subprocess
-        print("➡️ Starte fetch_overall_ranking.py …")
-        subprocess.run(["python", os.path.join(SCRIPT_DIR, "fetch_overall_ranking.py")], check=True)
+        import fetch_overall_ranking
+        print("➡️ Starte fetch_overall_ranking …")
+        fetch_overall_ranking.main(store=store, state=state)
         print("✅ Overall Ranking erfolgreich erstellt.")
     except Exception as e:
         print(f"⚠️ Fehler beim Overall-Ranking: {e}")
 
     try:
-        # === NEW: Consolidated all_kpis_data.json ===
-        print("➡️ Starte fetch_consolidated.py …")
-        subprocess.run(["python", os.path.join(SCRIPT_DIR, "fetch_consolidated.py")], check=True)
-        print("✅ KPI-Daten erfolgreich konsolidiert (data/all_kpis_data.json).")
+        import group_aggregates
+        print("➡️ Starte group_aggregates …")
+        group_aggregates.main(store=store, state=state)
+    except Exception as e:
+        print(f"⚠️ Fehler bei den Gruppen-Aggregaten: {e}")
+
+    try:
+        import fetch_consolidated
+        print("➡️ Starte fetch_consolidated …")
+        fetch_consolidated.main(store=store, state=state)
+        print("✅ KPI-Daten erfolgreich konsolidiert (data/all_kpis_part*.json.gz).")
     except Exception as e:
         print(f"⚠️ Fehler bei Konsolidierung: {e}")
 
     try:
         from analysis import run_global_analysis
         print("➡️ Starte globale KI-Analyse …")
-        run_global_analysis()
+        run_global_analysis(store=store, state=state)
         print("✅ Globale Analyse abgeschlossen (data/analysis.md)")
     except Exception as e:
         print(f"⚠️ Fehler bei der Analyse: {e}")
+
+    # Manifest (Größe + Hash pro Datei, geänderte Dateien seit dem letzten Lauf)
+    try:
+        from publish import write_manifest
+        write_manifest(DATA_DIR)
+    except Exception as e:
+        print(f"⚠️ Fehler beim Manifest: {e}")
+
+    log(f"[INFO] KPI store: {store.stats()}")
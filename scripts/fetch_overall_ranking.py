@@ -8,12 +8,24 @@ RealityCheck – Overall Ranking Generator (Meta-Version)
 • Bewertungslogik: only higher / lower / target
 • Ausschluss: relevance="none" oder world_kpi="e"
 • Klarer Fortschritts- und Fehler-Output
+• Länder × KPI-Matrix (pandas), Gleichstände nach RANK_METHOD,
+  Perzentile je KPI und Gesamt-Score in einem Durchlauf
+• Historische Rankings pro Jahr (overall_ranking_history.json), optional mit
+  Fortschreibung des letzten Werts (RANKING_CARRY_FORWARD Jahre)
 """
 
 import os
 import json
+import hashlib
 from datetime import datetime
 
+import numpy as np
+import pandas as pd
+
+from kpi_store import get_store
+from build_state import get_build_state, file_hash
+from publish import write_json_if_changed
+
 # ======================================================================
 # 🔧 Pfade
 # ======================================================================
@@ -24,8 +36,22 @@ META_DIR   = os.path.join(DATA_DIR, "meta")
 
 AVAILABLE_FILE = os.path.join(META_DIR, "available_kpis.json")
 OUTPUT_FILE    = os.path.join(DATA_DIR, "overall_ranking.json")
+HISTORY_FILE   = os.path.join(DATA_DIR, "overall_ranking_history.json")
 LOG_FILE       = os.path.join(DATA_DIR, "fetch_log.txt")
 
+# Gleichstände: "min" (1,2,2,4), "dense" (1,2,2,3) oder "average" (1,2.5,2.5,4)
+RANK_METHODS = ("min", "dense", "average")
+RANK_METHOD  = os.getenv("RANK_METHOD", "min")
+if RANK_METHOD not in RANK_METHODS:
+    RANK_METHOD = "min"
+
+# Historische Rankings: Startjahr und wie viele Jahre ein Wert weitergetragen wird (0 = aus)
+HISTORY_FROM_YEAR   = int(os.getenv("RANKING_HISTORY_FROM", "1960"))
+CARRY_FORWARD_YEARS = int(os.getenv("RANKING_CARRY_FORWARD", "0"))
+
+# Fun & Safe Haven: KI-Rankings spätestens pro Zeitraum neu (strftime-Format, Standard: Monat)
+FUN_SAFE_PERIOD = os.getenv("FUN_SAFE_PERIOD", "%Y-%m")
+
 # ======================================================================
 # 🧰 Hilfsfunktionen
 # ======================================================================
@@ -41,30 +67,8 @@ def load_json(path):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def get_latest_values(entries):
-    """Findet den neuesten Wert pro Land."""
-    latest = {}
-    for e in entries:
-        country = e.get("country")
-        year = e.get("year")
-        value = e.get("value")
-        if not country or value is None:
-            continue
-        if country not in latest or year > latest[country]["year"]:
-            latest[country] = {"year": year, "value": value}
-    return latest
-
-# ======================================================================
-# 🚀 Main
-# ======================================================================
-def main():
-    log("=== Overall Ranking Generation Started ===")
-
-    if not os.path.exists(AVAILABLE_FILE):
-        log(f"[ERR] Missing {AVAILABLE_FILE}")
-        return
-
-    available = load_json(AVAILABLE_FILE)
+def select_ranking_kpis(available):
+    """Alle KPIs mit Ranking-Kriterium → {filename: meta}."""
     valid_kpis = {}
 
     # === KPI-Auswahl (Filterung) ===
@@ -87,77 +91,372 @@ def main():
 
         valid_kpis[filename] = k
 
-    log(f"✅ {len(valid_kpis)} KPIs considered for ranking")
+    return valid_kpis
 
-    all_ranks = {}
-    missing = []
+def latest_arrays(columns):
+    """Neuester (Land, Jahr, Wert) pro Land als NumPy-Arrays.
+    Die Spalten sind (stabil) nach Land und Jahr sortiert → letzter Jahrgang je
+    Land-Block; bei doppelten Jahren zählt wie bisher der erste Eintrag."""
+    c = np.asarray(columns.c)
+    if not len(c):
+        return np.array([], dtype=object), np.array([]), np.array([])
+    year = np.asarray(columns.year, dtype=float)
+    last = np.r_[np.flatnonzero(c[1:] != c[:-1]), len(c) - 1]
+    starts = np.r_[True, (c[1:] != c[:-1]) | (year[1:] != year[:-1])]
+    first_of_year = np.maximum.accumulate(np.where(starts, np.arange(len(c)), 0))[last]
+    names = np.asarray(columns.countries, dtype=object)[c[last]]
+    return names, year[first_of_year], np.asarray(columns.value, dtype=float)[first_of_year]
 
-    # === KPI-Durchlauf ===
-    for filename, meta in valid_kpis.items():
-        filepath = os.path.join(DATA_DIR, f"{filename}.json")
-        if not os.path.exists(filepath):
+def year_matrix(columns):
+    """Ein KPI als Tabelle Jahr × Land (NaN = kein Wert); doppelte Jahre: erster Eintrag."""
+    df = pd.DataFrame({"c": columns.c, "year": columns.year, "value": columns.value})
+    df = df[np.isfinite(df["value"].astype(float))]
+    df = df.drop_duplicates(["c", "year"], keep="first")
+    wide = df.pivot(index="year", columns="c", values="value").astype(float)
+    wide.columns = [columns.countries[i] for i in wide.columns]
+    return wide
+
+# ======================================================================
+# 📐 Ranking-Engine (Länder × KPI-Matrix)
+# ======================================================================
+def build_latest_matrix(store, valid_kpis):
+    """
+    Liest jeden KPI einmal und baut zwei Matrizen (Index: Land, Spalten: KPI):
+    neuester Wert und zugehöriges Jahr. Fehlende Kombinationen sind NaN.
+    """
+    values, years, missing = {}, {}, []
+    for filename in valid_kpis:
+        try:
+            columns = store.get(filename)
+        except Exception as e:
+            log(f"⚠️ Could not read {filename}: {e}")
+            continue
+        if columns is None:
             missing.append(filename)
             log(f"⚠️ Missing file: {filename}.json")
             continue
+        names, yrs, vals = latest_arrays(columns)
+        ok = np.isfinite(vals)
+        if not ok.any():
+            log(f"⚠️ No numeric values for {filename}")
+            continue
+        values[filename] = pd.Series(vals[ok], index=names[ok])
+        years[filename] = pd.Series(yrs[ok], index=names[ok])
+
+    if missing:
+        log(f"⚠️ Missing {len(missing)} files: {', '.join(missing[:10])} ...")
+    return pd.DataFrame(values), pd.DataFrame(years)
+
+def orient_matrix(values, valid_kpis):
+    """Richtet jede Spalte so aus, dass größer = besser (higher / lower / target)."""
+    sort = pd.Series({k: valid_kpis[k].get("sort") for k in values.columns})
+    target = pd.Series({k: float(valid_kpis[k].get("target_value") or 0) for k in values.columns})
+    oriented = values.copy()
+    lower = sort.index[sort == "lower"]
+    tgt = sort.index[sort == "target"]
+    oriented[lower] = -values[lower]
+    oriented[tgt] = -(values[tgt] - target[tgt]).abs()
+    return oriented
+
+def orient_kpi(frame, meta):
+    """Wie orient_matrix, aber für eine beliebige Tabelle eines einzelnen KPIs."""
+    sort = meta.get("sort")
+    if sort == "lower":
+        return -frame
+    if sort == "target":
+        return -(frame - float(meta.get("target_value") or 0)).abs()
+    return frame
+
+def rank_matrix(oriented, method=RANK_METHOD):
+    """Rang pro KPI (1 = bester); Gleichstände nach `method` (dense / min / average)."""
+    return oriented.rank(axis=0, ascending=False, method=method)
+
+def percentile_matrix(oriented):
+    """
+    Perzentil-Rang pro KPI, normiert auf die Abdeckung (Anzahl Länder mit Wert):
+    1.0 = bester, 0.0 = schlechtester, Gleichstände teilen sich den Mittelwert.
+    KPIs mit nur einem Land → 0.5.
+    """
+    coverage = oriented.notna().sum(axis=0)
+    below = oriented.rank(axis=0, ascending=True, method="average") - 1
+    pct = below / (coverage - 1).where(coverage > 1)
+    return pct.where(oriented.isna() | (coverage > 1), 0.5)
+
+def composite_scores(pct):
+    """Gesamt-Score 0–100 = mittleres Perzentil über alle KPIs mit Wert."""
+    return pct.mean(axis=1) * 100
+
+def rank_to_json(v):
+    if pd.isna(v):
+        return None
+    return int(v) if float(v).is_integer() else round(float(v), 1)
+
+def build_ranking(store, valid_kpis, method=RANK_METHOD):
+    """Berechnet alle Ränge in einem Durchlauf und schreibt overall_ranking.json."""
+    values, _ = build_latest_matrix(store, valid_kpis)
+    if values.empty:
+        log("⚠️ No KPI data available for ranking")
+        return []
+
+    oriented = orient_matrix(values, valid_kpis)
+    ranks = rank_matrix(oriented, method)
+    pct = percentile_matrix(oriented)
+    score = composite_scores(pct)
+    composite_rank = score.rank(ascending=False, method=method)
+    kpi_count = values.notna().sum(axis=1)
+
+    # Cluster-Teilscores (Relevanz-gewichtet) für das Scoring-API / Frontend
+    from ranking_scores import ScoringMatrix
+    clusters = ScoringMatrix(values, valid_kpis).cluster_scores().round(2)
+
+    # === Zusammenfassung (Reihenfolge: bester Gesamt-Score zuerst) ===
+    result = []
+    for country in score.sort_values(ascending=False, kind="mergesort").index:
+        r, p = ranks.loc[country], pct.loc[country]
+        has = r.notna()
+        result.append({
+            "country": country,
+            "ranks": {k: rank_to_json(v) for k, v in r[has].items()},
+            "kpi_count": int(kpi_count[country]),
+            "percentiles": {k: round(float(v), 4) for k, v in p[has].items()},
+            "score": round(float(score[country]), 2),
+            "composite_rank": rank_to_json(composite_rank[country]),
+            "coverage": round(int(kpi_count[country]) / values.shape[1], 3),
+            "cluster_scores": {k: float(v) for k, v in clusters.loc[country].dropna().items()},
+        })
 
+    # === JSON speichern ===
+    write_json_if_changed(OUTPUT_FILE, result, indent=2)
+
+    log(f"✅ overall_ranking.json written to {OUTPUT_FILE} "
+        f"({values.shape[0]} countries × {values.shape[1]} KPIs, ties: {method})")
+    return result
+
+# ======================================================================
+# 📈 Historische Rankings (Rang pro Jahr)
+# ======================================================================
+def build_year_panels(store, valid_kpis, first_year, last_year, carry_forward=0):
+    """
+    Pro KPI eine Tabelle Jahr × Land (ausgerichtet: größer = besser) über alle
+    Jahre first_year..last_year. Mit carry_forward > 0 wird der letzte Wert eines
+    Landes bis zu so vielen Jahren weitergetragen.
+    """
+    series = {}
+    for filename, meta in valid_kpis.items():
         try:
-            data = load_json(filepath)
+            columns = store.get(filename)
         except Exception as e:
             log(f"⚠️ Could not read {filename}: {e}")
             continue
+        if columns is None or not len(columns):
+            continue
+        wide = year_matrix(columns)
+        if wide.empty:
+            # keine endlichen Werte (z. B. "No numeric values") → KPI fehlt in der Historie
+            log(f"⚠️ {filename}: no finite values – skipped in ranking history")
+            continue
+        series[filename] = orient_kpi(wide, meta)
 
-        latest = get_latest_values(data)
-        sort_type = meta.get("sort")
-        target_val = float(meta.get("target_value", 0))
+    years = pd.Index(range(first_year, last_year + 1), name="year")
+    countries = sorted(set().union(*(w.columns for w in series.values()))) if series else []
+    panels = {}
+    for filename, wide in series.items():
+        # erst über alle Jahre weitertragen, dann auf das Ausgabefenster schneiden
+        full = wide.reindex(range(min(int(wide.index.min()), first_year), last_year + 1))
+        if carry_forward > 0:
+            full = full.ffill(limit=carry_forward)
+        panels[filename] = full.reindex(index=years, columns=countries)
+    return years, countries, panels
 
-        values = [v["value"] for v in latest.values() if isinstance(v.get("value"), (int, float))]
-        if not values:
-            log(f"⚠️ No numeric values for {filename}")
+def year_hashes(years, countries, panels):
+    """Content-Hash pro Jahr über alle KPIs – Basis für die inkrementelle Neuberechnung."""
+    names = sorted(panels)
+    cube = np.stack([panels[k].to_numpy() for k in names]) if names else np.empty((0, len(years), 0))
+    key = "|".join(names) + "#" + "|".join(countries)
+    out = {}
+    for i, y in enumerate(years):
+        h = hashlib.sha256(key.encode("utf-8"))
+        h.update(np.ascontiguousarray(cube[:, i, :]).tobytes())
+        out[str(y)] = h.hexdigest()
+    return out
+
+def rank_years(panels, years, countries, method=RANK_METHOD):
+    """Ränge, Perzentile und Gesamt-Score für die angegebenen Jahre (alle KPIs vektorisiert)."""
+    score_sum = pd.DataFrame(0.0, index=years, columns=countries)
+    kpi_count = pd.DataFrame(0, index=years, columns=countries)
+    kpi_ranks = {}
+    for filename, panel in panels.items():
+        block = panel.loc[years]
+        if not block.notna().any().any():
             continue
+        kpi_ranks[filename] = block.rank(axis=1, ascending=False, method=method)
+        # Perzentile je Jahr, normiert auf die Abdeckung: Matrix transponieren → Länder × KPI-Logik
+        pct = percentile_matrix(block.T).T
+        score_sum += pct.fillna(0)
+        kpi_count += block.notna()
+
+    score = (score_sum / kpi_count.where(kpi_count > 0)) * 100
+    composite_rank = score.rank(axis=1, ascending=False, method=method)
+    return {"score": score, "rank": composite_rank, "kpi_count": kpi_count, "kpi_ranks": kpi_ranks}
+
+def _json_num(v, digits=None):
+    if v is None or pd.isna(v):
+        return None
+    if digits is not None:
+        return round(float(v), digits)
+    return rank_to_json(v)
+
+def build_ranking_history(store, valid_kpis, state, method=RANK_METHOD,
+                          carry_forward=CARRY_FORWARD_YEARS, first_year=HISTORY_FROM_YEAR):
+    """
+    Schreibt overall_ranking_history.json: pro Land Arrays über alle Jahre
+    (Gesamt-Rang, Score, KPI-Anzahl, Rang pro KPI). Nur Jahre, deren Eingaben
+    sich seit dem letzten Lauf geändert haben, werden neu gerankt.
+    """
+    last_year = datetime.now().year
+    years, countries, panels = build_year_panels(store, valid_kpis, first_year, last_year, carry_forward)
+    if not panels:
+        log("⚠️ No KPI data available for ranking history")
+        return None
+
+    hashes = year_hashes(years, countries, panels)
+    config = {"rank_method": method, "carry_forward": carry_forward}
+    art = state.artifact("ranking_history")
+
+    previous = None
+    if art.get("config") == config and os.path.exists(HISTORY_FILE):
+        try:
+            previous = load_json(HISTORY_FILE)
+        except Exception:
+            previous = None
+    if previous is not None and previous.get("kpis") == sorted(panels):
+        changed = state.changed_keys("ranking_history", hashes)
+        prev_years = {int(y): i for i, y in enumerate(previous.get("years", []))}
+        changed |= {str(y) for y in years if y not in prev_years}
+    else:
+        previous, prev_years, changed = None, {}, {str(y) for y in years}
+
+    if not changed:
+        log("⏭️ Ranking history unchanged")
+        art["config"] = config
+        return previous
+
+    todo = [y for y in years if str(y) in changed]
+    ranked = rank_years(panels, todo, countries, method)
+    kpis = sorted(panels)
+    old_countries = previous.get("countries", {}) if previous else {}
+
+    # Neu gerankte Jahre als NumPy-Arrays (Zeile = Position in `todo`, Spalte = Land)
+    todo_row = {y: i for i, y in enumerate(todo)}
+    col_of = {c: i for i, c in enumerate(countries)}
+    arrays = {f: ranked[f].to_numpy() for f in ("rank", "score", "kpi_count")}
+    kpi_arrays = {k: r.to_numpy() for k, r in ranked["kpi_ranks"].items()}
+
+    def column(country, field, kpi=None, digits=None):
+        """Ein Jahres-Array: neu gerankte Jahre aus `ranked`, sonst aus der Vorversion."""
+        old = old_countries.get(country, {})
+        old = (old.get("kpi_ranks") or {}).get(kpi) if kpi else old.get(field)
+        new = kpi_arrays.get(kpi) if kpi else arrays[field]
+        ci = col_of[country]
+        out = []
+        for y in years:
+            if y in todo_row:
+                v = new[todo_row[y], ci] if new is not None else None
+                out.append(int(v) if field == "kpi_count" else _json_num(v, digits))
+            else:
+                out.append(old[prev_years[y]] if old else None)
+        return out
 
-        # === Sortierung nach KPI-Typ ===
-        if sort_type == "higher":
-            sorted_countries = sorted(latest.items(), key=lambda x: x[1]["value"], reverse=True)
-        elif sort_type == "lower":
-            sorted_countries = sorted(latest.items(), key=lambda x: x[1]["value"])
-        elif sort_type == "target":
-            sorted_countries = sorted(latest.items(), key=lambda x: abs(x[1]["value"] - target_val))
-        else:
+    result = {}
+    for country in countries:
+        entry = {
+            "rank": column(country, "rank"),
+            "score": column(country, "score", digits=2),
+            "kpi_count": column(country, "kpi_count"),
+            "kpi_ranks": {},
+        }
+        if not any(entry["kpi_count"]):
             continue
+        for k in kpis:
+            ranks = column(country, "kpi_ranks", kpi=k)
+            if any(r is not None for r in ranks):
+                entry["kpi_ranks"][k] = ranks
+        result[country] = entry
 
-        # === Rangvergabe ===
-        for rank, (country, _) in enumerate(sorted_countries, start=1):
-            if country not in all_ranks:
-                all_ranks[country] = {"ranks": {}, "kpi_count": 0}
-            all_ranks[country]["ranks"][filename] = rank
-            all_ranks[country]["kpi_count"] += 1
+    history = {
+        "generated": datetime.now().isoformat(timespec="seconds"),
+        "years": [int(y) for y in years],
+        "rank_method": method,
+        "carry_forward": carry_forward,
+        "kpis": kpis,
+        "countries": result,
+    }
+    write_json_if_changed(HISTORY_FILE, history, stamps=("generated",), separators=(",", ":"))
 
-    # === Zusammenfassung ===
-    result = [
-        {"country": country, "ranks": info["ranks"], "kpi_count": info["kpi_count"]}
-        for country, info in all_ranks.items()
-    ]
+    art["config"] = config
+    state.mark_keys("ranking_history", hashes)
+    log(f"✅ overall_ranking_history.json written ({len(todo)} of {len(years)} years ranked, "
+        f"{len(result)} countries)")
+    return history
 
-    # === JSON speichern ===
-    os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(result, f, indent=2, ensure_ascii=False)
+# ======================================================================
+# 🚀 Main
+# ======================================================================
+def main(store=None, state=None):
+    log("=== Overall Ranking Generation Started ===")
+    store = store or get_store()
+    state = state or get_build_state()
 
-    log(f"✅ overall_ranking.json written to {OUTPUT_FILE}")
+    if not os.path.exists(AVAILABLE_FILE):
+        log(f"[ERR] Missing {AVAILABLE_FILE}")
+        return
 
-    if missing:
-        log(f"⚠️ Missing {len(missing)} files: {', '.join(missing[:10])} ...")
+    valid_kpis = select_ranking_kpis(load_json(AVAILABLE_FILE))
+    log(f"✅ {len(valid_kpis)} KPIs considered for ranking")
+
+    # === Unverändert seit dem letzten Lauf? ===
+    inputs = {**state.kpi_inputs(valid_kpis), "__rank_method__": RANK_METHOD}
+    if state.is_current("overall_ranking", inputs, OUTPUT_FILE):
+        log("⏭️ KPI data and meta unchanged – overall_ranking.json is up to date")
+    else:
+        build_ranking(store, valid_kpis)
+        state.mark("overall_ranking", inputs)
+        state.save()
+
+    # === Historische Rankings (inkrementell pro Jahr) ===
+    try:
+        build_ranking_history(store, valid_kpis, state)
+        state.save()
+    except Exception as e:
+        log(f"⚠️ Ranking history failed: {e}")
 
-    # ============================================================
-    # 🧠 Trigger Fun & Safe Haven AI Rankings (safe subprocess)
-    # ============================================================
+    generate_fun_safe(state)
+
+
+# ============================================================
+# 🧠 Trigger Fun & Safe Haven AI Rankings (in-process)
+# ============================================================
+def generate_fun_safe(state):
+    """
+    Fragt die KI, wenn sich das Skript (Prompts/Modell) geändert hat, eine Datei
+    fehlt oder ein neuer Zeitraum (FUN_SAFE_PERIOD) begonnen hat – die Prompts
+    hängen nicht an den KPI-Daten, sonst würden die Rankings nie erneuert.
+    """
+    fun_file = os.path.join(DATA_DIR, "fun_ranking.json")
+    safe_file = os.path.join(DATA_DIR, "safe_haven_ranking.json")
+
+    inputs = {"script": file_hash(os.path.join(SCRIPT_DIR, "generate_fun_safe_rankings.py")),
+              "period": datetime.now().strftime(FUN_SAFE_PERIOD)}
+    if state.is_current("fun_safe_rankings", inputs, fun_file, safe_file):
+        log(f"⏭️ Fun & Safe Haven prompts unchanged this period ({inputs['period']}) – keeping existing rankings")
+        return
     try:
-        import subprocess
         log("➡️ Starting fun/safe haven ranking generation ...")
-        subprocess.run(
-            ["python", os.path.join(SCRIPT_DIR, "generate_fun_safe_rankings.py")],
-            check=True
-        )
+        from generate_fun_safe_rankings import generate_rankings
+        generate_rankings()
+        if os.path.exists(fun_file) and os.path.exists(safe_file):
+            state.mark("fun_safe_rankings", inputs)
+            state.save()
         log("✅ Fun & Safe Haven rankings successfully generated.")
     except Exception as e:
         log(f"⚠️ Fun/Safe Haven ranking generation failed: {e}")
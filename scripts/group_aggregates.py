@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – Group Aggregates
+-------------------------------
+Kennzahlen pro Ländergruppe (EU, NATO, G7, BRICS … aus data/meta/groups.json)
+für jeden KPI und jedes Jahr → data/group_aggregates.json:
+ • Mittelwert (ungewichtet und bevölkerungsgewichtet), Median
+ • Abdeckung (Anzahl Mitglieder mit Wert)
+ • "latest": jüngstes Jahr mit mindestens halber Abdeckung
+Vektorisiert über die Jahr × Land-Matrix; neu berechnet werden nur KPIs,
+deren Daten sich geändert haben (BuildState).
+
+Format (kompakt, Arrays parallel zu "years"):
+{
+  "groups": {"EU": {"title": "...", "members": [...], "unresolved": [...]}},
+  "kpis": {
+    "<filename>": {
+      "years": [2000, 2001, ...],
+      "groups": {"EU": {"mean": [...], "wmean": [...], "median": [...], "n": [...],
+                        "latest": {"year": 2023, "mean": 1.2, "wmean": 1.1, "median": 1.0, "n": 27}}}
+    }
+  }
+}
+"""
+
+import os
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+
+from kpi_store import get_store
+from build_state import get_build_state, file_hash, fingerprint
+from publish import write_json_if_changed
+from fetch_overall_ranking import year_matrix
+
+# ======================================================================
+# 🔧 Pfade
+# ======================================================================
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR   = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+DATA_DIR   = os.path.join(ROOT_DIR, "data")
+META_DIR   = os.path.join(DATA_DIR, "meta")
+
+AVAILABLE_FILE = os.path.join(META_DIR, "available_kpis.json")
+GROUPS_FILE    = os.path.join(META_DIR, "groups.json")
+OUTPUT_FILE    = os.path.join(DATA_DIR, "group_aggregates.json")
+
+# KPI, dessen Werte als Gewichte dienen
+WEIGHT_KPI = "population"
+
+
+# ======================================================================
+# 🧰 Hilfsfunktionen
+# ======================================================================
+def load_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return default
+
+def compact(v):
+    """Zahl für JSON: NaN → None, sonst 6 signifikante Stellen."""
+    if v is None or not np.isfinite(v):
+        return None
+    return float(f"{v:.6g}")
+
+def load_groups(resolver=None):
+    """
+    groups.json mit kanonischen Mitgliedsnamen (Aliase wie "Korea, Rep."
+    werden über den CountryResolver aus fetch_data aufgelöst).
+    """
+    if resolver is None:
+        from fetch_data import CountryResolver
+        resolver = CountryResolver.from_meta()
+    groups = {}
+    for key, g in (load_json(GROUPS_FILE, {}) or {}).items():
+        members, unresolved = [], []
+        for name in g.get("members", []):
+            outcome, canon, _ = resolver.lookup(name)
+            if outcome == "ok" and canon not in members:
+                members.append(canon)
+            elif outcome != "ok":
+                unresolved.append(name)
+        groups[key] = {"title": g.get("title", key), "members": members, "unresolved": unresolved}
+    return groups
+
+
+# ======================================================================
+# 📐 Aggregation (Jahr × Land → Jahr × Gruppe)
+# ======================================================================
+def aggregate_kpi(values, weights, groups):
+    """
+    values:  Jahr × Land (ein KPI)
+    weights: Jahr × Land (Bevölkerung) oder None
+    → {"years": [...], "groups": {key: {...}}} – nur Jahre mit mindestens einem Gruppenwert.
+    """
+    names = list(groups)
+    countries = values.columns
+    sets = [set(groups[g]["members"]) for g in names]
+    member = np.array([[c in m for m in sets] for c in countries], dtype=float)
+
+    V = values.to_numpy()
+    has = ~np.isnan(V)
+    V0 = np.where(has, V, 0.0)
+    n = has.astype(float) @ member                       # Jahr × Gruppe
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (V0 @ member) / n
+        if weights is not None:
+            W = weights.reindex(index=values.index, columns=countries).to_numpy()
+            W0 = np.where(has & ~np.isnan(W), W, 0.0)
+            wmean = ((V0 * W0) @ member) / (W0 @ member)
+        else:
+            wmean = np.full_like(mean, np.nan)
+
+    median = np.full_like(mean, np.nan)
+    for j in range(len(names)):
+        cols = member[:, j].astype(bool)
+        rows = n[:, j] > 0
+        if cols.any() and rows.any():
+            median[rows, j] = np.nanmedian(V[np.ix_(rows, cols)], axis=1)
+
+    keep = (n > 0).any(axis=1)
+    years = [int(y) for y in values.index[keep]]
+    out = {"years": years, "groups": {}}
+    for j, g in enumerate(names):
+        size = len(groups[g]["members"])
+        col_n = n[keep, j]
+        if not col_n.any():
+            continue
+        entry = {
+            "mean":   [compact(v) for v in mean[keep, j]],
+            "wmean":  [compact(v) for v in wmean[keep, j]],
+            "median": [compact(v) for v in median[keep, j]],
+            "n":      [int(v) for v in col_n],
+        }
+        # jüngstes Jahr mit mindestens halber Abdeckung (sonst bestes verfügbares)
+        good = np.flatnonzero(col_n >= max(1, size / 2))
+        i = good[-1] if len(good) else int(np.argmax(col_n))
+        entry["latest"] = {"year": years[i], "mean": entry["mean"][i], "wmean": entry["wmean"][i],
+                           "median": entry["median"][i], "n": entry["n"][i]}
+        out["groups"][g] = entry
+    return out
+
+
+# ======================================================================
+# 🚀 Main
+# ======================================================================
+def main(store=None, state=None, resolver=None):
+    print("👥 Building group aggregates ...")
+    store = store or get_store()
+    state = state or get_build_state()
+
+    available = load_json(AVAILABLE_FILE, []) or []
+    fnames = list(dict.fromkeys(k.get("filename") for k in available if k.get("filename")))
+    hashes = state.kpi_inputs(fnames, with_meta=False)
+
+    # Gruppen, Länderliste und Gewichte betreffen alle KPIs → Konfigurations-Fingerprint
+    config = fingerprint({
+        "groups": file_hash(GROUPS_FILE),
+        "countries": file_hash(os.path.join(META_DIR, "countries.json")),
+        "mappings": file_hash(os.path.join(META_DIR, "country_mappings.json")),
+        "weights": state.kpi_hash(WEIGHT_KPI),
+    })
+    art = state.artifact("group_aggregates")
+    previous = load_json(OUTPUT_FILE) if art.get("config") == config else None
+    if previous:
+        changed = state.changed_keys("group_aggregates", hashes)
+    else:
+        changed = set(fnames)
+
+    if not changed and previous:
+        print("⏭️ Group aggregates up to date")
+        return previous
+
+    groups = load_groups(resolver)
+    pop = store.get(WEIGHT_KPI)
+    weights = year_matrix(pop) if pop is not None and len(pop) else None
+    if weights is not None:
+        # Lücken in der Bevölkerung: nächstgelegenes Jahr verwenden
+        weights = weights.reindex(range(int(weights.index.min()), int(weights.index.max()) + 1))
+        weights = weights.ffill().bfill()
+
+    kpis = {}
+    recomputed = 0
+    for fname in fnames:
+        if fname not in changed and previous and fname in previous.get("kpis", {}):
+            kpis[fname] = previous["kpis"][fname]
+            continue
+        columns = store.get(fname)
+        if columns is None or not len(columns):
+            continue
+        values = year_matrix(columns)
+        w = None
+        if weights is not None:
+            w = weights.reindex(index=values.index).ffill().bfill()
+        kpis[fname] = aggregate_kpi(values, w, groups)
+        recomputed += 1
+
+    result = {
+        "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "weight_kpi": WEIGHT_KPI,
+        "groups": groups,
+        "kpis": kpis,
+    }
+    write_json_if_changed(OUTPUT_FILE, result, stamps=("generated",), separators=(",", ":"))
+
+    art["config"] = config
+    state.mark_keys("group_aggregates", hashes)
+    state.save()
+    print(f"✅ group_aggregates.json written ({recomputed} of {len(kpis)} KPIs recomputed)")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – KPI Digests for LLM Prompts
+------------------------------------------
+Kompakte, datenbasierte Zusammenfassung pro KPI (aus dem KpiStore):
+ • Abdeckung: Länder mit aktuellem Wert, Jahresbereich
+ • Top / Bottom N nach der Sortierrichtung aus available_kpis.json
+ • Trend der letzten TREND_YEARS Jahre: Median der Länder-Steigungen
+   (OLS, vektorisiert über die Jahr × Land-Matrix) + stärkste Gewinner/Verlierer
+ • Welt-Wert und Gruppenwerte aus data/group_aggregates.json
+Dazu zwei Textformen: digest_text() für den Prompt eines KPIs und
+digest_table() – eine dichte Tabelle über alle KPIs für die globale Analyse,
+die in ein Token-Budget passt (statt JSON abzuschneiden).
+"""
+
+import os
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from build_state import get_build_state, value_hash
+from fetch_overall_ranking import latest_arrays
+from kpi_stats import EXCLUDE_COUNTRIES
+
+# ======================================================================
+# 🔧 Pfade & Konfiguration
+# ======================================================================
+SCRIPT_DIR  = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR    = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+DATA_DIR    = os.path.join(ROOT_DIR, "data")
+GROUPS_FILE = os.path.join(DATA_DIR, "group_aggregates.json")
+
+# Bei Formatänderungen erhöhen → gecachte Digests (build_state.json) verfallen
+DIGEST_VERSION = 2
+
+TOP_N         = 5
+TREND_YEARS   = 10      # Fenster für die Steigungen
+TREND_MIN_OBS = 5       # Mindestanzahl Jahre pro Land im Fenster
+STALE_YEARS   = 5       # ältere "neueste" Werte zählen nicht für Top/Bottom
+WORLD         = "World"
+
+# Budget für die globale Tabelle (≈ 3.5 Zeichen pro Token bei Zahlen/Namen)
+PROMPT_TOKENS   = int(os.getenv("LLM_PROMPT_TOKENS", "6000"))
+CHARS_PER_TOKEN = 3.5
+TABLE_GROUPS    = ("EU", "G7", "BRICS", "AfricanUnion")
+
+DIRECTION = {"higher": "higher is better", "lower": "lower is better",
+             "target": "closer to target is better", "neutral": "neutral"}
+
+
+# ======================================================================
+# 🧰 Hilfsfunktionen
+# ======================================================================
+def fmt(v) -> str:
+    """Zahl kurz für den Prompt (4 signifikante Stellen, große Werte mit M/B/T)."""
+    if v is None or not np.isfinite(v):
+        return "–"
+    for div, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M")):
+        if abs(v) >= div:
+            return f"{v / div:.4g}{suffix}"
+    if abs(v) >= 1000:
+        return f"{float(f'{v:.4g}'):.0f}"
+    return f"{v:.4g}"
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+def load_group_aggregates(path: str = GROUPS_FILE) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("kpis") or {}
+    except Exception:
+        return {}
+
+def is_total(meta: Dict[str, Any]) -> bool:
+    """Extensive KPIs (Summen wie BIP, Bevölkerung, Fläche) – relation "*" in available_kpis.json."""
+    return meta.get("relation") == "*"
+
+def orientation(meta: Dict[str, Any], values: np.ndarray) -> np.ndarray:
+    """Größer = besser (wie orient_kpi im Ranking); neutral → einfach der Wert."""
+    sort = meta.get("sort")
+    if sort == "lower":
+        return -values
+    if sort == "target":
+        return -np.abs(values - float(meta.get("target_value") or 0))
+    return values
+
+def country_slopes(columns, last_year: int):
+    """
+    OLS-Steigung pro Land über die letzten TREND_YEARS Jahre → (Namen, Steigung, Niveau).
+    Gruppensummen per bincount über den Länder-Index – die Spalten sind nach Land
+    und Jahr sortiert, doppelte Jahre zählen (wie im Ranking) mit dem ersten Eintrag.
+    """
+    c = np.asarray(columns.c, dtype=int)
+    year = np.asarray(columns.year, dtype=float)
+    value = np.asarray(columns.value, dtype=float)
+    first = np.r_[True, (c[1:] != c[:-1]) | (year[1:] != year[:-1])]
+    excluded = [i for i, name in enumerate(columns.countries) if name in EXCLUDE_COUNTRIES]
+    m = (first & np.isfinite(value) & (year > last_year - TREND_YEARS) & (year <= last_year)
+         & ~np.isin(c, excluded))
+    c, year, value = c[m], year[m], value[m]
+    k = len(columns.countries)
+    n = np.bincount(c, minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tx = np.bincount(c, year, k) / n
+        level = np.bincount(c, value, k) / n
+        dt = year - tx[c]
+        slope = np.bincount(c, dt * (value - level[c]), k) / np.bincount(c, dt ** 2, k)
+    ok = (n >= TREND_MIN_OBS) & np.isfinite(slope)
+    return np.asarray(columns.countries, dtype=object)[ok], slope[ok], level[ok]
+
+
+# ======================================================================
+# 📐 Digest pro KPI
+# ======================================================================
+def build_digest(columns, meta: Dict[str, Any], groups: Optional[Dict[str, Any]] = None,
+                 top_n: int = TOP_N) -> Optional[Dict[str, Any]]:
+    """Kompakte Kennzahlen eines KPIs (JSON-tauglich) oder None ohne Daten."""
+    names, years, values = latest_arrays(columns)
+    ok = np.isfinite(values) & np.isfinite(years)
+    names, years, values = names[ok], years[ok], values[ok]
+    if not len(values):
+        return None
+
+    world = None
+    is_world = names == WORLD
+    if is_world.any():
+        i = int(np.flatnonzero(is_world)[0])
+        world = [float(values[i]), int(years[i])]
+    keep = ~np.isin(names, EXCLUDE_COUNTRIES)
+    names, years, values = names[keep], years[keep], values[keep]
+    if not len(values):
+        return None
+
+    last_year = int(years.max())
+    recent = years >= last_year - STALE_YEARS
+    r_names, r_years, r_values = names[recent], years[recent], values[recent]
+    order = np.argsort(-orientation(meta, r_values), kind="stable")
+    row = lambda i: [r_names[i], float(r_values[i]), int(r_years[i])]
+
+    digest: Dict[str, Any] = {
+        "direction": meta.get("sort") or "neutral",
+        "latest_year": last_year,
+        "coverage": {
+            "countries": int(recent.sum()),
+            "total": int(len(names)),
+            "years": [int(min(columns.year)), int(max(columns.year))],
+        },
+        "median": float(np.median(r_values)),
+        "top": [row(i) for i in order[:top_n]],
+        "bottom": [row(i) for i in order[::-1][:top_n]],
+        "world": world,
+    }
+
+    # === Trend (Länder-Steigungen, bei positiven KPIs relativ in %/Jahr) ===
+    t_names, slope, level = country_slopes(columns, last_year)
+    if len(slope):
+        relative = bool((level > 0).all())
+        rate = slope / level * 100 if relative else slope
+        better = -rate if meta.get("sort") == "lower" else rate
+        movers = np.argsort(-better, kind="stable")
+        digest["trend"] = {
+            "years": [last_year - TREND_YEARS + 1, last_year],
+            "unit": "%/yr" if relative else "/yr",
+            "median": float(np.median(rate)),
+            "countries": int(len(rate)),
+            "gains": [[t_names[i], float(rate[i])] for i in movers[:3]],
+            "falls": [[t_names[i], float(rate[i])] for i in movers[::-1][:3]],
+        }
+
+    # === Gruppen (jüngstes Jahr mit ausreichender Abdeckung) ===
+    # Summen-KPIs: Summe der Mitglieder mit Wert (Mittelwert × n), sonst
+    # bevölkerungsgewichteter Mittelwert – ein Mittel nationaler Summen wäre irreführend.
+    if groups:
+        total = is_total(meta)
+        digest["group_stat"] = "sum" if total else "mean"
+        digest["groups"] = {}
+        for g, entry in (groups.get("groups") or {}).items():
+            latest = entry.get("latest")
+            if not latest:
+                continue
+            if total:
+                v = latest["mean"] * latest["n"] if latest.get("mean") is not None else None
+            else:
+                v = latest.get("wmean") if latest.get("wmean") is not None else latest.get("mean")
+            digest["groups"][g] = [v, latest.get("year"), latest.get("n")]
+    return digest
+
+def build_digests(store, meta_list: List[Dict[str, Any]], state=None,
+                  group_aggregates: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Digests aller KPIs; unveränderte (Daten, Meta, Gruppenwerte) kommen aus build_state.json."""
+    state = state or get_build_state()
+    group_aggregates = load_group_aggregates() if group_aggregates is None else group_aggregates
+    cache = state.artifact("kpi_digest").setdefault("kpis", {})
+    digests = {}
+    for entry in meta_list:
+        fname = entry.get("filename")
+        if not fname:
+            continue
+        groups = group_aggregates.get(fname)
+        key = value_hash({"data": state.kpi_hash(fname), "meta": entry,
+                          "groups": groups, "version": DIGEST_VERSION})
+        cached = cache.get(fname)
+        if cached and cached.get("hash") == key:
+            digest = cached.get("result")
+        else:
+            columns = store.get(fname)
+            digest = build_digest(columns, entry, groups) if columns is not None and len(columns) else None
+            cache[fname] = {"hash": key, "result": digest}
+        if digest:
+            digests[fname] = digest
+    return digests
+
+
+# ======================================================================
+# 📝 Textformen
+# ======================================================================
+def _rows(rows, unit: str = "") -> str:
+    return "; ".join(f"{name} {fmt(v)}{unit} ({y})" for name, v, y in rows)
+
+def digest_text(d: Dict[str, Any], meta: Dict[str, Any]) -> str:
+    """Mehrzeilige Fakten für den Prompt eines einzelnen KPIs."""
+    unit = meta.get("unit", "")
+    cov = d["coverage"]
+    judged = d["direction"] in ("higher", "lower")
+    lines = [
+        f"Latest year: {d['latest_year']} – {cov['countries']} of {cov['total']} countries "
+        f"with recent data (series {cov['years'][0]}–{cov['years'][1]}). Unit: {unit}.",
+        f"Direction: {DIRECTION.get(d['direction'], d['direction'])}"
+        + (f" (target {meta.get('target_value')})" if d["direction"] == "target" else "") + ".",
+        f"Median country: {fmt(d['median'])}."
+        + (f" World: {fmt(d['world'][0])} ({d['world'][1]})." if d.get("world") else ""),
+        f"{'Best' if d['direction'] != 'neutral' else 'Highest'}: {_rows(d['top'])}.",
+        f"{'Worst' if d['direction'] != 'neutral' else 'Lowest'}: {_rows(d['bottom'])}.",
+    ]
+    tr = d.get("trend")
+    if tr:
+        lines.append(
+            f"Trend {tr['years'][0]}–{tr['years'][1]} ({tr['countries']} countries): median "
+            f"{tr['median']:+.2f} {tr['unit']}; strongest "
+            f"{'improvements' if judged else 'increases'}: "
+            + ", ".join(f"{n} {r:+.2f}" for n, r in tr["gains"])
+            + "; strongest " + ("declines" if judged else "decreases") + ": "
+            + ", ".join(f"{n} {r:+.2f}" for n, r in tr["falls"]) + ".")
+    if d.get("groups"):
+        if d.get("group_stat") == "sum":
+            lines.append("Group totals (sum over members with data, latest well-covered year): "
+                         + "; ".join(f"{g} {fmt(v)} ({y}, {n} members)" for g, (v, y, n) in d["groups"].items()) + ".")
+        else:
+            lines.append("Groups (latest well-covered year, population-weighted where available): "
+                         + "; ".join(f"{g} {fmt(v)} ({y})" for g, (v, y, _) in d["groups"].items()) + ".")
+    return "\n".join(lines)
+
+def _table(digests, metas, top: int, groups) -> str:
+    cols = ["kpi", "unit", "dir", "year", "n", "world", "median", "trend"]
+    cols += [f"best{top}", f"worst{top}"] if top else []
+    cols += list(groups)
+    lines = ["|".join(cols)]
+    for fname, d in digests.items():
+        m = metas.get(fname, {})
+        tr = d.get("trend")
+        cells = [
+            fname, m.get("unit", ""), d["direction"][:1], str(d["latest_year"]),
+            f"{d['coverage']['countries']}/{d['coverage']['total']}",
+            fmt(d["world"][0]) if d.get("world") else "–",
+            fmt(d["median"]),
+            f"{tr['median']:+.2g}{'%' if tr['unit'] == '%/yr' else ''}" if tr else "–",
+        ]
+        if top:
+            cells.append(",".join(f"{n} {fmt(v)}" for n, v, _ in d["top"][:top]))
+            cells.append(",".join(f"{n} {fmt(v)}" for n, v, _ in d["bottom"][:top]))
+        prefix = "Σ" if d.get("group_stat") == "sum" else ""
+        cells += [prefix + fmt((d.get("groups") or {}).get(g, [None])[0]) for g in groups]
+        lines.append("|".join(cells))
+    return "\n".join(lines)
+
+def digest_table(digests: Dict[str, Dict[str, Any]], metas: Dict[str, Dict[str, Any]],
+                 budget_tokens: int = PROMPT_TOKENS) -> str:
+    """
+    Eine Zeile pro KPI (pipe-separiert). Jeder KPI ist enthalten; passt die
+    Tabelle nicht ins Budget, werden erst Top/Bottom gekürzt, dann die Gruppen.
+    dir: h = higher better, l = lower better, t = target, n = neutral;
+    trend = Median der Länder-Steigungen (% pro Jahr bzw. Einheit pro Jahr);
+    Gruppenspalten: Mittelwert, bei Summen-KPIs "Σ" = Summe der Mitglieder.
+    """
+    text = ""
+    for top, groups in ((3, TABLE_GROUPS), (2, TABLE_GROUPS), (1, TABLE_GROUPS[:2]), (1, ()), (0, ())):
+        text = _table(digests, metas, top, groups)
+        if estimate_tokens(text) <= budget_tokens:
+            break
+    return text
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – KPI Statistics & Outlier Engine
+----------------------------------------------
+Vektorisierte Statistik pro KPI (NumPy, ein Durchlauf über die Spalten):
+ • Gesamtwerte: count, avg, std, min, max, Perzentile, MAD, IQR
+ • pro Jahr: count, mean, std, median, p25, p75
+ • Ausreißer, jeweils innerhalb eines Jahres (nicht über alle Jahre gepoolt):
+     z-Score  |z| > 3
+     MAD      robuster z-Score |0.6745·(x − Median) / MAD| > 3.5
+     IQR      außerhalb [Q1 − 3·IQR, Q3 + 3·IQR]
+ • Sprünge: Veränderung eines Landes zum Vorjahr (bei positiven KPIs relativ,
+   log), robust gegen die Verteilung aller Vorjahres-Änderungen (|robuster z| > 6)
+"World" zählt weder zur Statistik noch wird es geflaggt.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# Bei Formatänderungen erhöhen → gecachte Ergebnisse (build_state.json) verfallen
+STATS_VERSION = 2
+
+EXCLUDE_COUNTRIES = ("World",)
+MIN_VALUES     = 5      # weniger Werte → keine Statistik
+MIN_YEAR_GROUP = 5      # Mindestgröße eines Jahrgangs für Ausreißer-Tests
+Z_LIMIT        = 3.0
+MAD_LIMIT      = 3.5
+IQR_FENCE      = 3.0
+JUMP_LIMIT     = 6.0
+MAX_FLAGS      = 20
+PERCENTILES    = (10, 25, 50, 75, 90)
+
+
+def _num(v, digits: int = 4):
+    """JSON-taugliche Zahl (NaN → None)."""
+    if v is None or not np.isfinite(v):
+        return None
+    return round(float(v), digits)
+
+def group_quantiles(values: np.ndarray, groups: np.ndarray, n_groups: int, qs) -> np.ndarray:
+    """Quantile (lineare Interpolation wie np.percentile) je Gruppe – (len(qs) × n_groups)."""
+    order = np.lexsort((values, groups))
+    v = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    out = np.full((len(qs), n_groups), np.nan)
+    ok = counts > 0
+    for i, q in enumerate(qs):
+        pos = starts[ok] + q * (counts[ok] - 1)
+        lo = np.floor(pos).astype(int)
+        hi = np.ceil(pos).astype(int)
+        out[i, ok] = v[lo] + (v[hi] - v[lo]) * (pos - lo)
+    return out
+
+def _flags(names, years, values, mask, score, key: str = "score", change=None):
+    """Die MAX_FLAGS stärksten Treffer als Liste von Dicts."""
+    idx = np.flatnonzero(mask)
+    idx = idx[np.argsort(-np.abs(score[idx]), kind="stable")[:MAX_FLAGS]]
+    out = []
+    for i in idx:
+        flag = {"country": names[i], "year": int(years[i]), "value": float(values[i]),
+                key: round(float(score[i]), 2)}
+        if change is not None:
+            flag["change"] = _num(change[i])
+        out.append(flag)
+    return out
+
+
+def compute_kpi_stats(columns) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """(summary, outliers) für einen KPI im Spaltenformat, oder None bei < 5 Werten."""
+    c = np.asarray(columns.c, dtype=int)
+    years = np.asarray(columns.year, dtype=float)
+    values = np.asarray(columns.value, dtype=float)
+    excluded = [i for i, name in enumerate(columns.countries) if name in EXCLUDE_COUNTRIES]
+    keep = np.isfinite(values) & np.isfinite(years) & ~np.isin(c, excluded)
+    c, years, values = c[keep], years[keep], values[keep]
+    if len(values) < MIN_VALUES:
+        return None
+    names = np.asarray(columns.countries, dtype=object)[c]
+
+    pct = np.percentile(values, PERCENTILES)
+    q1, median, q3 = pct[1], pct[2], pct[3]
+    mad = float(np.median(np.abs(values - median)))
+    imin, imax = int(values.argmin()), int(values.argmax())
+
+    # === Kennzahlen je Jahr (Gruppen über np.unique / bincount) ===
+    year_list, g = np.unique(years, return_inverse=True)
+    ng = len(year_list)
+    n = np.bincount(g, minlength=ng)
+    mean = np.bincount(g, values, ng) / n
+    std = np.sqrt(np.maximum(np.bincount(g, (values - mean[g]) ** 2, ng) / n, 0))
+    p25, med, p75 = group_quantiles(values, g, ng, (0.25, 0.5, 0.75))
+    mad_y = group_quantiles(np.abs(values - med[g]), g, ng, (0.5,))[0]
+    enough = n[g] >= MIN_YEAR_GROUP
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.where(std[g] > 0, (values - mean[g]) / std[g], 0.0)
+        rz = np.where(mad_y[g] > 0, 0.6745 * (values - med[g]) / mad_y[g], 0.0)
+        iqr_y = (p75 - p25)[g]
+        fence = np.where(values > p75[g], values - p75[g], np.where(values < p25[g], values - p25[g], 0.0))
+        iqr_score = np.where(iqr_y > 0, fence / iqr_y, 0.0)
+
+    z_mask = enough & (np.abs(z) > Z_LIMIT)
+    mad_mask = enough & (np.abs(rz) > MAD_LIMIT)
+    iqr_mask = enough & (np.abs(iqr_score) > IQR_FENCE)
+
+    # === Sprünge zum Vorjahr je Land ===
+    # Spalten sind nach Land und Jahr sortiert → Vorgänger = vorheriger Eintrag.
+    # Positive KPIs: relative Änderung (log), sonst absolute Differenz.
+    follows = np.r_[False, (c[1:] == c[:-1]) & (years[1:] - years[:-1] == 1)]
+    prev = np.r_[np.nan, values[:-1]]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        step = np.log(values / prev) if (values > 0).all() else values - prev
+    jumps, n_jumps = [], 0
+    if follows.sum() >= MIN_VALUES:
+        d_med = float(np.median(step[follows]))
+        d_mad = float(np.median(np.abs(step[follows] - d_med)))
+        if d_mad > 0:
+            jz = np.where(follows, 0.6745 * (step - d_med) / d_mad, 0.0)
+            jmask = np.abs(jz) > JUMP_LIMIT
+            n_jumps = int(jmask.sum())
+            jumps = _flags(names, years, values, jmask, jz, change=values - prev)
+
+    # === Statistik pro Jahr (kompakt, Arrays parallel zu "years") ===
+    per_year = {
+        "years": [int(y) for y in year_list],
+        "count": [int(v) for v in n],
+        "mean": [_num(v) for v in mean],
+        "std": [_num(v) for v in std],
+        "median": [_num(v) for v in med],
+        "p25": [_num(v) for v in p25],
+        "p75": [_num(v) for v in p75],
+    }
+
+    summary = {
+        "count": int(len(values)),
+        "countries": int(len(np.unique(c))),
+        "years": [int(year_list[0]), int(year_list[-1])],
+        "avg": round(float(values.mean()), 3),
+        "std": round(float(values.std()), 3),
+        "min": float(values[imin]),
+        "max": float(values[imax]),
+        "percentiles": {f"p{p}": _num(v) for p, v in zip(PERCENTILES, pct)},
+        "mad": _num(mad),
+        "iqr": _num(q3 - q1),
+        "outlier_count": int(z_mask.sum()),
+        "mad_outliers": int(mad_mask.sum()),
+        "iqr_outliers": int(iqr_mask.sum()),
+        "jumps": n_jumps,
+    }
+    outliers = {
+        "min": {"value": float(values[imin]), "country": names[imin], "year": int(years[imin])},
+        "max": {"value": float(values[imax]), "country": names[imax], "year": int(years[imax])},
+        "flagged": _flags(names, years, values, z_mask, z, key="z_score"),
+        "mad_flagged": _flags(names, years, values, mad_mask, rz),
+        "iqr_flagged": _flags(names, years, values, iqr_mask, iqr_score),
+        "jumps": jumps,
+        "per_year": per_year,
+    }
+    return summary, outliers
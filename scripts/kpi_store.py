@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – Columnar KPI Storage
+-----------------------------------
+Kompaktes Spaltenformat neben den ausführlichen <kpi>.json-Zeilendateien:
+ • data/columnar/<filename>.json (lokaler Cache, nicht im Repo / Deploy)
+ • Länder-Wörterbuch + parallele Arrays (Länder-Index, Jahr, Wert)
+ • Laden ohne ein Dict pro Zeile (Ranking, Konsolidierung, Analyse)
+ • KpiStore: lauf-weiter In-Process-Cache (lazy, LRU-begrenzt), den
+   fetch_data befüllt und Ranking / Konsolidierung / Analyse teilen
+
+Format:
+{
+  "format":    "rc-columnar-1",
+  "countries": ["Germany", "France", ...],
+  "iso2":      ["DEU", "FRA", ...],          # pro Land (erster Wert)
+  "c":         [0, 0, 1, ...],               # Index in "countries"
+  "year":      [2000, 2001, 2000, ...],
+  "value":     [1.5, 1.7, 2.0, ...],
+  "source":    "<sha256 von <filename>.json>"   # Gültigkeit statt mtime
+}
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from publish import write_json_if_changed
+from build_state import file_hash
+
+SCRIPT_DIR   = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR     = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+DATA_DIR     = os.path.join(ROOT_DIR, "data")
+COLUMNAR_DIR = os.path.join(DATA_DIR, "columnar")
+
+FORMAT = "rc-columnar-1"
+
+# Obergrenze für den In-Process-Cache (≥ Anzahl KPIs → jeder KPI wird nur einmal geparst)
+KPI_STORE_MAX_ITEMS = int(os.getenv("KPI_STORE_MAX_ITEMS", "128"))
+
+
+# ======================================================================
+# 📦 Spalten-Container
+# ======================================================================
+class KpiColumns:
+    """Ein KPI als parallele Arrays (sortiert nach Land, dann Jahr)."""
+    __slots__ = ("countries", "iso2", "c", "year", "value")
+
+    def __init__(self, countries: List[str], iso2: List[str],
+                 c: List[int], year: List[int], value: List[float]):
+        self.countries = countries
+        self.iso2 = iso2
+        self.c = c
+        self.year = year
+        self.value = value
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "KpiColumns":
+        rows = sorted(
+            (r for r in records
+             if r.get("country") and isinstance(r.get("value"), (int, float))
+             and not isinstance(r.get("value"), bool)),
+            key=lambda r: (r["country"], r.get("year") or 0),
+        )
+        countries: List[str] = []
+        iso2: List[str] = []
+        index: Dict[str, int] = {}
+        c, year, value = [], [], []
+        for r in rows:
+            name = r["country"]
+            i = index.get(name)
+            if i is None:
+                i = index[name] = len(countries)
+                countries.append(name)
+                iso2.append(r.get("iso2") or "")
+            c.append(i)
+            year.append(r.get("year"))
+            value.append(r["value"])
+        return cls(countries, iso2, c, year, value)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "KpiColumns":
+        return cls(d["countries"], d.get("iso2") or [""] * len(d["countries"]),
+                   d["c"], d["year"], d["value"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"format": FORMAT, "countries": self.countries, "iso2": self.iso2,
+                "c": self.c, "year": self.year, "value": self.value}
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Zeilen im Standardformat (nur für Ausgaben, die es wirklich brauchen)."""
+        countries, iso2 = self.countries, self.iso2
+        for i, y, v in zip(self.c, self.year, self.value):
+            yield {"country": countries[i], "iso2": iso2[i], "year": y, "value": v}
+
+    def latest(self) -> Dict[str, Tuple[int, float]]:
+        """Neuester (Jahr, Wert) pro Land."""
+        best: Dict[int, Tuple[int, float]] = {}
+        for i, y, v in zip(self.c, self.year, self.value):
+            cur = best.get(i)
+            if cur is None or y > cur[0]:
+                best[i] = (y, v)
+        return {self.countries[i]: yv for i, yv in best.items()}
+
+
+# ======================================================================
+# 💾 Schreiben / Laden
+# ======================================================================
+def columnar_path(filename: str, data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, "columnar", f"{filename}.json")
+
+def write_columns(filename: str, records: List[Dict[str, Any]], data_dir: str = DATA_DIR) -> KpiColumns:
+    cols = KpiColumns.from_records(records)
+    doc = cols.to_dict()
+    doc["source"] = file_hash(os.path.join(data_dir, f"{filename}.json"))
+    write_json_if_changed(columnar_path(filename, data_dir), doc, separators=(",", ":"))
+    return cols
+
+def load_columns(filename: str, data_dir: str = DATA_DIR) -> Optional[KpiColumns]:
+    """
+    Lädt einen KPI im Spaltenformat. Fehlt die Spaltendatei (Altbestand),
+    wird einmalig aus <filename>.json konvertiert. None, wenn beides fehlt.
+    Gültig ist die Spaltendatei nur, wenn ihr "source"-Hash zur Zeilendatei
+    passt (mtimes sind nach Checkout / FTP-Sync nicht verlässlich).
+    """
+    path = columnar_path(filename, data_dir)
+    row_path = os.path.join(data_dir, f"{filename}.json")
+    source = file_hash(row_path)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+        except ValueError:
+            doc = {}
+        if doc.get("format") == FORMAT and (source is None or doc.get("source") == source):
+            return KpiColumns.from_dict(doc)
+    if source is None:
+        return None
+    with open(row_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and "data" in data:
+        data = data["data"]
+    return write_columns(filename, data if isinstance(data, list) else [], data_dir)
+
+
+# ======================================================================
+# 🗃️ KpiStore – geteilter Cache für die ganze Post-Fetch-Pipeline
+# ======================================================================
+class KpiStore:
+    """
+    Hält geparste KPIs (Schlüssel: filename aus available_kpis.json) für den
+    ganzen Lauf. Lädt lazy über load_columns(), verdrängt bei Überschreitung
+    von `max_items` den am längsten ungenutzten Eintrag.
+    """
+    def __init__(self, data_dir: str = DATA_DIR, max_items: int = KPI_STORE_MAX_ITEMS):
+        self.data_dir = data_dir
+        self.max_items = max(1, max_items)
+        self._items: "OrderedDict[str, Optional[KpiColumns]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0      # tatsächlich von Platte geparst
+        self.hits = 0       # aus dem Speicher bedient
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._items
+
+    def put(self, filename: str, columns: Optional[KpiColumns]):
+        """Legt bereits geparste Daten ab (z. B. direkt aus fetch_data.save_records)."""
+        with self._lock:
+            self._items[filename] = columns
+            self._items.move_to_end(filename)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, filename: str) -> Optional[KpiColumns]:
+        with self._lock:
+            if filename in self._items:
+                self._items.move_to_end(filename)
+                self.hits += 1
+                return self._items[filename]
+        columns = load_columns(filename, self.data_dir)
+        with self._lock:
+            self.loads += 1
+        self.put(filename, columns)
+        return columns
+
+    def stats(self) -> str:
+        return f"{len(self._items)} cached, {self.loads} loaded, {self.hits} hits"
+
+_default_store: Optional[KpiStore] = None
+
+def get_store() -> KpiStore:
+    """Der prozessweite Store (wird beim ersten Zugriff angelegt)."""
+    global _default_store
+    if _default_store is None:
+        _default_store = KpiStore()
+    return _default_store
+
+
+# ======================================================================
+# ▶ Start – alle Spaltendateien aus den Zeilendateien neu erzeugen
+# ======================================================================
+def main():
+    with open(os.path.join(DATA_DIR, "meta", "available_kpis.json"), encoding="utf-8") as f:
+        available = json.load(f)
+    count = 0
+    for k in available:
+        fname = k.get("filename")
+        row_path = os.path.join(DATA_DIR, f"{fname}.json") if fname else ""
+        if not fname or not os.path.exists(row_path):
+            continue
+        with open(row_path, "r", encoding="utf-8") as f:
+            write_columns(fname, json.load(f))
+        count += 1
+    print(f"✅ {count} columnar KPI files written to {COLUMNAR_DIR}")
+
+
+if __name__ == "__main__":
+    main()
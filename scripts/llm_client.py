@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – LLM Request Layer
+--------------------------------
+Gemeinsame Schicht für alle Chat-Completion-Aufrufe (analysis.py):
+ • parallel über einen Thread-Pool, begrenzt durch LLM_CONCURRENCY und
+   LLM_RATE_PER_MIN (Mindestabstand zwischen zwei Request-Starts)
+ • Retry mit exponentiellem Backoff (+ Jitter), nur bei Rate-Limit, Timeout,
+   Verbindungs- und 5xx-Fehlern
+ • Memo auf der Platte (data/llm_cache/<hash>.json), Schlüssel =
+   Hash aus (Modell, Messages, Daten-Kontext) → identische Anfragen kosten
+   keinen API-Call; Einträge, die LLM_CACHE_DAYS lang nicht genutzt wurden,
+   entfernt ResponseCache.prune()
+ • LLM_STUB=1 → lokaler StubClient statt OpenAI (offline testbar);
+   Selbsttest: python analysis.py --check
+"""
+
+import os
+import json
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from build_state import value_hash
+from publish import write_json_if_changed
+
+# ======================================================================
+# 🔧 Pfade & Konfiguration
+# ======================================================================
+SCRIPT_DIR    = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR      = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+DATA_DIR      = os.path.join(ROOT_DIR, "data")
+LLM_CACHE_DIR = os.path.join(DATA_DIR, "llm_cache")
+
+LLM_MODEL        = os.getenv("LLM_MODEL", "gpt-5")
+LLM_CONCURRENCY  = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_RATE_PER_MIN = float(os.getenv("LLM_RATE_PER_MIN", "60"))
+LLM_RETRIES      = int(os.getenv("LLM_RETRIES", "4"))
+LLM_BACKOFF      = 2.0      # Sekunden, verdoppelt pro Versuch
+LLM_CACHE_DAYS   = float(os.getenv("LLM_CACHE_DAYS", "90"))   # Memo-Einträge ohne Treffer → weg
+
+
+# ======================================================================
+# 🧪 Stub-Client (offline)
+# ======================================================================
+class StubClient:
+    """
+    Verhält sich wie openai.OpenAI für chat.completions.create, antwortet
+    aber lokal und deterministisch. Zählt die Aufrufe in .calls.
+    """
+
+    class _Namespace:
+        def __init__(self, **kw):
+            self.__dict__.update(kw)
+
+    def __init__(self, reply: Optional[str] = None):
+        self.reply = reply
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = self._Namespace(completions=self._Namespace(create=self.create))
+
+    def create(self, model: str, messages: List[Dict[str, str]], **_):
+        with self._lock:
+            self.calls += 1
+        text = self.reply
+        if text is None:
+            prompt = messages[-1]["content"] if messages else ""
+            text = f"[stub:{model}] {prompt.splitlines()[0][:200] if prompt else ''}"
+        message = self._Namespace(content=text)
+        return self._Namespace(choices=[self._Namespace(message=message)])
+
+
+_client = None
+
+def get_openai_client():
+    """Creates the OpenAI client on first use – runs without changes never need a key."""
+    global _client
+    if _client is None:
+        if os.getenv("LLM_STUB") == "1":
+            _client = StubClient()
+            return _client
+        OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+        if not OPENAI_API_KEY:
+            raise ValueError("❌ OPENAI_API_KEY not found. Please define it in .env or GitHub Secrets.")
+        from openai import OpenAI
+        _client = OpenAI(api_key=OPENAI_API_KEY)
+    return _client
+
+
+# ======================================================================
+# ⏱️ Rate-Limit
+# ======================================================================
+class RateLimiter:
+    """Mindestabstand zwischen zwei Request-Starts (thread-safe)."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+# ======================================================================
+# 🗄️ Antwort-Memo
+# ======================================================================
+def request_key(model: str, messages: List[Dict[str, str]], context: Any = None) -> str:
+    return value_hash({"model": model, "messages": messages, "context": context})
+
+class ResponseCache:
+    """
+    Eine Datei pro Anfrage unter data/llm_cache/ (wie data/http_cache/).
+    Die mtime ist der letzte Treffer – danach richtet sich prune().
+    """
+
+    def __init__(self, cache_dir: str = LLM_CACHE_DIR):
+        self.cache_dir = cache_dir
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                response = json.load(f).get("response")
+        except Exception:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return response
+
+    def put(self, key: str, model: str, response: str):
+        write_json_if_changed(self._path(key), {
+            "model": model,
+            "response": response,
+            "stored": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }, indent=1)
+
+    def prune(self, max_age_days: float = LLM_CACHE_DAYS) -> int:
+        """Entfernt Einträge, die max_age_days lang weder geschrieben noch getroffen wurden."""
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.endswith(".json") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+# ======================================================================
+# 🚀 Requests
+# ======================================================================
+# Statuscodes, bei denen ein erneuter Versuch sinnvoll ist (Rate-Limit, Timeout, Serverfehler)
+RETRY_STATUS = {408, 409, 429}
+RETRY_ERRORS = ("APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError")
+
+def is_retryable(error: Exception) -> bool:
+    """Nur vorübergehende Fehler wiederholen – Auth-, Rechte- und 4xx-Fehler sofort weiterreichen."""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRY_STATUS or status >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in RETRY_ERRORS for cls in type(error).__mro__)
+
+def _create_with_retry(client, model, messages, limiter: RateLimiter, retries: int) -> str:
+    for attempt in range(retries + 1):
+        limiter.wait()
+        try:
+            rsp = client.chat.completions.create(model=model, messages=messages)
+            return (rsp.choices[0].message.content or "").strip()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            time.sleep(LLM_BACKOFF * 2 ** attempt * (1 + random.random() / 2))
+
+def complete_many(jobs: Dict[str, Tuple[List[Dict[str, str]], Any]], client=None,
+                  model: str = LLM_MODEL, cache: Optional[ResponseCache] = None,
+                  concurrency: int = LLM_CONCURRENCY, rate_per_min: float = LLM_RATE_PER_MIN,
+                  retries: int = LLM_RETRIES, progress=None) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    jobs: {name: (messages, context)} – context fließt nur in den Memo-Schlüssel
+    (z. B. Daten-Hash des KPIs).
+    → ({name: Antworttext} für alle erfolgreichen Jobs, Statistik)
+    Fehlgeschlagene Jobs fehlen im Ergebnis; ihre Fehler stehen in stats["errors"].
+    """
+    cache = cache or ResponseCache()
+    results: Dict[str, str] = {}
+    stats: Dict[str, Any] = {"cached": 0, "requested": 0, "errors": {}}
+
+    pending = {}
+    for name, (messages, context) in jobs.items():
+        key = request_key(model, messages, context)
+        hit = cache.get(key)
+        if hit is not None:
+            results[name] = hit
+            stats["cached"] += 1
+            if progress is not None:
+                progress.update(1)
+        else:
+            pending[name] = (key, messages)
+
+    if pending:
+        client = client or get_openai_client()
+        limiter = RateLimiter(rate_per_min)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {pool.submit(_create_with_retry, client, model, messages, limiter, retries): name
+                       for name, (_, messages) in pending.items()}
+            for fut in as_completed(futures):
+                name = futures[fut]
+                try:
+                    text = fut.result()
+                except Exception as e:
+                    stats["errors"][name] = str(e)
+                    if progress is not None:
+                        progress.update(1)
+                    continue
+                results[name] = text
+                stats["requested"] += 1
+                try:
+                    cache.put(pending[name][0], model, text)
+                except OSError as e:
+                    print(f"⚠️ Could not write LLM cache for {name}: {e}")
+                if progress is not None:
+                    progress.update(1)
+    return results, stats
+
+def complete(messages: List[Dict[str, str]], context: Any = None, client=None,
+             model: str = LLM_MODEL, **kwargs) -> str:
+    """Einzelner (memoisierter) Aufruf; wirft bei endgültigem Fehler."""
+    results, stats = complete_many({"_": (messages, context)}, client=client, model=model, **kwargs)
+    if "_" not in results:
+        raise RuntimeError(stats["errors"].get("_", "LLM request failed"))
+    return results["_"]
@@ -8,14 +8,19 @@ Output: /scripts/source_csv/environmental_performance_index.csv
 """
 
 import os
-import pandas as pd
 
-INFILE   = os.path.join("source_raw", "YALE-EPI.xlsx")
-OUT_EPI  = os.path.join("source_csv", "environmental_performance_index.csv")
-OUT_RECY = os.path.join("source_csv", "recycling_rate.csv")
+from normalize_runner import SOURCE_RAW_DIR, SOURCE_CSV_DIR, read_sheet, write_frame_csv
+
+INFILE   = os.path.join(SOURCE_RAW_DIR, "YALE-EPI.xlsx")
+OUT_EPI  = os.path.join(SOURCE_CSV_DIR, "environmental_performance_index.csv")
+OUT_RECY = os.path.join(SOURCE_CSV_DIR, "recycling_rate.csv")
+
+# für normalize_runner.py
+INPUTS  = [INFILE]
+OUTPUTS = [OUT_EPI, OUT_RECY]
 
 def main():
-    df = pd.read_excel(INFILE, sheet_name=0)
+    df = read_sheet(INFILE, sheet_name=0)
     df.columns = [str(c).strip() for c in df.columns]
 
     # Spalten erkennen
@@ -50,17 +55,16 @@ def main():
     epi_df = df_long.loc[epi_mask, [country_col, "year", "value"]].rename(
         columns={country_col: "country"}
     ).sort_values(["country", "year"])
-    os.makedirs(os.path.dirname(OUT_EPI), exist_ok=True)
-    epi_df.to_csv(OUT_EPI, index=False)
-    print(f"✅ Wrote {OUT_EPI} ({len(epi_df)} rows)")
+    write_frame_csv(epi_df, OUT_EPI)
+    print(f"✅ Wrote {os.path.basename(OUT_EPI)} ({len(epi_df)} rows)")
 
     # --- Recycling ---
     rec_df = df_long.loc[rec_mask, [country_col, "year", "value"]].rename(
         columns={country_col: "country"}
     ).sort_values(["country", "year"])
     if not rec_df.empty:
-        rec_df.to_csv(OUT_RECY, index=False)
-        print(f"✅ Wrote {OUT_RECY} ({len(rec_df)} rows)")
+        write_frame_csv(rec_df, OUT_RECY)
+        print(f"✅ Wrote {os.path.basename(OUT_RECY)} ({len(rec_df)} rows)")
     else:
         print("ℹ️ No Recycling indicator found (YALE.EPI.REC).")
 
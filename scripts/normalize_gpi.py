@@ -13,27 +13,34 @@ import os
 import pandas as pd
 import re
 
-INFILE  = os.path.join("source_raw", "GPI_public_release_2025.xlsx")
-OUTFILE = os.path.join("source_csv", "global_peace_index.csv")
+from normalize_runner import SOURCE_RAW_DIR, SOURCE_CSV_DIR, read_sheet, with_header, write_frame_csv
 
-def find_header_row(path, max_rows=50):
-    """Scan up to `max_rows` rows in sheet 'Overall Scores' to find one containing 'country'."""
-    df_raw = pd.read_excel(path, sheet_name="Overall Scores", header=None, nrows=max_rows)
-    for i in range(len(df_raw)):
+INFILE  = os.path.join(SOURCE_RAW_DIR, "GPI_public_release_2025.xlsx")
+OUTFILE = os.path.join(SOURCE_CSV_DIR, "global_peace_index.csv")
+SHEET   = "Overall Scores"
+
+# für normalize_runner.py
+INPUTS  = [INFILE]
+OUTPUTS = [OUTFILE]
+
+def find_header_row(df_raw, max_rows=50):
+    """Scan up to `max_rows` rows of the header-less sheet to find one containing 'country'."""
+    for i in range(min(max_rows, len(df_raw))):
         row = [str(x).strip().lower() for x in df_raw.iloc[i].values if isinstance(x, str)]
         if any("country" in cell for cell in row):
             return i
     return None
 
 def main():
-    header_row = find_header_row(INFILE)
+    # Sheet nur einmal parsen (ohne Header), Header-Zeile im Speicher setzen
+    df_raw = read_sheet(INFILE, sheet_name=SHEET, header=None)
+    header_row = find_header_row(df_raw)
     if header_row is None:
         raise RuntimeError("❌ Could not find a header row containing 'country' in sheet 'Overall Scores'.")
 
     print(f"🧭 Detected header row at Excel row {header_row + 1}")
 
-    # Datei mit korrektem Sheet & Header einlesen
-    df = pd.read_excel(INFILE, sheet_name="Overall Scores", header=header_row)
+    df = with_header(df_raw, header_row)
     df.columns = [str(c).strip().replace("\u200b", "") for c in df.columns]
 
     # Land-Spalte erkennen
@@ -66,10 +73,9 @@ def main():
     df_long = df_long.sort_values(["country", "year"])
 
     # Export
-    os.makedirs(os.path.dirname(OUTFILE), exist_ok=True)
-    df_long.to_csv(OUTFILE, index=False)
+    write_frame_csv(df_long, OUTFILE)
 
-    print(f"✅ Wrote {OUTFILE} ({len(df_long)} rows, {df_long['year'].min()}–{df_long['year'].max()})")
+    print(f"✅ Wrote {os.path.basename(OUTFILE)} ({len(df_long)} rows, {df_long['year'].min()}–{df_long['year'].max()})")
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,27 @@
-import pandas as pd
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – Normalize INFORM Risk Index (trend sheet)
+Input : /scripts/source_raw/INFORM2024_TREND_2015_2024_v70_ALL.xlsx
+Sheet : "INFORM2025_2nd_edition_Trend"
+Output: /scripts/source_csv/inform_resilience_index.csv
+"""
+
+import os
+
+from normalize_runner import SOURCE_RAW_DIR, SOURCE_CSV_DIR, read_sheet, write_frame_csv
+
+INFILE  = os.path.join(SOURCE_RAW_DIR, "INFORM2024_TREND_2015_2024_v70_ALL.xlsx")
+OUTFILE = os.path.join(SOURCE_CSV_DIR, "inform_resilience_index.csv")
+SHEET   = "INFORM2025_2nd_edition_Trend"
+
+# für normalize_runner.py
+INPUTS  = [INFILE]
+OUTPUTS = [OUTFILE]
 
 def convert_inform_excel_to_csv(input_path, output_path):
     # INFORM Excel laden
-    xls = pd.ExcelFile(input_path)
-    df = xls.parse("INFORM2025_2nd_edition_Trend")
+    df = read_sheet(input_path, sheet_name=SHEET)
 
     # Nur den "INFORM Risk Index" behalten
     df = df[df["IndicatorName"] == "INFORM Risk Index"].copy()
@@ -14,11 +32,11 @@ def convert_inform_excel_to_csv(input_path, output_path):
     df["value"] = df["IndicatorScore"]
 
     df_final = df[["country", "year", "value"]].sort_values(["country", "year"])
-    df_final.to_csv(output_path, index=False)
-    print(f"✅ Saved: {output_path}")
+    write_frame_csv(df_final, output_path)
+    print(f"✅ Saved: {os.path.basename(output_path)}")
+
+def main():
+    convert_inform_excel_to_csv(INFILE, OUTFILE)
 
 if __name__ == "__main__":
-    convert_inform_excel_to_csv(
-        "source_raw/INFORM2024_TREND_2015_2024_v70_ALL.xlsx",
-        "source_csv/inform_resilience_index.csv"
-    )
+    main()
@@ -7,18 +7,77 @@
 # 3. olympic_medals.csv         → kombiniert (Sommer + zugehöriger Winter)
 #
 # Quelle: Kaggle "athlete_events.csv"
+# Vektorisiert (pandas): ein Lesedurchlauf, Dedup per drop_duplicates,
+# Zählung per groupby, NOC-Code → kanonisches Land einmal pro Code.
+# Nicht zuordenbare NOCs landen in country_mappings_pending.json; die dabei
+# verlorenen Medaillen werden pro Code ausgegeben.
+# "python normalize_olympics.py --benchmark" vergleicht mit der alten
+# zeilenweisen Implementierung (legacy_counts).
 # ----------------------------------------------------------------------
 
 import os
 import csv
+import sys
+import time
 from collections import defaultdict
 
-# === Pfade definieren ===
-INFILE  = os.path.join("source_raw", "dataset_olympics.csv")
-OUTDIR  = os.path.join("source_csv")
+import numpy as np
+import pandas as pd
+
+# === Pfade definieren (relativ zu /scripts, unabhängig vom CWD) ===
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INFILE  = os.path.join(SCRIPT_DIR, "source_raw", "dataset_olympics.csv")
+OUTDIR  = os.path.join(SCRIPT_DIR, "source_csv")
 OUT_SUM = os.path.join(OUTDIR, "olympic_medals_summer.csv")
 OUT_WIN = os.path.join(OUTDIR, "olympic_medals_winter.csv")
 OUT_ALL = os.path.join(OUTDIR, "olympic_medals.csv")
+META_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "data", "meta"))
+
+# für normalize_runner.py – die Zuordnung hängt auch an den Mapping-Dateien
+INPUTS  = [INFILE, os.path.join(META_DIR, "countries.json"), os.path.join(META_DIR, "country_mappings.json")]
+OUTPUTS = [OUT_SUM, OUT_WIN, OUT_ALL]
+
+MEDALS  = ("Gold", "Silver", "Bronze")
+USECOLS = ["Team", "NOC", "Games", "Year", "Season", "Event", "Medal"]
+
+# NOC-Code → Ländername für den CountryResolver (fetch_data.py).
+# Alle übrigen NOCs entsprechen dem ISO3-Code aus country_mappings.json.
+NOC_COUNTRIES = {
+    # IOC-Codes, die vom ISO3-Code abweichen (BRN = Bahrain, als ISO3 aber Brunei)
+    "ALG": "Algeria", "ANG": "Angola", "ANT": "Antigua and Barbuda", "ARU": "Aruba",
+    "ASA": "American Samoa", "BAH": "Bahamas", "BAN": "Bangladesh", "BAR": "Barbados",
+    "BER": "Bermuda", "BHU": "Bhutan", "BIZ": "Belize", "BOT": "Botswana", "BRN": "Bahrain", "BRU": "Brunei",
+    "BUL": "Bulgaria", "BUR": "Burkina Faso", "CAM": "Cambodia", "CAY": "Cayman Islands",
+    "CGO": "Congo", "CHA": "Chad", "CHI": "Chile", "CRC": "Costa Rica", "CRO": "Croatia",
+    "DEN": "Denmark", "ESA": "El Salvador", "FIJ": "Fiji", "GAM": "Gambia",
+    "GBS": "Guinea-Bissau", "GEQ": "Equatorial Guinea", "GER": "Germany", "GRE": "Greece",
+    "GRN": "Grenada", "GUA": "Guatemala", "GUI": "Guinea", "HAI": "Haiti", "HON": "Honduras",
+    "INA": "Indonesia", "IRI": "Iran", "ISV": "US Virgin Islands", "IVB": "British Virgin Islands",
+    "KOS": "Kosovo", "KSA": "Saudi Arabia", "KUW": "Kuwait", "LAT": "Latvia", "LBA": "Libya",
+    "LES": "Lesotho", "LIB": "Lebanon", "MAD": "Madagascar", "MAS": "Malaysia", "MAW": "Malawi",
+    "MGL": "Mongolia", "MON": "Monaco", "MRI": "Mauritius", "MTN": "Mauritania",
+    "MYA": "Myanmar", "NCA": "Nicaragua", "NED": "Netherlands", "NEP": "Nepal",
+    "NGR": "Nigeria", "NIG": "Niger", "OMA": "Oman", "PAR": "Paraguay", "PHI": "Philippines",
+    "PLE": "Palestine", "POR": "Portugal", "PUR": "Puerto Rico", "RSA": "South Africa",
+    "SAM": "Samoa", "SEY": "Seychelles", "SIN": "Singapore", "SKN": "Saint Kitts and Nevis",
+    "SLO": "Slovenia", "SOL": "Solomon Islands", "SRI": "Sri Lanka", "SUD": "Sudan",
+    "SUI": "Switzerland", "TAN": "Tanzania", "TGA": "Tonga", "TOG": "Togo", "TPE": "Taiwan",
+    "TRI": "Trinidad and Tobago", "UAE": "United Arab Emirates", "URU": "Uruguay",
+    "VAN": "Vanuatu", "VIE": "Vietnam", "VIN": "Saint Vincent and the Grenadines",
+    "ZAM": "Zambia", "ZIM": "Zimbabwe",
+    # Nachfolge-NOCs laut IOC zählen für den Nachfolgestaat (wie URS → Russia, FRG → Germany)
+    "EUN": "Russia", "ROC": "Russia", "OAR": "Russia", "GDR": "Germany",
+    "TCH": "Czechia", "YUG": "Serbia", "SCG": "Serbia",
+    # übrige historische NOCs → Name; ob und worauf sie zählen, entscheidet country_mappings.json
+    "URS": "Soviet Union", "FRG": "West Germany", "SAA": "Saar", "BOH": "Bohemia",
+    "ANZ": "Australasia", "RHO": "Rhodesia",
+    "UAR": "United Arab Republic", "WIF": "West Indies Federation", "AHO": "Netherlands Antilles",
+    "RU1": "Russian Empire", "NBO": "North Borneo", "MAL": "Malaya", "NFL": "Newfoundland",
+    "CRT": "Crete", "YAR": "North Yemen", "YMD": "South Yemen",
+}
+
+# Teams ohne Land (unabhängige Athleten, Flüchtlingsteam, gemischte Teams) – bewusst verworfen
+NOC_WITHOUT_COUNTRY = {"IOA", "IOP", "EOR", "ROT", "ZZX", "UNK"}
 
 
 # ======================================================================
@@ -36,23 +95,78 @@ def cycle_year(year: int, season: str) -> int:
 
 
 # ======================================================================
-# 🧹 Hauptfunktion
+# 🌍 NOC → Land
 # ======================================================================
-def main():
-    assert os.path.exists(INFILE), f"❌ Input file not found: {INFILE}"
+def resolve_nocs(codes, resolver=None):
+    """
+    → ({NOC: kanonisches Land}, {Name: Pending-Grund}) für die Codes.
+    Bewusst verworfen (Mapping "" oder NOC_WITHOUT_COUNTRY) ist kein Pending.
+    """
+    if resolver is None:
+        from fetch_data import CountryResolver
+        resolver = CountryResolver.from_meta()
+    mapping, pending = {}, {}
+    for code in codes:
+        if code in NOC_WITHOUT_COUNTRY:
+            continue
+        name = NOC_COUNTRIES.get(code, code)
+        outcome, canon, reason = resolver.lookup(name)
+        if outcome == "ok":
+            mapping[code] = canon
+        elif outcome != "drop":
+            pending[name] = f"Olympic NOC {code}: {reason}"
+    return mapping, pending
+
 
-    # Zähler und Dedup-Sets
+# ======================================================================
+# 🧹 Medaillen zählen (vektorisiert)
+# ======================================================================
+def medal_counts(path: str = INFILE, resolver=None):
+    """
+    → (summer, winter, combined) als DataFrames country,year,value,
+      {NOC: verworfene Medaillen} und {Name: Pending-Grund} der nicht zuordenbaren NOCs.
+    """
+    df = pd.read_csv(path, usecols=USECOLS, dtype=str, keep_default_na=False)
+    df = df[df["Medal"].str.strip().isin(MEDALS)]
+    df = df.apply(lambda col: col.str.strip())
+    df = df[df["Year"].str.fullmatch(r"[+-]?\d+")]
+
+    # Dedup: EIN Eintrag je (Games, Event, Medal, NOC) – Mannschaften zählen einmal
+    df = df.drop_duplicates(["Games", "Event", "Medal", "NOC"])
+
+    mapping, pending = resolve_nocs(df["NOC"].unique(), resolver)
+    if len(df) and not mapping:
+        raise RuntimeError("No NOC code could be mapped – check data/meta/country_mappings.json")
+    df = df.assign(country=df["NOC"].map(mapping), year=df["Year"].astype(int))
+    dropped = {code: int(n) for code, n in df.loc[df["country"].isna(), "NOC"].value_counts().items()}
+    df = df[df["country"].notna()]
+
+    summer = df["Season"] == "Summer"
+    winter = df["Season"] == "Winter"
+    # Kombinierter Zyklus (vektorisierte Variante von cycle_year)
+    df["cycle"] = np.where(summer | (df["year"] <= 1992), df["year"], df["year"] + 2)
+
+    def count(frame, year_col):
+        out = frame.groupby(["country", year_col]).size().reset_index(name="value")
+        return out.rename(columns={year_col: "year"}).sort_values(["country", "year"])
+
+    return count(df[summer], "year"), count(df[winter], "year"), count(df, "cycle"), dropped, pending
+
+
+# ======================================================================
+# 🐢 Alte Implementierung (zeilenweise, nach Team-Namen) – nur für --benchmark
+# ======================================================================
+def legacy_counts(path: str = INFILE):
     seen_keys = set()
     per_summer = defaultdict(int)
     per_winter = defaultdict(int)
     per_all    = defaultdict(int)
 
-    # === Daten einlesen ===
-    with open(INFILE, newline="", encoding="utf-8") as f:
+    with open(path, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             medal  = (row.get("Medal") or "").strip()
-            if medal not in ("Gold", "Silver", "Bronze"):
+            if medal not in MEDALS:
                 continue
 
             games  = (row.get("Games") or "").strip()
@@ -67,46 +181,69 @@ def main():
             except ValueError:
                 continue
 
-            # Dedup-Schlüssel: EIN Eintrag je (Games, Event, Medal, NOC)
             key = (games, event, medal, noc)
             if key in seen_keys:
                 continue
             seen_keys.add(key)
 
-            # Zählen nach Saison
             if season == "Summer":
                 per_summer[(team, year)] += 1
             elif season == "Winter":
                 per_winter[(team, year)] += 1
+            per_all[(team, cycle_year(year, season))] += 1
+
+    return per_summer, per_winter, per_all
+
+def benchmark(path: str = INFILE):
+    from fetch_data import CountryResolver
+    resolver = CountryResolver.from_meta()
+
+    t0 = time.perf_counter()
+    legacy = legacy_counts(path)
+    t1 = time.perf_counter()
+    *new, dropped, _ = medal_counts(path, resolver)
+    t2 = time.perf_counter()
+
+    print(f"legacy (csv.DictReader): {t1 - t0:.2f}s")
+    print(f"pandas (groupby):        {t2 - t1:.2f}s  → {(t1 - t0) / max(t2 - t1, 1e-9):.1f}x")
+    for name, old, frame in zip(("summer", "winter", "combined"), legacy, new):
+        print(f"{name:9s} legacy: {len(old):5d} team rows, {sum(old.values()):6d} medals | "
+              f"new: {len(frame):5d} country rows, {int(frame['value'].sum()):6d} medals")
+    print(f"Dropped NOCs (medals): {', '.join(f'{c} {n}' for c, n in dropped.items()) or '–'}")
 
-            # Kombinierter Zyklus
-            cy = cycle_year(year, season)
-            per_all[(team, cy)] += 1
 
-    # === Ausgabe schreiben ===
-    os.makedirs(OUTDIR, exist_ok=True)
+# ======================================================================
+# 🧹 Hauptfunktion
+# ======================================================================
+def main():
+    assert os.path.exists(INFILE), f"❌ Input file not found: {INFILE}"
+    from normalize_runner import write_frame_csv
+    from fetch_data import COUNTRY_PENDING_FILE, read_json, write_json
 
-    def write_csv(path, data_dict):
-        rows = [{"country": k[0], "year": k[1], "value": v} for k, v in data_dict.items()]
-        rows.sort(key=lambda x: (x["country"], x["year"]))
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["country", "year", "value"])
-            writer.writeheader()
-            writer.writerows(rows)
-        print(f"✅ Wrote {path} ({len(rows)} rows)")
+    summer, winter, combined, dropped, pending = medal_counts(INFILE)
 
-    write_csv(OUT_SUM, per_summer)
-    write_csv(OUT_WIN, per_winter)
-    write_csv(OUT_ALL, per_all)
+    for path, frame in ((OUT_SUM, summer), (OUT_WIN, winter), (OUT_ALL, combined)):
+        write_frame_csv(frame, path)
+        print(f"✅ Wrote {os.path.basename(path)} ({len(frame)} rows)")
 
     print("\n=== Olympic Medals Normalization Completed ===")
-    print(f"Summer: {len(per_summer)} records")
-    print(f"Winter: {len(per_winter)} records")
-    print(f"Combined: {len(per_all)} records")
+    print(f"Summer: {len(summer)} records")
+    print(f"Winter: {len(winter)} records")
+    print(f"Combined: {len(combined)} records")
+    if dropped:
+        print(f"ℹ️ Medals dropped (NOC without country): {', '.join(f'{c} {n}' for c, n in dropped.items())}")
+    if pending:
+        # wie bei fetch_data: unbekannte Namen zum Nachpflegen in country_mappings.json
+        write_json(COUNTRY_PENDING_FILE, {**read_json(COUNTRY_PENDING_FILE, {}), **pending})
+        print(f"⚠️ {len(pending)} NOC name(s) added to {os.path.basename(COUNTRY_PENDING_FILE)}: "
+              f"{', '.join(sorted(pending))}")
 
 
 # ======================================================================
 # 🚀 Startpunkt
 # ======================================================================
 if __name__ == "__main__":
-    main()
+    if "--benchmark" in sys.argv:
+        benchmark()
+    else:
+        main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – Normalizer Runner
+--------------------------------
+Führt die Konverter scripts/normalize_*.py aus (source_raw/ → source_csv/):
+ • Registry CONVERTERS: jedes Modul deklariert INPUTS, OUTPUTS und main()
+ • übersprungen wird, wer unveränderte Eingaben (Datei-Hash + Skript-Hash)
+   und vorhandene Ausgaben hat (BuildState, Artefakt "normalize:<name>")
+ • fehlt eine Eingabedatei, bleibt die bestehende CSV unverändert
+ • unabhängige Konverter laufen parallel in einem Prozess-Pool
+ • read_sheet(): geparste Excel-Sheets als Pickle unter
+   source_raw/.sheet_cache/, Schlüssel = Datei-Hash + Sheet + Optionen
+
+Aufruf: python normalize_runner.py [name ...] [--force]
+"""
+
+import os
+import sys
+import time
+import pickle
+import importlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from build_state import get_build_state, file_hash, value_hash
+from publish import write_bytes_if_changed, write_text_if_changed
+
+# ======================================================================
+# 🔧 Pfade & Registry
+# ======================================================================
+SCRIPT_DIR      = os.path.dirname(os.path.abspath(__file__))
+SOURCE_RAW_DIR  = os.path.join(SCRIPT_DIR, "source_raw")
+SOURCE_CSV_DIR  = os.path.join(SCRIPT_DIR, "source_csv")
+SHEET_CACHE_DIR = os.path.join(SOURCE_RAW_DIR, ".sheet_cache")
+
+# Name → Modul (muss INPUTS, OUTPUTS und main() bereitstellen)
+CONVERTERS = {
+    "epi":       "normalize_epi",
+    "gpi":       "normalize_gpi",
+    "iri":       "normalize_iri",
+    "olympics":  "normalize_olympics",
+}
+
+NORMALIZE_WORKERS = int(os.getenv("NORMALIZE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+# ======================================================================
+# 🗄️ Sheet-Cache
+# ======================================================================
+def read_sheet(path: str, sheet_name: Any = 0, **kwargs) -> pd.DataFrame:
+    """
+    pd.read_excel mit Pickle-Cache. Ändert sich die Datei (Hash) oder die
+    Lese-Option, wird neu geparst; alte Einträge derselben Datei werden entfernt.
+    """
+    digest = file_hash(path)
+    if digest is None:
+        raise FileNotFoundError(path)
+    key = value_hash({"sheet": sheet_name, "kwargs": kwargs})[:16]
+    base = os.path.basename(path)
+    cache_path = os.path.join(SHEET_CACHE_DIR, f"{base}.{digest[:16]}.{key}.pkl")
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        pass
+
+    df = pd.read_excel(path, sheet_name=sheet_name, **kwargs)
+    try:
+        os.makedirs(SHEET_CACHE_DIR, exist_ok=True)
+        for name in os.listdir(SHEET_CACHE_DIR):
+            if name.startswith(f"{base}.") and not name.startswith(f"{base}.{digest[:16]}."):
+                os.remove(os.path.join(SHEET_CACHE_DIR, name))
+        write_bytes_if_changed(cache_path, pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+    except OSError as e:
+        print(f"⚠️ Could not cache {base} [{sheet_name}]: {e}")
+    return df
+
+def with_header(raw: pd.DataFrame, header_row: int) -> pd.DataFrame:
+    """Aus einem ohne Header gelesenen Sheet (header=None) den Header setzen – ohne neu zu parsen."""
+    df = raw.iloc[header_row + 1:].reset_index(drop=True)
+    df.columns = [f"Unnamed: {i}" if pd.isna(c) else c for i, c in enumerate(raw.iloc[header_row])]
+    return df.infer_objects()
+
+def write_frame_csv(df: pd.DataFrame, path: str) -> bool:
+    """CSV ohne Index; nur schreiben, wenn sich der Inhalt geändert hat."""
+    return write_text_if_changed(path, df.to_csv(index=False))
+
+
+# ======================================================================
+# 🚀 Runner
+# ======================================================================
+def load_converter(name: str):
+    return importlib.import_module(CONVERTERS[name])
+
+def converter_inputs(name: str) -> Dict[str, Optional[str]]:
+    module = load_converter(name)
+    inputs = {os.path.relpath(p, SCRIPT_DIR): file_hash(p) for p in module.INPUTS}
+    inputs["__script__"] = file_hash(module.__file__)
+    return inputs
+
+def _run(name: str) -> Dict[str, Any]:
+    """Läuft im Worker-Prozess."""
+    started = time.monotonic()
+    try:
+        load_converter(name).main()
+        return {"name": name, "ok": True, "seconds": time.monotonic() - started}
+    except Exception as e:
+        return {"name": name, "ok": False, "error": f"{type(e).__name__}: {e}",
+                "seconds": time.monotonic() - started}
+
+def run_normalizers(names: Optional[List[str]] = None, state=None, force: bool = False,
+                    workers: int = NORMALIZE_WORKERS) -> Dict[str, str]:
+    """
+    Führt die (geänderten) Konverter aus → {name: "ok" | "skipped" | "missing" | "failed"}.
+    Fehler brechen den Lauf nicht ab – die vorhandenen CSVs bleiben dann stehen.
+    """
+    state = state or get_build_state()
+    names = names or list(CONVERTERS)
+    outcome: Dict[str, str] = {}
+    todo: Dict[str, Dict[str, Optional[str]]] = {}
+
+    for name in names:
+        module = load_converter(name)
+        missing = [p for p in module.INPUTS if not os.path.exists(p)]
+        if missing:
+            print(f"ℹ️ {name}: input missing ({', '.join(os.path.basename(p) for p in missing)}) – keeping existing CSV")
+            outcome[name] = "missing"
+            continue
+        inputs = converter_inputs(name)
+        if not force and state.is_current(f"normalize:{name}", inputs, *module.OUTPUTS):
+            outcome[name] = "skipped"
+            continue
+        todo[name] = inputs
+
+    if todo:
+        print(f"🧹 Running {len(todo)} normalizer(s): {', '.join(todo)}")
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(todo)))) as pool:
+            futures = [pool.submit(_run, name) for name in todo]
+            for fut in as_completed(futures):
+                res = fut.result()
+                name = res["name"]
+                if res["ok"]:
+                    state.mark(f"normalize:{name}", todo[name])
+                    outcome[name] = "ok"
+                    print(f"✅ {name} normalized ({res['seconds']:.1f}s)")
+                else:
+                    outcome[name] = "failed"
+                    print(f"⚠️ {name} failed – keeping existing CSV: {res['error']}")
+        state.save()
+
+    skipped = [n for n, o in outcome.items() if o == "skipped"]
+    if skipped:
+        print(f"⏭️ Normalizers up to date: {', '.join(skipped)}")
+    return outcome
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    unknown = [a for a in args if a not in CONVERTERS]
+    if unknown:
+        sys.exit(f"Unknown converter(s): {', '.join(unknown)} (available: {', '.join(CONVERTERS)})")
+    run_normalizers(args or None, force="--force" in sys.argv)
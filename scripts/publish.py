@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – Delta Publishing Helpers
+---------------------------------------
+ • write_*_if_changed(): atomar schreiben (temp + rename) und gar nicht
+   schreiben, wenn der Inhalt identisch ist → keine Zeitstempel-/Byte-Churn
+   für git und den FTP-Deploy
+ • data/manifest.json: Größe + SHA-256 pro Datei und die Liste der seit dem
+   letzten Manifest geänderten / entfernten Dateien
+"""
+
+import os
+import io
+import csv
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+SCRIPT_DIR    = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR      = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+DATA_DIR      = os.path.join(ROOT_DIR, "data")
+MANIFEST_FILE = os.path.join(DATA_DIR, "manifest.json")
+
+# Nicht veröffentlicht / nur lokaler Zustand
+MANIFEST_EXCLUDE_DIRS  = {"http_cache", "llm_cache", "pending", "columnar"}
+MANIFEST_EXCLUDE_FILES = {"manifest.json", "build_state.json"}
+
+
+# ======================================================================
+# ✍️ Atomar schreiben, nur bei Änderung
+# ======================================================================
+def write_bytes_if_changed(path: str, data: bytes) -> bool:
+    """True, wenn die Datei neu geschrieben wurde."""
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
+
+def write_text_if_changed(path: str, text: str) -> bool:
+    return write_bytes_if_changed(path, text.encode("utf-8"))
+
+def write_json_if_changed(path: str, obj: Any, stamps: Iterable[str] = (), **dump_kwargs) -> bool:
+    """
+    stamps: Top-Level-Schlüssel wie "generated", die allein keine Änderung sind –
+    stimmt der Rest mit der bestehenden Datei überein, bleiben deren Werte stehen.
+    """
+    dump_kwargs.setdefault("ensure_ascii", False)
+    if stamps and isinstance(obj, dict):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                old = json.load(f)
+        except Exception:
+            old = None
+        if isinstance(old, dict) and all(k in old for k in stamps) and \
+                {k: v for k, v in old.items() if k not in stamps} == \
+                {k: v for k, v in obj.items() if k not in stamps}:
+            obj = {**obj, **{k: old[k] for k in stamps}}
+    return write_text_if_changed(path, json.dumps(obj, **dump_kwargs))
+
+def write_csv_if_changed(path: str, rows: Iterable[Dict[str, Any]], fieldnames) -> bool:
+    buf = io.StringIO(newline="")
+    w = csv.DictWriter(buf, fieldnames=fieldnames)
+    w.writeheader()
+    w.writerows(rows)
+    return write_text_if_changed(path, buf.getvalue())
+
+
+# ======================================================================
+# 📋 Manifest
+# ======================================================================
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def scan_files(data_dir: str = DATA_DIR) -> Dict[str, Dict[str, Any]]:
+    files = {}
+    for root, dirs, names in os.walk(data_dir):
+        dirs[:] = sorted(d for d in dirs if d not in MANIFEST_EXCLUDE_DIRS)
+        for name in sorted(names):
+            if name in MANIFEST_EXCLUDE_FILES or name.endswith(".tmp"):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, data_dir).replace(os.sep, "/")
+            files[rel] = {"size": os.path.getsize(path), "sha256": file_sha256(path)}
+    return files
+
+def write_manifest(data_dir: str = DATA_DIR, path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Schreibt data/manifest.json. "changed"/"removed" beziehen sich auf das
+    vorherige Manifest – genau diese Dateien muss ein Deploy übertragen.
+    Ohne Änderungen bleibt die Datei unangetastet.
+    """
+    path = path or os.path.join(data_dir, "manifest.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    except Exception:
+        previous = {}
+    old = previous.get("files") or {}
+    files = scan_files(data_dir)
+    if files == old:
+        print(f"📋 Manifest unchanged ({len(files)} files)")
+        return previous
+
+    manifest = {
+        "generated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "changed": sorted(f for f, info in files.items() if old.get(f) != info),
+        "removed": sorted(set(old) - set(files)),
+        "files": files,
+    }
+    write_json_if_changed(path, manifest, indent=1)
+    print(f"📋 Manifest written: {len(manifest['changed'])} changed, "
+          f"{len(manifest['removed'])} removed, {len(files)} files")
+    return manifest
+
+
+if __name__ == "__main__":
+    write_manifest()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – Weighted Composite Scoring
+-----------------------------------------
+Gewichtete Gesamt-Scores über der Länder × KPI-Matrix aus fetch_overall_ranking:
+ • Gewichte pro KPI und/oder pro Cluster (Standard: aus "relevance")
+ • Normierung: "rank" (Perzentil), "zscore" oder "minmax"
+ • Umgang mit Lücken: "skip" (Gewichte neu normieren), "mean" (neutral), "worst"
+ • score_many(): tausende Gewichtsprofile als eine Matrixmultiplikation
+ • Cluster-Teilscores sind vorberechnet → Profilwechsel ohne KPI-Dateien
+
+Beispiel:
+    sm = ScoringMatrix.from_store()
+    sm.score(cluster_weights={"Economy & Labor": 2}, normalization="zscore")
+    sm.score_many(np.random.rand(5000, len(sm.kpis)))
+"""
+
+import os
+import sys
+import json
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from kpi_store import get_store
+from fetch_overall_ranking import (
+    AVAILABLE_FILE, load_json, select_ranking_kpis,
+    build_latest_matrix, orient_matrix, percentile_matrix,
+)
+
+# ======================================================================
+# 🔧 Einstellungen
+# ======================================================================
+NORMALIZATIONS  = ("rank", "zscore", "minmax")
+MISSING_POLICIES = ("skip", "mean", "worst")
+
+# Cluster ohne Angabe in cluster_weights zählen normal (score und score_clusters)
+DEFAULT_CLUSTER_WEIGHT = 1.0
+# Mindestanteil des Gewichts, für das ein Land Werte haben muss – sonst NaN,
+# damit Länder mit nur einem KPI keinen Gesamt-Score anführen
+MIN_COVERAGE = float(os.getenv("SCORE_MIN_COVERAGE", "0.5"))
+
+# Standardgewicht je "relevance" aus available_kpis.json
+RELEVANCE_WEIGHTS = {
+    "critical":   3.0,
+    "very_high":  2.0,
+    "high":       1.5,
+    "normal":     1.0,
+    "low":        0.5,
+    "irrelevant": 0.25,
+    "none":       0.0,
+}
+
+
+# ======================================================================
+# 📐 ScoringMatrix
+# ======================================================================
+class ScoringMatrix:
+    """
+    Normierte Länder × KPI-Matrizen (größer = besser) für alle Normierungen,
+    einmal berechnet. Alle Score-Funktionen arbeiten nur noch auf NumPy-Arrays.
+    """
+    def __init__(self, values: pd.DataFrame, valid_kpis: Dict[str, dict]):
+        oriented = orient_matrix(values, valid_kpis)
+        self.countries = list(oriented.index)
+        self.kpis = list(oriented.columns)
+        self.clusters = [valid_kpis[k].get("cluster") or "Other" for k in self.kpis]
+        self.default_weights = np.array(
+            [RELEVANCE_WEIGHTS.get(valid_kpis[k].get("relevance", "normal"), 1.0) for k in self.kpis])
+        self.present = oriented.notna().to_numpy()
+
+        spread = oriented.max() - oriented.min()
+        self.normalized = {
+            "rank":   percentile_matrix(oriented).to_numpy(),
+            "zscore": ((oriented - oriented.mean()) / oriented.std(ddof=0).replace(0, np.nan)).to_numpy(),
+            "minmax": ((oriented - oriented.min()) / spread.replace(0, np.nan)).to_numpy(),
+        }
+        # KPIs ohne Streuung (alle gleich) gelten als neutral statt fehlend
+        for norm, neutral in (("zscore", 0.0), ("minmax", 0.5)):
+            m = self.normalized[norm]
+            m[self.present & np.isnan(m)] = neutral
+
+        self._filled = {}
+        self._cluster_scores = {}
+
+    # --- Aufbau ---------------------------------------------------------
+    @classmethod
+    def from_store(cls, store=None, available=None) -> "ScoringMatrix":
+        """Baut die Matrix aus dem geteilten KpiStore (jede Datei höchstens einmal geparst)."""
+        store = store or get_store()
+        valid_kpis = select_ranking_kpis(available if available is not None else load_json(AVAILABLE_FILE))
+        values, _ = build_latest_matrix(store, valid_kpis)
+        return cls(values, valid_kpis)
+
+    # --- Gewichte -------------------------------------------------------
+    def weight_vector(self, weights: Optional[Dict[str, float]] = None,
+                      cluster_weights: Optional[Dict[str, float]] = None,
+                      use_relevance: bool = True) -> np.ndarray:
+        """
+        Gewicht pro KPI = Relevanz-Gewicht × Cluster-Gewicht; explizite
+        KPI-Gewichte (`weights`) ersetzen das Ergebnis für diesen KPI.
+        """
+        w = self.default_weights.copy() if use_relevance else np.ones(len(self.kpis))
+        if cluster_weights:
+            w *= np.array([cluster_weights.get(c, DEFAULT_CLUSTER_WEIGHT) for c in self.clusters])
+        if weights:
+            unknown = set(weights) - set(self.kpis)
+            if unknown:
+                raise KeyError(f"Unknown KPI(s): {', '.join(sorted(unknown))}")
+            for k, v in weights.items():
+                w[self.kpis.index(k)] = v
+        return w
+
+    # --- Lücken-Politik -------------------------------------------------
+    def _matrix(self, normalization: str, missing: str) -> np.ndarray:
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(f"normalization must be one of {NORMALIZATIONS}")
+        if missing not in MISSING_POLICIES:
+            raise ValueError(f"missing must be one of {MISSING_POLICIES}")
+        key = (normalization, missing)
+        if key not in self._filled:
+            m = self.normalized[normalization]
+            if missing == "skip":
+                filled = np.where(self.present, m, 0.0)
+            else:
+                fill = np.nanmean(m, axis=0) if missing == "mean" else np.nanmin(m, axis=0)
+                filled = np.where(self.present, m, np.nan_to_num(fill)[None, :])
+            self._filled[key] = filled
+        return self._filled[key]
+
+    # --- Scores ---------------------------------------------------------
+    def score_many(self, weight_profiles, normalization: str = "rank",
+                   missing: str = "skip", min_coverage: float = MIN_COVERAGE) -> np.ndarray:
+        """
+        Scores für viele Gewichtsprofile auf einmal.
+        weight_profiles: (n_profiles × n_kpis) → Ergebnis (n_countries × n_profiles).
+        Bei "skip" wird pro Land nur über vorhandene KPIs gemittelt; Länder, deren
+        vorhandenes Gewicht unter `min_coverage` (Anteil) liegt, bekommen NaN.
+        Einheit: 0–100 für "rank"/"minmax", mittlerer z-Wert für "zscore".
+        """
+        W = np.atleast_2d(np.asarray(weight_profiles, dtype=float)).T   # kpis × profiles
+        X = self._matrix(normalization, missing)
+        total = W.sum(axis=0)
+        covered = self.present.astype(float) @ W
+        denom = covered if missing == "skip" else np.broadcast_to(total, covered.shape)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = (X @ W) / denom
+            if min_coverage > 0:
+                scores[covered / total < min_coverage] = np.nan
+        scores[denom == 0] = np.nan
+        return scores * 100 if normalization != "zscore" else scores
+
+    def score(self, weights: Optional[Dict[str, float]] = None,
+              cluster_weights: Optional[Dict[str, float]] = None,
+              normalization: str = "rank", missing: str = "skip",
+              min_coverage: float = MIN_COVERAGE, use_relevance: bool = True) -> pd.Series:
+        """Score pro Land für ein Profil (absteigend sortiert)."""
+        w = self.weight_vector(weights, cluster_weights, use_relevance)
+        s = self.score_many(w[None, :], normalization, missing, min_coverage)[:, 0]
+        return pd.Series(s, index=self.countries).sort_values(ascending=False)
+
+    # --- Cluster-Teilscores ---------------------------------------------
+    def cluster_scores(self, normalization: str = "rank", missing: str = "skip") -> pd.DataFrame:
+        """
+        Vorberechnete Teilscores (Länder × Cluster) mit Relevanz-Gewichten.
+        Ohne Mindestabdeckung – die greift erst beim Gesamt-Score.
+        """
+        key = (normalization, missing)
+        if key not in self._cluster_scores:
+            names = sorted(set(self.clusters))
+            profiles = np.array([[w if c == name else 0.0
+                                  for w, c in zip(self.default_weights, self.clusters)]
+                                 for name in names])
+            self._cluster_scores[key] = pd.DataFrame(
+                self.score_many(profiles, normalization, missing, min_coverage=0.0),
+                index=self.countries, columns=names)
+        return self._cluster_scores[key]
+
+    def score_clusters(self, cluster_weights: Dict[str, float],
+                       normalization: str = "rank", missing: str = "skip",
+                       min_coverage: float = MIN_COVERAGE) -> pd.Series:
+        """
+        Schneller Profilwechsel nur über Cluster: gewichteter Mittelwert der
+        Teilscores (Cluster ohne Wert werden pro Land übersprungen). Fehlende
+        Cluster und `min_coverage` wie bei score(cluster_weights=…).
+        """
+        sub = self.cluster_scores(normalization, missing)
+        w = np.array([cluster_weights.get(c, DEFAULT_CLUSTER_WEIGHT) for c in sub.columns])
+        vals = sub.to_numpy()
+        has = ~np.isnan(vals)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            s = (np.where(has, vals, 0.0) @ w) / (has @ w)
+            if min_coverage > 0:
+                kpi_w = self.weight_vector(cluster_weights=cluster_weights)
+                s[(self.present @ kpi_w) / kpi_w.sum() < min_coverage] = np.nan
+        return pd.Series(s, index=self.countries).sort_values(ascending=False)
+
+
+# ======================================================================
+# ▶ Start – Top-Liste für ein Profil (z. B. "Economy & Labor=2")
+# ======================================================================
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    opts = {"normalization": "rank", "missing": "skip"}
+    cluster_weights = {}
+    for arg in argv:
+        name, _, val = arg.partition("=")
+        if name in opts:
+            opts[name] = val
+        elif val:
+            cluster_weights[name] = float(val)
+
+    sm = ScoringMatrix.from_store()
+    scores = sm.score(cluster_weights=cluster_weights or None, **opts)
+    print(json.dumps({c: round(float(v), 2) for c, v in scores.head(20).items()},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 // core.js already provides loadJSON(), showSpinner(), etc.
-let ALL_DATA = {};  // consolidated dataset
+let ALL_DATA = {};  // bisher geladene KPIs ({filename: rows}, clusterweise nachgeladen)
+let kpiIndex = {};  // all_kpis_index.json (Zeilen pro KPI)
 
 
 /* ========= Globals ========= */
@@ -81,7 +82,7 @@ async function init() {
     populationData = await loadJSON("data/population.json");
     gdpData = await loadJSON("data/gdp.json");
     areaData = await loadJSON("data/area.json");
-	ALL_DATA = await loadAllKPIData(); // ✅ Consolidated dataset
+	kpiIndex = await loadJSON("data/all_kpis_index.json"); // Daten kommen erst mit der KPI-Auswahl
 	showSpinner(false); // Loader wieder ausblenden
 
 
@@ -140,13 +141,15 @@ async function populateKpiSelect() {
         const o = document.createElement("option");
         o.value = it.id;
         o.textContent = it.title;
-        try {
+        // Zeilenzahl aus dem Index; ältere Indizes ohne "kpis" → KPI-Datei prüfen
+        let empty;
+        if (kpiIndex?.kpis) {
+          empty = !kpiIndex.kpis[it.id]?.rows;
+        } else {
           const d = await loadJSON(`data/${it.id}.json`);
-          if (!Array.isArray(d) || !d.length) {
-            o.style.color = "gray";
-            o.style.fontStyle = "italic";
-          }
-        } catch {
+          empty = !Array.isArray(d) || !d.length;
+        }
+        if (empty) {
           o.style.color = "gray";
           o.style.fontStyle = "italic";
         }
@@ -659,8 +662,31 @@ function getColorForCountry(name) {
 }
 
 
+/* ========= KPI-Daten nachladen ========= */
+// Cluster-Shard des KPIs (liefert die Nachbarn im selben Cluster gleich mit),
+// sonst der einzelne KPI per Byte-Range aus den Parts; nur ohne neuen Index
+// der ganze Datensatz.
+async function loadKpiRows(meta) {
+  const filename = meta.filename || meta.id || meta.title;
+  if (filename in ALL_DATA) return ALL_DATA[filename];
+
+  showSpinner(true, "Loading data…");
+  try {
+    const shard = await loadClusterData(meta.cluster || "Other");
+    if (shard) Object.assign(ALL_DATA, shard);
+    if (!(filename in ALL_DATA)) {
+      if (!kpiIndex?.kpis) Object.assign(ALL_DATA, await loadAllKPIData()); // alter Index ohne Byte-Ranges
+      else if (kpiIndex.kpis[filename]) ALL_DATA[filename] = (await loadKPIData(filename)) || [];
+    }
+  } finally {
+    showSpinner(false);
+  }
+  if (!(filename in ALL_DATA)) ALL_DATA[filename] = [];
+  return ALL_DATA[filename];
+}
+
 /* ========= Compatibility: updateView() ========= */
-function updateView() {
+async function updateView() {
   try {
     const sel = document.getElementById("kpiSelect");
     currentKpi = sel?.value || currentKpi;
@@ -675,7 +701,10 @@ function updateView() {
 
     const filename = meta.filename || meta.id || meta.title;
 
-	currentData = ALL_DATA[filename] || [];
+	const requested = currentKpi;
+	const rows = await loadKpiRows(meta);
+	if (currentKpi !== requested) return; // inzwischen anderer KPI gewählt
+	currentData = rows;
 
       console.log(`✅ updateView(): ${filename} → ${currentData.length} records`);
 
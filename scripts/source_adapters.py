@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RealityCheck – Source Adapters
+------------------------------
+Deklarative Spalten-Zuordnung pro KPI statt Sonderfällen im Code.
+In available_kpis.json optional unter "adapter":
+
+  "adapter": {
+    "country":   "Entity",              Länderspalte   (Liste = Kandidaten, erster Treffer gewinnt)
+    "year":      "Year",                Jahresspalte
+    "iso2":      "Code",                Code-Spalte (optional)
+    "value":     "co2",                 Wertspalte (Kandidaten)
+    "values":    ["Drought", "Flood"],  mehrere Spalten kombinieren, "*" = alle numerischen
+                                        Nicht-Schlüsselspalten (nur wenn "value" fehlt)
+    "aggregate": "sum",                 sum | mean | min | max  (für "values")
+    "filter":    {"Sex": "Total"},      nur Zeilen mit diesem Wert (oder einem Wert aus einer Liste)
+    "country_alias": {"All disasters": "World"},   Umbenennung vor der Länder-Auflösung
+    "unit_scale": 0.001                 Faktor auf den Wert ("scale" ist nur die Anzeige)
+  }
+
+Nicht angegebene Felder kommen aus SOURCE_DEFAULTS (je source_type).
+compile_adapter() prüft die Angaben einmal pro KPI; Adapter.apply() arbeitet
+vektorisiert auf der Tabelle, die pro Quelle nur einmal geparst wird – bei
+großen Dateien auf jedem Stück einzeln (Ergebnis identisch, außer bei "*").
+"""
+
+import re
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ======================================================================
+# 🔧 Defaults je Quelle
+# ======================================================================
+# match: "exact" = Spaltenname (Groß-/Kleinschreibung egal), "contains" = Teilstring
+SOURCE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "csv": {
+        "country": "country", "year": "year", "value": "value", "iso2": "iso2",
+        "match": "exact",
+    },
+    "owid": {
+        "country": "Entity", "year": "Year", "iso2": "Code", "value": None,
+        "require": ["Entity", "Code", "Year"],
+        "world_iso2": "OWID_WRL",
+        "match": "exact",
+    },
+    "unhcr": {
+        "country": ["country of asylum", "territory of asylum", "country / territory of asylum",
+                    "country of asylum/residence", "asylum"],
+        "year": "year",
+        "value": ["refugees under unhcr's mandate", "refugees (incl. refugee-like situations)", "refugees"],
+        "iso2": None,
+        "match": "contains",
+    },
+}
+
+SPEC_KEYS = {"country", "year", "iso2", "value", "values", "aggregate", "filter",
+             "country_alias", "unit_scale"}
+AGGREGATES = ("sum", "mean", "min", "max")
+
+
+class AdapterError(ValueError):
+    """Ungültige "adapter"-Angabe in available_kpis.json."""
+
+
+# ======================================================================
+# 🧮 Spalten-Helfer
+# ======================================================================
+def column_floats(col, decimal_comma: bool = True):
+    """
+    safe_float für eine ganze Spalte → (Werte, gültig).
+    Wie safe_float: leer / fehlend / nicht parsebar → ungültig; "nan" bleibt ein
+    gültiger NaN-Wert. Bereits numerische Spalten sind vollständig gültig.
+    """
+    if col.dtype.kind in "biuf":
+        return col.astype(float), pd.Series(True, index=col.index)
+    raw = col.where(col.notna(), "").astype(str)
+    if decimal_comma:
+        raw = raw.str.replace(",", ".", regex=False)
+    valid = raw != ""
+    arr = raw.where(valid, "nan").to_numpy(dtype=object)
+    try:
+        vals = arr.astype(float)   # float() pro Element in C – gleiche Syntax wie safe_float
+    except ValueError:
+        parsed = {}
+        for x in pd.unique(arr):
+            try:
+                parsed[x] = float(x)
+            except ValueError:
+                parsed[x] = None
+        conv = pd.Series(arr, index=col.index).map(parsed)
+        valid &= conv.notna() | (raw.str.strip().str.lower().isin(("nan", "+nan", "-nan")))
+        vals = conv.astype(float).to_numpy()
+    return pd.Series(vals, index=col.index), valid
+
+def records_from_columns(country, iso2, year, value) -> List[Dict[str, Any]]:
+    """Record-Dicts (Python-Typen) aus gefilterten Spalten; iso2 darf ein Skalar sein."""
+    n = len(country)
+    iso = [iso2] * n if not isinstance(iso2, pd.Series) else iso2.tolist()
+    return [{"country": c, "iso2": i, "year": y, "value": v}
+            for c, i, y, v in zip(country.tolist(), iso, year.astype("int64").tolist(), value.tolist())]
+
+def _norm_col(s: str) -> str:
+    s = "".join(c for c in unicodedata.normalize("NFKD", str(s).lower()) if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", s).strip()
+
+def find_column(columns, candidates, contains: bool = False) -> Optional[str]:
+    """Erste vorhandene Spalte zu den Kandidaten: exakt, dann normalisiert, optional Teilstring."""
+    if not candidates:
+        return None
+    if isinstance(candidates, str):
+        candidates = [candidates]
+    columns = list(columns)
+    norms = {c: _norm_col(c) for c in columns}
+    for cand in candidates:
+        if cand in columns:
+            return cand
+        p = _norm_col(cand)
+        hit = next((c for c in columns if norms[c] == p), None)
+        if hit is None and contains and p:
+            hit = next((c for c in columns if p in norms[c]), None)
+        if hit is not None:
+            return hit
+    return None
+
+
+# ======================================================================
+# 🧩 Adapter
+# ======================================================================
+class Adapter:
+    """Kompilierte Spalten-Zuordnung eines KPIs (siehe Modul-Docstring)."""
+
+    def __init__(self, kpi_id: str, source_type: str, spec: Dict[str, Any]):
+        self.kpi_id = kpi_id
+        self.source_type = source_type
+        self.country = spec.get("country")
+        self.year = spec.get("year")
+        self.iso2 = spec.get("iso2")
+        self.value = spec.get("value")
+        self.values = spec.get("values")
+        self.aggregate = spec.get("aggregate") or "sum"
+        self.require = spec.get("require") or []
+        self.world_iso2 = spec.get("world_iso2")
+        self.contains = spec.get("match") == "contains"
+        self.filters = {col: [str(v) for v in (want if isinstance(want, list) else [want])]
+                        for col, want in (spec.get("filter") or {}).items()}
+        self.aliases = {str(k).strip().lower(): v for k, v in (spec.get("country_alias") or {}).items()}
+        self.unit_scale = float(spec.get("unit_scale", 1.0))
+        # "*" wählt Spalten anhand aller Zeilen → nicht stückweise anwendbar
+        self.needs_whole_table = self.values == "*"
+
+    def _value_columns(self, columns, keys) -> Tuple[Optional[str], List[str]]:
+        """(einzelne Wertspalte, zu kombinierende Spalten) – genau eins ist gesetzt."""
+        if self.value:
+            col = find_column(columns, self.value, self.contains)
+            if col or not self.values:
+                return col, []
+        if self.values == "*":
+            return None, [c for c in columns if c not in keys]
+        if self.values:
+            return None, [c for c in (find_column(columns, v, self.contains) for v in self.values) if c]
+        # OWID-Default: erste Spalte, die kein Schlüssel ist
+        rest = [c for c in columns if c not in keys]
+        return (rest[0] if rest else None), []
+
+    def _combined(self, df: pd.DataFrame, cols: List[str], keep_numeric: bool):
+        parsed = {c: column_floats(df[c]) for c in cols}
+        if keep_numeric:   # "*": nur Spalten, deren befüllte Zellen alle Zahlen sind
+            parsed = {c: p for c, p in parsed.items()
+                      if p[1].any() and (p[1] | (df[c].fillna("").astype(str).str.strip() == "")).all()}
+        if not parsed:
+            return None, None
+        vals = pd.DataFrame({c: v.where(ok) for c, (v, ok) in parsed.items()})
+        ok = pd.concat([ok for _, ok in parsed.values()], axis=1).any(axis=1)
+        return getattr(vals, self.aggregate)(axis=1, skipna=True), ok
+
+    def apply(self, frame: Optional[pd.DataFrame],
+              canonicalize: Callable[[pd.Series], pd.Series]) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Tabelle → (Problem, Records). Problem: None, "format" (Pflichtspalten fehlen)
+        oder "no_column" (keine Wertspalte). canonicalize: Namen-Spalte → kanonische Namen/NaN.
+        """
+        if frame is None or not len(frame.columns):
+            return "format", []
+        columns = list(frame.columns)
+        if any(find_column(columns, c) is None for c in self.require):
+            return "format", []
+        country = find_column(columns, self.country, self.contains)
+        year = find_column(columns, self.year, self.contains)
+        iso2 = find_column(columns, self.iso2) if self.iso2 else None
+        if not country or not year:
+            return "format", []
+        filters = {find_column(columns, c): want for c, want in self.filters.items()}
+        if None in filters:
+            return "format", []
+
+        keys = {country, year, iso2, *filters, *self.require}
+        value_col, combine = self._value_columns(columns, keys)
+        if not value_col and not combine:
+            return "no_column", []
+        if not len(frame):
+            return None, []
+
+        df = frame
+        for col, want in filters.items():
+            df = df[df[col].fillna("").astype(str).str.strip().isin(want)]
+
+        # --- Länder (jeder Name einmal aufgelöst) ---
+        names = df[country].fillna("").astype(str).str.strip()
+        if self.aliases:
+            alias = names.str.lower().map(self.aliases)
+            names = alias.where(alias.notna(), names)
+        named = names != ""
+        canon = pd.Series(np.nan, index=df.index, dtype=object)
+        if named.any():
+            canon[named] = canonicalize(names[named])
+        if self.world_iso2:
+            # Fallback, falls "World" nicht gemappt ist
+            canon = canon.where(canon.notna() | (names.str.lower() != "world"), "World")
+
+        # --- Jahr & Wert ---
+        years, year_ok = column_floats(df[year], decimal_comma=False)
+        if value_col:
+            values, value_ok = column_floats(df[value_col])
+        else:
+            values, value_ok = self._combined(df, combine, keep_numeric=self.values == "*")
+            if values is None:
+                return "no_column", []
+        if self.unit_scale != 1.0:
+            values = values * self.unit_scale
+
+        keep = canon.notna() & year_ok & np.isfinite(years) & value_ok
+        if iso2:
+            codes = df[iso2].where(df[iso2].notna(), None)
+            if self.world_iso2:
+                codes = codes.where(canon != "World", self.world_iso2)
+            codes = codes[keep]
+        else:
+            codes = ""
+        return None, records_from_columns(canon[keep], codes, years[keep], values[keep])
+
+
+def compile_adapter(meta: Dict[str, Any], source_type: Optional[str] = None) -> Adapter:
+    """Defaults der Quelle + "adapter" aus den KPI-Metadaten → Adapter (wirft AdapterError)."""
+    source_type = (source_type or meta.get("source_type") or "").lower().strip()
+    kpi_id = meta.get("filename") or meta.get("id") or "kpi"
+    spec = meta.get("adapter") or {}
+    if not isinstance(spec, dict):
+        raise AdapterError(f"{kpi_id}: adapter must be an object")
+    unknown = set(spec) - SPEC_KEYS
+    if unknown:
+        raise AdapterError(f"{kpi_id}: unknown adapter key(s) {', '.join(sorted(unknown))}")
+    if spec.get("aggregate", "sum") not in AGGREGATES:
+        raise AdapterError(f"{kpi_id}: aggregate must be one of {', '.join(AGGREGATES)}")
+    if "unit_scale" in spec and not isinstance(spec["unit_scale"], (int, float)):
+        raise AdapterError(f"{kpi_id}: unit_scale must be a number")
+
+    merged = dict(SOURCE_DEFAULTS.get(source_type, SOURCE_DEFAULTS["csv"]))
+    if source_type == "unhcr" and meta.get("unhcr_field"):
+        merged["value"] = meta["unhcr_field"]   # ältere Angabe, weiterhin unterstützt
+    if "values" in spec and "value" not in spec:
+        merged["value"] = None
+    merged.update(spec)
+    return Adapter(kpi_id, source_type, merged)